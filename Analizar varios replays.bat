@@ -8,19 +8,14 @@ set "PY="
 if exist "%~dp0.venv\Scripts\python.exe" set "PY=%~dp0.venv\Scripts\python.exe"
 
 set "LISTA="
+set "N=0"
+set "UNO="
 for /f "usebackq delims=" %%F in (`powershell -NoProfile -Command "Add-Type -AssemblyName System.Windows.Forms; $d = New-Object System.Windows.Forms.OpenFileDialog; $d.Filter = 'Replays (*.replay)|*.replay|Todos (*.*)|*.*'; $d.Title = 'Selecciona uno o varios replays (Ctrl o Shift para varios)'; $d.InitialDirectory = (Get-Location).Path; $d.Multiselect = $true; if ($d.ShowDialog() -eq 'OK') { $d.FileNames | ForEach-Object { Write-Output $_ } }"`) do (
   set "REPLAY=%%F"
   if exist "!REPLAY!" (
-    set "OUT=%%~dpnF.json"
-    echo Analizando: %%~nxF
-    if not "%PY%"=="" ("%PY%" -m rl_replay_analyzer "!REPLAY!" -o "!OUT!" --indent 2) else (py -3.11 -m rl_replay_analyzer "!REPLAY!" -o "!OUT!" --indent 2)
-    if errorlevel 1 (
-      echo   ERROR en %%~nxF
-    ) else (
-      echo   OK -> %%~nF.json
-    )
-    echo.
-    set "LISTA=!LISTA!x"
+    set "LISTA=!LISTA! "!REPLAY!""
+    set "UNO=%%~dpnF.json"
+    set /a N+=1
   )
 )
 
@@ -30,5 +25,14 @@ if "%LISTA%"=="" (
   exit /b 1
 )
 
+REM Un solo proceso de Python para todos los replays (en paralelo, un JSON junto a cada replay)
+set "SALIDA="
+if "%N%"=="1" set "SALIDA=-o "%UNO%""
+if not "%PY%"=="" ("%PY%" -m rl_replay_analyzer %LISTA% %SALIDA% --indent 2) else (py -3.11 -m rl_replay_analyzer %LISTA% %SALIDA% --indent 2)
+if errorlevel 1 (
+  echo   Algunos replays dieron ERROR, revisa los mensajes de arriba.
+)
+echo.
+
 echo Listo. Revisa los JSON generados en la misma carpeta que cada replay.
 pause
@@ -3,13 +3,43 @@ Analizador de archivos .replay de Rocket League.
 
 Extrae equipos (blue/orange) y lista de goles con tiempo exacto del marcador
 desde el stream de red (network_frames), usando el evento GoalScored y SecondsRemaining.
+
+Las funciones públicas se importan de forma perezosa (PEP 562): importar el
+paquete no carga el parser ni el backend, lo que abarata el arranque de la CLI.
 """
 
 __version__ = "1.0.0"
 
-from rl_replay_analyzer.parser import parse_replay_file, extract_match_data
+import importlib
+
+# Nombre público → módulo que lo define (se importa en el primer acceso)
+_LAZY = {
+    "parse_replay_file": "rl_replay_analyzer.parser",
+    "parse_replay_bytes": "rl_replay_analyzer.parser",
+    "extract_match_data": "rl_replay_analyzer.parser",
+    "extract_header_match_data": "rl_replay_analyzer.parser",
+    "HeaderView": "rl_replay_analyzer.header_view",
+    "SeasonAggregate": "rl_replay_analyzer.season",
+}
 
 __all__ = [
     "parse_replay_file",
+    "parse_replay_bytes",
     "extract_match_data",
+    "extract_header_match_data",
+    "HeaderView",
+    "SeasonAggregate",
 ]
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,358 @@
+"""
+Procesamiento por lotes de replays.
+
+Expande rutas, globs y directorios a una lista de archivos .replay y reparte
+`parse_replay_file` entre varios procesos. Cada proceso importa el parser una
+sola vez; los fallos se registran por archivo en lugar de detener el lote.
+Con `dedup=True`, los archivos idénticos (ver `rl_replay_analyzer.dedup`) se
+analizan una sola vez. Con `read_ahead`, la lectura de los archivos se solapa
+con el análisis (ver `rl_replay_analyzer.pipeline`).
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+
+# Resultado del análisis completo de un replay
+OUTCOMES = ("ok", "parse_error", "timeout", "oom", "crash")
+
+
+class BatchItem(NamedTuple):
+    """
+    Resultado de un replay dentro de un lote: `result` o `error` (nunca ambos),
+    salvo si hubo `fallback`: entonces `result` es el del reintento (p. ej.
+    "header") y `error` conserva el fallo original. `outcome` es uno de OUTCOMES.
+    `duplicate_of` es el replay idéntico que se analizó en su lugar (con `dedup`).
+    """
+
+    path: Path
+    result: dict | None
+    error: str | None
+    cache_hit: bool = False
+    stats: dict | None = None
+    outcome: str = "ok"
+    fallback: str | None = None
+    duplicate_of: Path | None = None
+
+
+# Caché de resultados y tabla de rutas del proceso actual (los crea _init_worker en cada worker)
+_worker_cache = None
+_worker_router = None
+
+
+def expand_replay_paths(inputs: Iterable[str | Path]) -> list[Path]:
+    """
+    Expande rutas de entrada a una lista ordenada y sin duplicados de replays.
+
+    Cada entrada puede ser un archivo, un directorio (se recorre de forma
+    recursiva buscando *.replay) o un patrón glob ("partidas/**/*.replay").
+    Las rutas que no existen se conservan tal cual para que el lote informe
+    el error en lugar de ignorarlas.
+
+    Args:
+        inputs: Rutas, directorios o patrones glob.
+
+    Returns:
+        Lista de rutas de replays.
+    """
+    seen: set[Path] = set()
+    out: list[Path] = []
+
+    def _add(p: Path) -> None:
+        if p not in seen:
+            seen.add(p)
+            out.append(p)
+
+    for raw in inputs:
+        p = Path(raw)
+        if p.is_dir():
+            for child in sorted(p.rglob("*")):
+                if child.is_file() and child.suffix.lower() == ".replay":
+                    _add(child)
+        elif glob.has_magic(str(raw)):
+            for match in sorted(glob.glob(str(raw), recursive=True)):
+                mp = Path(match)
+                if mp.is_file():
+                    _add(mp)
+        else:
+            _add(p)
+    return out
+
+
+def _init_worker(
+    cache_dir: Path | None = None, cache_max_bytes: int | None = None, routes_path: Path | None = None
+) -> None:
+    """Inicializador de cada proceso: importa el parser y abre la caché y la tabla de rutas una sola vez."""
+    global _worker_cache, _worker_router
+    import rl_replay_analyzer.parser  # noqa: F401
+    from rl_replay_analyzer.cache import DEFAULT_MAX_BYTES, ResultCache
+
+    _worker_cache = None
+    if cache_dir is not None:
+        _worker_cache = ResultCache(cache_dir, cache_max_bytes or DEFAULT_MAX_BYTES)
+    if _worker_router is not None:
+        _worker_router.close()
+        _worker_router = None
+    if routes_path is not None:
+        import sqlite3
+
+        from rl_replay_analyzer.routing import Router
+
+        try:
+            _worker_router = Router(routes_path)
+        except (OSError, sqlite3.Error):
+            _worker_router = None  # sin tabla: backend de load_backend()
+
+
+def _analyze_one(
+    path: Path,
+    mode: str = "full",
+    backend: Callable[[bytes], Any] | None = None,
+    collect_stats: bool = False,
+    trace_memory: bool = False,
+    extractors: tuple[str, ...] = (),
+    data: bytes | None = None,
+) -> BatchItem:
+    """
+    Analiza un replay capturando el error como texto (ejecutado en el worker).
+
+    Con `data` se analizan esos bytes (ya leídos por la etapa de lectura de
+    `rl_replay_analyzer.pipeline`) en lugar de abrir `path`.
+    """
+    from rl_replay_analyzer.parser import parse_replay_bytes, parse_replay_file
+    from rl_replay_analyzer.stats import StageStats
+
+    stats = StageStats(trace_memory) if collect_stats or trace_memory else None
+    stats_dict = stats.as_dict if stats is not None else lambda: None
+    hits_before = _worker_cache.hits if _worker_cache is not None else 0
+    try:
+        if data is not None:
+            result = parse_replay_bytes(
+                data,
+                mode=mode,
+                cache=_worker_cache,
+                backend=backend,
+                stats=stats,
+                extractors=extractors,
+                router=_worker_router,
+            )
+        else:
+            result = parse_replay_file(
+                path,
+                mode=mode,
+                cache=_worker_cache,
+                backend=backend,
+                stats=stats,
+                extractors=extractors,
+                router=_worker_router,
+            )
+        hit = _worker_cache is not None and _worker_cache.hits > hits_before
+        return BatchItem(path, result, None, hit, stats_dict())
+    except (FileNotFoundError, ValueError, ImportError) as e:
+        return BatchItem(path, None, str(e), False, stats_dict(), "parse_error")
+    except MemoryError:
+        return BatchItem(path, None, "Memoria agotada al analizar el replay", False, None, "oom")
+    except Exception as e:  # fallo inesperado del backend: no detener el lote
+        return BatchItem(path, None, f"{type(e).__name__}: {e}", False, stats_dict(), "parse_error")
+
+
+def _duplicate_item(item: BatchItem, path: Path) -> BatchItem:
+    """El resultado de `item` para un archivo idéntico (copia propia: quien lo escribe puede modificarlo)."""
+    import copy
+
+    return item._replace(path=path, result=copy.deepcopy(item.result), cache_hit=False, stats=None, duplicate_of=item.path)
+
+
+def retry_header(item: BatchItem) -> BatchItem:
+    """
+    Reintenta en modo header un replay cuyo análisis completo falló.
+
+    Devuelve el BatchItem con el resultado aproximado del header y
+    `fallback="header"` (conservando `outcome` y `error`), o el mismo item si
+    tampoco el header se puede leer.
+    """
+    from rl_replay_analyzer.parser import parse_replay_file
+
+    try:
+        result = parse_replay_file(item.path, mode="header")
+    except (OSError, ValueError):
+        return item
+    return item._replace(result=result, fallback="header")
+
+
+def default_jobs() -> int:
+    """Número de procesos por defecto: uno por CPU."""
+    return os.cpu_count() or 1
+
+
+def run_batch(
+    paths: Iterable[Path],
+    jobs: int | None = None,
+    mode: str = "full",
+    cache_dir: Path | None = None,
+    cache_max_bytes: int | None = None,
+    backend: Callable[[bytes], Any] | None = None,
+    collect_stats: bool = False,
+    trace_memory: bool = False,
+    extractors: tuple[str, ...] = (),
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    max_tasks_per_child: int | None = None,
+    header_fallback: bool = False,
+    dedup: bool = False,
+    read_ahead: int = 0,
+    read_threads: int | None = None,
+    max_buffered_bytes: int | None = None,
+    pipeline_stats: dict | None = None,
+    routes_path: Path | None = None,
+) -> Iterator[BatchItem]:
+    """
+    Analiza varios replays en paralelo y va devolviendo los resultados.
+
+    Los resultados se entregan en orden de finalización (no de entrada).
+    Con `jobs=1` se analiza en el propio proceso, sin pool. Si se pide
+    `timeout`, `memory_limit` o `max_tasks_per_child`, el lote pasa por el
+    pool supervisado de `rl_replay_analyzer.supervisor` (procesos propios que
+    se matan y sustituyen), también con `jobs=1`. Con `read_ahead`, en modo
+    "full", hilos de lectura anticipada del proceso principal alimentan a
+    los workers (ver `rl_replay_analyzer.pipeline`), con o sin supervisión.
+
+    Args:
+        paths: Rutas de los replays.
+        jobs: Número de procesos (por defecto: uno por CPU).
+        mode: Modo de `parse_replay_file` ("full" o "header").
+        cache_dir: Directorio de la caché de resultados (None = sin caché).
+        cache_max_bytes: Tamaño máximo de la caché en bytes.
+        backend: Sustituto de `parse_replay` (función a nivel de módulo, para
+            poder enviarla a los procesos).
+        collect_stats: Adjuntar a cada BatchItem tiempos y contadores por etapa.
+        trace_memory: Medir además el pico de memoria por etapa (tracemalloc).
+        extractors: Extractores adicionales (ver `rl_replay_analyzer.extractors`).
+        timeout: Segundos máximos por replay (el worker se mata al superarlos).
+        memory_limit: Límite de espacio de direcciones por worker, en bytes.
+        max_tasks_per_child: Replays por worker antes de sustituirlo.
+        header_fallback: Si el análisis completo falla, reintentar en modo header.
+        dedup: Analizar una sola vez cada grupo de archivos idénticos; los
+            duplicados se entregan justo después de su representante, con
+            una copia del resultado y `duplicate_of`.
+        read_ahead: Replays leídos por adelantado a la espera de un worker
+            (0 = sin etapa de lectura: cada worker lee su archivo).
+        read_threads: Hilos de la etapa de lectura (por defecto:
+            pipeline.DEFAULT_READ_THREADS).
+        max_buffered_bytes: Bytes leídos por adelantado como máximo.
+        pipeline_stats: Con la etapa de lectura, se rellena al terminar con
+            la utilización de cada etapa (ver `pipeline.run_pipeline`).
+        routes_path: Tabla de rutas por versión (ver `rl_replay_analyzer.routing`);
+            None = siempre el backend de `load_backend()`. Se ignora con `backend`.
+
+    Yields:
+        BatchItem por cada replay.
+    """
+    paths = list(paths)
+    jobs = max(1, jobs or default_jobs())
+    if dedup:
+        from rl_replay_analyzer.dedup import group_duplicates
+
+        groups = {group[0]: group[1:] for group in group_duplicates(paths)}
+        batch = run_batch(
+            list(groups),
+            jobs=jobs,
+            mode=mode,
+            cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes,
+            backend=backend,
+            collect_stats=collect_stats,
+            trace_memory=trace_memory,
+            extractors=extractors,
+            timeout=timeout,
+            memory_limit=memory_limit,
+            max_tasks_per_child=max_tasks_per_child,
+            header_fallback=header_fallback,
+            read_ahead=read_ahead,
+            read_threads=read_threads,
+            max_buffered_bytes=max_buffered_bytes,
+            pipeline_stats=pipeline_stats,
+            routes_path=routes_path,
+        )
+        for item in batch:
+            yield item
+            for dup in groups[item.path]:
+                yield _duplicate_item(item, dup)
+        return
+    if timeout or memory_limit or max_tasks_per_child:
+        from rl_replay_analyzer.supervisor import run_supervised
+
+        yield from run_supervised(
+            paths,
+            jobs=jobs,
+            mode=mode,
+            cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes,
+            backend=backend,
+            collect_stats=collect_stats,
+            trace_memory=trace_memory,
+            extractors=extractors,
+            timeout=timeout,
+            memory_limit=memory_limit,
+            max_tasks_per_child=max_tasks_per_child,
+            header_fallback=header_fallback,
+            read_ahead=read_ahead,
+            read_threads=read_threads,
+            max_buffered_bytes=max_buffered_bytes,
+            pipeline_stats=pipeline_stats,
+            routes_path=routes_path,
+        )
+        return
+    if read_ahead and mode == "full":
+        from rl_replay_analyzer.pipeline import DEFAULT_READ_THREADS, run_pipeline
+
+        yield from run_pipeline(
+            paths,
+            jobs=jobs,
+            mode=mode,
+            cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes,
+            backend=backend,
+            collect_stats=collect_stats,
+            trace_memory=trace_memory,
+            extractors=extractors,
+            header_fallback=header_fallback,
+            read_threads=read_threads or DEFAULT_READ_THREADS,
+            read_ahead=read_ahead,
+            max_buffered_bytes=max_buffered_bytes,
+            pipeline_stats=pipeline_stats,
+            routes_path=routes_path,
+        )
+        return
+    retry = header_fallback and mode == "full"
+    init_args = (cache_dir, cache_max_bytes, routes_path)
+    if jobs == 1 or len(paths) <= 1:
+        _init_worker(*init_args)
+        for p in paths:
+            item = _analyze_one(p, mode, backend, collect_stats, trace_memory, extractors)
+            yield retry_header(item) if retry and item.outcome != "ok" else item
+        return
+
+    # Importación diferida: concurrent.futures.process arrastra multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    from concurrent.futures.process import BrokenProcessPool
+
+    with ProcessPoolExecutor(
+        max_workers=min(jobs, len(paths)), initializer=_init_worker, initargs=init_args
+    ) as pool:
+        futures = {
+            pool.submit(_analyze_one, p, mode, backend, collect_stats, trace_memory, extractors): p for p in paths
+        }
+        for fut in as_completed(futures):
+            try:
+                item = fut.result()
+            except BrokenProcessPool as e:
+                # Un worker murió: el pool ya no sirve y todo lo que no había terminado se pierde
+                item = BatchItem(futures[fut], None, f"El worker murió durante el análisis: {e}", outcome="crash")
+            except Exception as e:  # p. ej. un resultado que no se puede devolver del worker
+                item = BatchItem(futures[fut], None, f"{type(e).__name__}: {e}", outcome="crash")
+            yield retry_header(item) if retry and item.outcome != "ok" else item
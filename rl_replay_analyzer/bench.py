@@ -0,0 +1,479 @@
+"""
+Benchmarks del analizador con datos sintéticos (no necesitan boxcars).
+
+Uso:
+    python -m rl_replay_analyzer.bench
+    python -m rl_replay_analyzer.bench --quick -o bench.json
+    python -m rl_replay_analyzer.bench --only header,goals
+    python -m rl_replay_analyzer.bench --only startup,memory,rss --check
+    RL_BENCH_REPLAYS=a.replay:b.replay python -m rl_replay_analyzer.bench --only netstream
+
+Emite un JSON con la versión, la plataforma y, por benchmark, los tiempos
+(mínimo, mediana, media) para poder comparar entre versiones.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from rl_replay_analyzer import __version__
+from rl_replay_analyzer.batch import run_batch
+from rl_replay_analyzer.header_fallback import parse_header
+from rl_replay_analyzer.header_view import HeaderView
+from rl_replay_analyzer.parser import extract_match_data, parse_replay_bytes
+from rl_replay_analyzer.sinks import open_sink, read_records
+from rl_replay_analyzer.synthetic import (
+    build_header,
+    build_replay,
+    build_replay_dict,
+    synthetic_parse_replay,
+    write_replay_library,
+)
+from rl_replay_analyzer.utils import get_prop
+
+
+def _timeit(fn: Callable[[], object], repeat: int, number: int = 1) -> dict:
+    """Ejecuta `fn` number veces por repetición y resume los tiempos por llamada."""
+    fn()  # calentamiento
+    per_call = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number)
+    return {
+        "min_s": min(per_call),
+        "median_s": statistics.median(per_call),
+        "mean_s": statistics.fmean(per_call),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def bench_header(quick: bool) -> dict:
+    """Parseo del header (hasta Goals, selectivo por claves y completo) y lectura de propiedades."""
+    data = build_header(num_props=200, array_depth=3, array_width=4, string_length=256, body_size=1024 * 1024)
+    number = 20 if quick else 200
+    header = parse_header(data, stop_at_goals=False)
+    # Las del índice más el final de la lista (peor caso del recorrido lineal)
+    keys = [name for name, _ in header["properties"][-8:]] + ["Id", "MapName", "Goals", "RecordFPS"]
+
+    def _scan() -> None:
+        for key in keys:
+            get_prop(header, key)
+
+    def _view() -> None:
+        view = HeaderView(header)
+        for key in keys:
+            view.get(key)
+        view.goals
+
+    return {
+        "params": {"bytes": len(data), "num_props": 200, "array_depth": 3, "lookups": len(keys)},
+        "until_goals": _timeit(lambda: parse_header(data), 5, number),
+        "selected_keys": _timeit(lambda: parse_header(data, keys={"Goals", "MapName", "Id"}), 5, number),
+        "full": _timeit(lambda: parse_header(data, stop_at_goals=False), 5, number),
+        "lookups_get_prop": _timeit(_scan, 5, number * 10),
+        "lookups_header_view": _timeit(_view, 5, number * 10),
+    }
+
+
+def bench_goals(quick: bool) -> dict:
+    """extract_match_data sobre un stream de red sintético (partido largo con prórroga)."""
+    num_frames = 5000 if quick else 40000
+    replay = build_replay_dict(num_frames=num_frames, actors_per_frame=8)
+    return {
+        "params": {"frames": num_frames, "actors_per_frame": 8},
+        "extract_match_data": _timeit(lambda: extract_match_data(replay), 3 if quick else 5),
+    }
+
+
+def bench_json(quick: bool) -> dict:
+    """Serialización de resultados: en memoria y a través de cada destino de `sinks`."""
+    replay = build_replay_dict(num_frames=3000)
+    results = [extract_match_data(replay)] * (200 if quick else 2000)
+    paths = [Path(f"replay_{i:05d}.replay") for i in range(len(results))]
+
+    def _sink(fmt: str, directory: str) -> None:
+        target = Path(directory) / f"out.{fmt}" if fmt != "json" else None
+        sink = open_sink(fmt, target, Path(directory), indent=2 if fmt == "json" else 0)
+        for path, result in zip(paths, results):
+            sink.write(path, result)
+        sink.close()
+
+    out = {
+        "params": {"results": len(results)},
+        "indent_2": _timeit(lambda: json.dumps(results, ensure_ascii=False, indent=2), 5),
+        "compact": _timeit(lambda: json.dumps(results, ensure_ascii=False), 5),
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("json", "ndjson", "bin"):
+            out[f"sink_{fmt}"] = _timeit(functools.partial(_sink, fmt, tmp), 3)
+        out["read_bin"] = _timeit(lambda: sum(1 for _ in read_records(Path(tmp) / "out.bin")), 3)
+    return out
+
+
+def bench_batch(quick: bool) -> dict:
+    """Lote completo (lectura + backend sintético + extracción), con 1 y con varios procesos."""
+    count = 8 if quick else 64
+    out: dict = {"params": {"replays": count, "frames_per_replay": 9000}}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = write_replay_library(tmp, count, num_frames=9000)
+
+        def _run(jobs: int, mode: str = "full") -> None:
+            for item in run_batch(paths, jobs=jobs, mode=mode, backend=synthetic_parse_replay):
+                if item.error is not None:
+                    raise RuntimeError(f"{item.path}: {item.error}")
+
+        out["full_jobs_1"] = _timeit(lambda: _run(1), 1 if quick else 3)
+        out["full_jobs_4"] = _timeit(lambda: _run(4), 1 if quick else 3)
+        out["header_jobs_1"] = _timeit(lambda: _run(1, "header"), 3)
+    return out
+
+
+def _native_backend() -> tuple[Callable[[bytes], object] | None, str | None]:
+    """`parse_replay` de la extensión nativa, o (None, motivo) si no está instalada."""
+    try:
+        from sprocket_boxcars_py import parse_replay
+    except ImportError:
+        try:
+            from boxcars_py import parse_replay
+        except ImportError:
+            return None, "sprocket_boxcars_py/boxcars_py no instalado"
+    return parse_replay, None
+
+
+def _time_backend(data: bytes, backend: Callable[[bytes], object], repeat: int) -> dict:
+    """Análisis completo de `data` con `backend`; si falla, el error en lugar de los tiempos."""
+    try:
+        return _timeit(lambda: parse_replay_bytes(data, backend=backend), repeat)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+
+
+def bench_netstream(quick: bool) -> dict:
+    """
+    Decodificador en Python puro (`netstream`) frente al backend nativo.
+
+    Mide el análisis completo (backend + extracción de goles) de un replay
+    sintético con stream de red real (`synthetic.build_replay`) y de los
+    replays indicados en $RL_BENCH_REPLAYS (rutas separadas por os.pathsep).
+    El backend nativo solo se mide si está instalado.
+    """
+    from rl_replay_analyzer.netstream import parse_replay as python_parse_replay
+
+    num_frames = 3000 if quick else 12000
+    repeat = 1 if quick else 3
+    native, reason = _native_backend()
+    inputs = {"synthetic": build_replay(num_frames=num_frames)}
+    for raw in filter(None, os.environ.get("RL_BENCH_REPLAYS", "").split(os.pathsep)):
+        inputs[Path(raw).name] = Path(raw).read_bytes()
+
+    out: dict = {"params": {"frames": num_frames, "cars": 6}, "native_available": native is not None}
+    if reason:
+        out["native_unavailable"] = reason
+    for name, data in inputs.items():
+        entry = {"bytes": len(data), "python": _time_backend(data, python_parse_replay, repeat)}
+        if native is not None:
+            entry["native"] = _time_backend(data, native, repeat)
+            if "min_s" in entry["python"] and "min_s" in entry["native"]:
+                entry["python_vs_native"] = entry["python"]["min_s"] / entry["native"]["min_s"]
+        out[name] = entry
+    return out
+
+
+# Presupuesto de arranque por escenario: tiempo de importación de los módulos
+# del paquete (según -X importtime) y módulos que NO deben llegar a cargarse.
+STARTUP_BUDGETS = {
+    "help": {
+        "import_ms": 45.0,
+        "forbidden": [
+            "rl_replay_analyzer.parser",
+            "concurrent.futures.process",
+            "multiprocessing",
+            "tracemalloc",
+            "sprocket_boxcars_py",
+            "boxcars_py",
+        ],
+    },
+    "header_only": {
+        "import_ms": 60.0,
+        "forbidden": ["concurrent.futures.process", "multiprocessing", "tracemalloc", "sprocket_boxcars_py", "boxcars_py"],
+    },
+}
+
+
+def _importtime(args: list[str]) -> tuple[float, float, set[str]]:
+    """
+    Ejecuta `python -X importtime -m rl_replay_analyzer args`.
+
+    Returns:
+        (segundos de reloj, ms de importación de rl_replay_analyzer*, módulos importados)
+    """
+    env = dict(os.environ)
+    root = str(Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "rl_replay_analyzer", *args],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"Fallo al ejecutar {' '.join(args)}: {proc.stderr[-500:]}")
+    own_us = 0
+    modules: set[str] = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:") :].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        bare = name.lstrip()
+        modules.add(bare)
+        # Solo las importaciones de primer nivel (sangría de un espacio): su
+        # acumulado ya incluye las anidadas
+        if len(name) - len(bare) == 1 and bare.startswith("rl_replay_analyzer"):
+            own_us += int(parts[1])
+    return wall, own_us / 1000.0, modules
+
+
+def bench_startup(quick: bool) -> dict:
+    """Arranque de la CLI (`--help` y una ejecución --header-only) frente a STARTUP_BUDGETS."""
+    runs = 3 if quick else 10
+    out: dict = {"params": {"runs": runs}, "budgets": STARTUP_BUDGETS}
+    with tempfile.TemporaryDirectory() as tmp:
+        replay = Path(tmp) / "startup.replay"
+        replay.write_bytes(build_header(body_size=1024 * 1024))
+        scenarios = {
+            "help": ["--help"],
+            "header_only": [str(replay), "--header-only", "--no-cache", "-o", str(Path(tmp) / "out.json")],
+        }
+        for name, args in scenarios.items():
+            walls, imports = [], []
+            modules: set[str] = set()
+            for _ in range(runs):
+                wall, import_ms, modules = _importtime(args)
+                walls.append(wall)
+                imports.append(import_ms)
+            budget = STARTUP_BUDGETS[name]
+            loaded = sorted(m for m in budget["forbidden"] if m in modules)
+            import_ms = statistics.median(imports)
+            out[name] = {
+                "wall_median_s": statistics.median(walls),
+                "import_median_ms": import_ms,
+                "forbidden_loaded": loaded,
+                "within_budget": import_ms <= budget["import_ms"] and not loaded,
+            }
+    return out
+
+
+# Objetivo de memoria del análisis completo con un backend en streaming: el
+# pico (memoria Python, tracemalloc) no debe pasar de MEMORY_BUDGET_BYTES ni
+# crecer más de MEMORY_GROWTH_BUDGET veces al cuadruplicar la duración.
+MEMORY_BUDGET_BYTES = 4 * 1024 * 1024
+MEMORY_GROWTH_BUDGET = 1.25
+
+
+def _peak_bytes(fn: Callable[[], object]) -> int:
+    """Pico de memoria Python (tracemalloc) durante `fn()`, sobre lo ya asignado."""
+    import tracemalloc
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn()
+        return tracemalloc.get_traced_memory()[1] - base
+    finally:
+        if started:
+            tracemalloc.stop()
+
+
+def bench_memory(quick: bool) -> dict:
+    """Pico de memoria de parse_replay_bytes con frames en lista y en streaming, a dos duraciones."""
+    short = 3000 if quick else 9000
+    lengths = (short, short * 4)
+    out: dict = {
+        "params": {"frames": list(lengths)},
+        "budgets": {"peak_bytes": MEMORY_BUDGET_BYTES, "growth": MEMORY_GROWTH_BUDGET},
+    }
+    for streaming in (False, True):
+        peaks = []
+        for num_frames in lengths:
+            data = build_header(num_frames=num_frames)
+            backend = functools.partial(synthetic_parse_replay, streaming=streaming)
+            peaks.append(_peak_bytes(lambda: parse_replay_bytes(data, backend=backend)))
+        entry = {"peak_bytes": peaks, "growth": peaks[1] / peaks[0] if peaks[0] else 0.0}
+        if streaming:
+            entry["within_budget"] = max(peaks) <= MEMORY_BUDGET_BYTES and entry["growth"] <= MEMORY_GROWTH_BUDGET
+        out["streaming" if streaming else "materialized"] = entry
+    return out
+
+
+# Objetivo de RSS de un worker del lote (incluye lo que asigne el backend
+# nativo, que tracemalloc no ve): pico por debajo de RSS_BUDGET_BYTES y sin
+# crecer más de RSS_GROWTH_BUDGET veces al cuadruplicar la duración.
+RSS_BUDGET_BYTES = 64 * 1024 * 1024
+RSS_GROWTH_BUDGET = 1.25
+
+
+def _rss_child(streaming: str, paths: list[str]) -> None:
+    """
+    Proceso hijo de `_worker_peak_rss`: analiza `paths` en un worker del pool
+    supervisado y escribe en stdout el pico de RSS de sus workers, en bytes.
+    """
+    import resource
+
+    backend = functools.partial(synthetic_parse_replay, streaming=streaming == "1")
+    # Con timeout el lote pasa por el supervisor: el worker es un proceso propio
+    for item in run_batch([Path(p) for p in paths], jobs=1, backend=backend, timeout=600):
+        if item.error is not None:
+            raise RuntimeError(f"{item.path}: {item.error}")
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss va en KiB en Linux y en bytes en macOS
+    print(peak if sys.platform == "darwin" else peak * 1024)
+
+
+def _worker_peak_rss(paths: list[Path], streaming: bool) -> int:
+    """Pico de RSS de un worker del lote analizando `paths` (en un proceso nuevo, sin picos anteriores)."""
+    env = dict(os.environ)
+    root = str(Path(__file__).resolve().parent.parent)
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    code = "import sys; from rl_replay_analyzer.bench import _rss_child; _rss_child(sys.argv[1], sys.argv[2:])"
+    proc = subprocess.run(
+        [sys.executable, "-c", code, "1" if streaming else "0", *map(str, paths)],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Fallo al medir el RSS: {proc.stderr[-500:]}")
+    return int(proc.stdout.split()[-1])
+
+
+def bench_rss(quick: bool) -> dict:
+    """
+    Pico de RSS de un worker durante un lote, con frames en lista y en
+    streaming, a dos duraciones. Solo en sistemas con `resource` (no Windows).
+    """
+    try:
+        import resource  # noqa: F401
+    except ImportError:
+        return {"skipped": "resource no disponible en esta plataforma"}
+    short = 3000 if quick else 9000
+    lengths = (short, short * 4)
+    count = 2 if quick else 4
+    out: dict = {
+        "params": {"frames": list(lengths), "replays": count},
+        "budgets": {"peak_rss_bytes": RSS_BUDGET_BYTES, "growth": RSS_GROWTH_BUDGET},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        libraries = [write_replay_library(Path(tmp) / str(n), count, num_frames=n) for n in lengths]
+        for streaming in (False, True):
+            peaks = [_worker_peak_rss(paths, streaming) for paths in libraries]
+            entry = {"peak_rss_bytes": peaks, "growth": peaks[1] / peaks[0] if peaks[0] else 0.0}
+            if streaming:
+                entry["within_budget"] = max(peaks) <= RSS_BUDGET_BYTES and entry["growth"] <= RSS_GROWTH_BUDGET
+            out["streaming" if streaming else "materialized"] = entry
+    return out
+
+
+BENCHMARKS: dict[str, Callable[[bool], dict]] = {
+    "header": bench_header,
+    "goals": bench_goals,
+    "json": bench_json,
+    "batch": bench_batch,
+    "startup": bench_startup,
+    "memory": bench_memory,
+    "rss": bench_rss,
+    "netstream": bench_netstream,
+}
+
+
+def _over_budget(report: dict) -> list[str]:
+    """Escenarios con "within_budget": False en cualquier benchmark."""
+    failed = []
+    for bench_name, result in report["results"].items():
+        for key, value in result.items():
+            if isinstance(value, dict) and value.get("within_budget") is False:
+                failed.append(f"{bench_name}.{key}")
+    return failed
+
+
+def run(names: list[str] | None = None, quick: bool = False) -> dict:
+    """Ejecuta los benchmarks pedidos y devuelve el informe como dict."""
+    report = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": quick,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": {},
+    }
+    for name in names or list(BENCHMARKS):
+        report["results"][name] = BENCHMARKS[name](quick)
+    return report
+
+
+def main(argv: list[str] | None = None) -> int:
+    """CLI de los benchmarks. Retorna 0 en éxito, 1 en error."""
+    parser = argparse.ArgumentParser(description="Benchmarks del analizador con replays sintéticos.")
+    parser.add_argument("--quick", action="store_true", help="Tamaños reducidos (para comprobaciones rápidas)")
+    parser.add_argument(
+        "--only",
+        default=None,
+        help=f"Lista separada por comas de benchmarks a ejecutar ({', '.join(BENCHMARKS)})",
+    )
+    parser.add_argument("-o", "--output", type=Path, default=None, help="Archivo JSON de salida (por defecto: stdout)")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Termina con código 1 si algún benchmark con presupuesto (p. ej. startup) lo supera",
+    )
+    args = parser.parse_args(argv)
+
+    names = None
+    if args.only:
+        names = [n.strip() for n in args.only.split(",") if n.strip()]
+        unknown = [n for n in names if n not in BENCHMARKS]
+        if unknown:
+            parser.error(f"Benchmarks desconocidos: {', '.join(unknown)}")
+
+    report = run(names, quick=args.quick)
+    text = json.dumps(report, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        try:
+            args.output.write_text(text + "\n", encoding="utf-8")
+        except OSError as e:
+            print(f"Error: No se pudo escribir {args.output} - {e}", file=sys.stderr)
+            return 1
+        print(f"Resultados guardados en: {args.output}")
+    if args.check:
+        failed = _over_budget(report)
+        if failed:
+            print(f"Fuera de presupuesto: {', '.join(failed)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Caché persistente en disco de resultados de `extract_match_data`.
+
+La clave combina el SHA-256 de los bytes del replay con la versión del
+analizador (`rl_replay_analyzer.__version__`) y el modo, así que un replay
+sin cambios no vuelve a pasar por boxcars y una nueva versión invalida todo
+lo anterior. Cada entrada es un JSON pequeño; el tamaño total se limita
+expulsando primero las entradas usadas hace más tiempo (LRU por mtime).
+En el mismo directorio se guardan los flujos de eventos de
+`rl_replay_analyzer.events` (`get_blob`/`put_blob`), que comparten límite.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+from rl_replay_analyzer import __version__
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Al expulsar, bajar hasta este porcentaje del máximo para no reescanear en cada escritura
+_EVICT_TARGET = 0.9
+
+# Extensiones de las entradas: resultados (.json) y flujos de eventos (.events)
+_SUFFIXES = (".json", ".events")
+# Nombre de una entrada: clave (SHA-256 en hexadecimal) + extensión. El
+# directorio lo comparten otros estados (routes.sqlite, index.sqlite...) que
+# `clear` y la expulsión no deben tocar
+_ENTRY_NAME = re.compile(r"[0-9a-f]{64}(?:%s)" % "|".join(re.escape(s) for s in _SUFFIXES))
+
+# Temporales de `_write`. Los de un worker muerto a mitad de escritura se
+# quedan huérfanos: la expulsión y `clear` borran los de más de _STALE_TMP_S
+_TMP_PREFIX = "rlcache-"
+_TMP_SUFFIX = ".tmp"
+_STALE_TMP_S = 300.0
+
+
+def default_cache_dir() -> Path:
+    """Directorio por defecto: $RL_REPLAY_CACHE, o la carpeta de caché del usuario."""
+    env = os.environ.get("RL_REPLAY_CACHE")
+    if env:
+        return Path(env)
+    if os.name == "nt":
+        base = os.environ.get("LOCALAPPDATA") or Path.home() / "AppData" / "Local"
+        return Path(base) / "rl_replay_analyzer" / "cache"
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "rl_replay_analyzer"
+
+
+class ResultCache:
+    """
+    Caché de resultados direccionada por contenido.
+
+    Seguro de usar desde varios procesos a la vez: las escrituras son atómicas
+    (archivo temporal + os.replace) y una entrada que desaparece por la
+    expulsión de otro proceso cuenta simplemente como fallo.
+    """
+
+    def __init__(self, directory: str | Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._total_bytes: int | None = None
+
+    @staticmethod
+    def content_hash(data: bytes) -> str:
+        """SHA-256 de los bytes de un replay (independiente de la versión y el modo)."""
+        import hashlib
+
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def key_for_digest(digest: str, mode: str = "full") -> str:
+        """Clave de caché a partir de `content_hash`, sin volver a leer los bytes."""
+        import hashlib
+
+        return hashlib.sha256(f"{digest}\0{__version__}\0{mode}".encode()).hexdigest()
+
+    @classmethod
+    def key_for(cls, data: bytes, mode: str = "full") -> str:
+        """Clave de caché para los bytes de un replay."""
+        return cls.key_for_digest(cls.content_hash(data), mode)
+
+    def _entry_path(self, key: str, suffix: str = ".json") -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    def _touch(self, path: Path) -> None:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def get(self, key: str) -> dict | None:
+        """Devuelve el resultado guardado o None. Un acierto renueva su posición LRU."""
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                result = json.loads(f.read())
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self._touch(path)
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: dict) -> None:
+        """Guarda un resultado. Los errores de disco se ignoran: la caché es opcional."""
+        payload = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        self._write(self._entry_path(key), payload)
+
+    def get_blob(self, key: str, suffix: str) -> bytes | None:
+        """
+        Datos binarios auxiliares guardados con `put_blob` (p. ej. flujos de
+        eventos, suffix ".events"), o None. Comparten límite de tamaño y LRU
+        con los resultados, pero no cuentan como aciertos/fallos.
+        """
+        path = self._entry_path(key, suffix)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._touch(path)
+        return data
+
+    def put_blob(self, key: str, suffix: str, data: bytes) -> None:
+        """Guarda datos binarios auxiliares (ver `get_blob`)."""
+        if suffix not in _SUFFIXES:
+            raise ValueError(f"Sufijo de caché no admitido: {suffix!r}")
+        self._write(self._entry_path(key, suffix), data)
+
+    def _write(self, path: Path, payload: bytes) -> None:
+        """Escritura atómica (temporal + os.replace) y control del tamaño total."""
+        import tempfile
+
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=_TMP_PREFIX, suffix=_TMP_SUFFIX)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp, path)
+            except OSError:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                return
+        except OSError:
+            return
+        if self._total_bytes is None:
+            self._total_bytes = self._scan_total()
+        else:
+            self._total_bytes += len(payload)
+        if self._total_bytes > self.max_bytes:
+            self._evict()
+
+    def _entries(self) -> list[os.DirEntry]:
+        try:
+            return [e for e in os.scandir(self.directory) if _ENTRY_NAME.fullmatch(e.name)]
+        except OSError:
+            return []
+
+    def _scan_total(self) -> int:
+        total = 0
+        for e in self._entries():
+            try:
+                total += e.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _remove_stale_temps(self) -> None:
+        """Borra los temporales de escrituras abandonadas (los recientes pueden estar en curso)."""
+        cutoff = time.time() - _STALE_TMP_S
+        try:
+            temps = [e for e in os.scandir(self.directory) if e.name.startswith(_TMP_PREFIX) and e.name.endswith(_TMP_SUFFIX)]
+        except OSError:
+            return
+        for e in temps:
+            try:
+                if e.stat().st_mtime < cutoff:
+                    os.unlink(e.path)
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        """Borra las entradas menos usadas hasta quedar por debajo del máximo."""
+        self._remove_stale_temps()
+        stats = []
+        for e in self._entries():
+            try:
+                st = e.stat()
+            except OSError:
+                continue
+            stats.append((st.st_mtime, st.st_size, e.path))
+        stats.sort()
+        total = sum(size for _, size, _ in stats)
+        target = int(self.max_bytes * _EVICT_TARGET)
+        for _, size, path in stats:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        self._total_bytes = total
+
+    def clear(self) -> int:
+        """Vacía la caché. Retorna el número de entradas borradas."""
+        self._remove_stale_temps()
+        removed = 0
+        for e in self._entries():
+            try:
+                os.unlink(e.path)
+                removed += 1
+            except OSError:
+                pass
+        self._total_bytes = 0
+        return removed
+
+    def stats(self) -> dict:
+        """Contadores de uso de esta instancia."""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,169 @@
+"""
+Detección barata de replays duplicados antes del análisis completo.
+
+Las carpetas de replays acumulan el mismo partido muchas veces (la subida de
+cada jugador, copias, re-exportaciones). Aquí se agrupan sin decodificar
+frames de red, de menos a más caro:
+
+1. tamaño del archivo (un stat; un tamaño único no puede tener duplicados);
+2. huella de los archivos con tamaño repetido: Id del replay
+   (`header_fallback.parse_header` con keys={"Id"}), tamaño y un hash BLAKE2
+   del header completo más los primeros y los últimos SAMPLE_BYTES del
+   cuerpo, leídos con mmap;
+3. solo entre archivos con la misma huella, un hash BLAKE2 del contenido
+   completo: la huella no ve el centro del stream de red, así que no basta
+   para dar dos archivos por iguales.
+
+Dos archivos con el mismo contenido son el mismo replay: `run_batch`
+(con `dedup=True`) analiza solo el primero de cada grupo y reparte su
+resultado al resto. El subcomando `dedup` muestra los grupos de una carpeta.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+from rl_replay_analyzer.header_fallback import _header_bounds, parse_header
+from rl_replay_analyzer.header_view import HeaderView
+
+# Bytes del cuerpo que entran en la huella, al principio y al final
+SAMPLE_BYTES = 64 * 1024
+
+
+class Fingerprint(NamedTuple):
+    """Huella de un replay: Id del header, tamaño y hash de header + muestras del cuerpo."""
+
+    replay_id: str | None
+    size: int
+    digest: str
+
+
+def fingerprint(path: str | Path, sample: int = SAMPLE_BYTES) -> Fingerprint:
+    """
+    Huella de un replay, leyendo solo el header y `sample` bytes a cada extremo del cuerpo.
+
+    Raises:
+        OSError: No se puede leer el archivo.
+        ValueError: Header inválido o archivo vacío.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # archivo vacío: mmap no admite longitud 0
+            raise ValueError("Archivo demasiado corto") from None
+        try:
+            view = memoryview(mm)
+            try:
+                replay_id = HeaderView(parse_header(view, keys=("Id",))).string("Id")
+                _, _, header_end = _header_bounds(view)
+                h = hashlib.blake2b(digest_size=16)
+                h.update(view[:header_end])
+                h.update(view[header_end : header_end + sample])
+                h.update(view[max(header_end + sample, size - sample) :])
+                digest = h.hexdigest()
+            finally:
+                view.release()
+        finally:
+            mm.close()
+    return Fingerprint(replay_id, size, digest)
+
+
+def content_digest(path: str | Path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Hash BLAKE2 del archivo completo, leído por bloques.
+
+    Raises:
+        OSError: No se puede leer el archivo.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def group_duplicates(paths: Iterable[Path]) -> list[list[Path]]:
+    """
+    Agrupa los replays idénticos.
+
+    Returns:
+        Un grupo por replay distinto, en el orden de entrada: el primer
+        elemento es el representante y el resto sus duplicados. Los archivos
+        que no se pueden leer o cuyo header es inválido quedan solos (el
+        análisis informará del error).
+    """
+    paths = list(paths)
+    by_size: dict[int, list[int]] = {}
+    for i, p in enumerate(paths):
+        try:
+            by_size.setdefault(os.stat(p).st_size, []).append(i)
+        except OSError:
+            continue
+
+    # Índice del representante de cada ruta (solo para las que tienen duplicados)
+    leader: dict[int, int] = {}
+    for indices in by_size.values():
+        if len(indices) < 2:
+            continue
+        by_fingerprint: dict[Fingerprint, list[int]] = {}
+        for i in indices:
+            try:
+                by_fingerprint.setdefault(fingerprint(paths[i]), []).append(i)
+            except (OSError, ValueError):
+                continue
+        for candidates in by_fingerprint.values():
+            if len(candidates) < 2:
+                continue
+            # Misma huella: se confirma con el contenido completo
+            seen: dict[str, int] = {}
+            for i in candidates:
+                try:
+                    digest = content_digest(paths[i])
+                except OSError:
+                    continue
+                leader[i] = seen.setdefault(digest, i)
+
+    groups: dict[int, list[Path]] = {}
+    for i, p in enumerate(paths):
+        groups.setdefault(leader.get(i, i), []).append(p)
+    return list(groups.values())
+
+
+def dedup_report(paths: Iterable[Path]) -> dict:
+    """
+    Resumen de duplicados: grupos con más de un archivo y bytes que se ahorran.
+
+    Returns:
+        {"files": n, "unique": n, "duplicates": n, "duplicate_bytes": n,
+         "groups": [{"keep": ruta, "duplicates": [rutas], "replay_id": str | None, "size": n}]}
+    """
+    paths = list(paths)
+    groups = group_duplicates(paths)
+    out_groups = []
+    duplicate_bytes = 0
+    for group in groups:
+        if len(group) < 2:
+            continue
+        try:
+            fp = fingerprint(group[0])
+        except (OSError, ValueError):
+            continue
+        duplicate_bytes += fp.size * (len(group) - 1)
+        out_groups.append(
+            {"keep": str(group[0]), "duplicates": [str(p) for p in group[1:]], "replay_id": fp.replay_id, "size": fp.size}
+        )
+    return {
+        "files": len(paths),
+        "unique": len(groups),
+        "duplicates": len(paths) - len(groups),
+        "duplicate_bytes": duplicate_bytes,
+        "groups": out_groups,
+    }
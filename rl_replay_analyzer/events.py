@@ -0,0 +1,221 @@
+"""
+Caché de flujos de eventos relevantes, para re-extraer sin volver a decodificar.
+
+El paso caro del análisis completo es `parse_replay` del backend; de todas
+las `updated_actors` los extractores solo miran unos pocos objetos. Durante
+la pasada normal, `EventRecorder` guarda las actualizaciones de los objetos
+que usa algún extractor registrado (`recorded_names`): frame, objeto y
+atributo. El `EventStream` resultante se guarda comprimido en la caché de
+resultados bajo el hash del contenido del replay (sin la versión del
+analizador), así que cuando cambia la lógica de extracción, o se piden otros
+extractores, el resultado se recalcula desde el flujo en milisegundos.
+
+Un flujo solo sirve si contiene todos los objetos que necesitan los
+extractores pedidos (`EventStream.covers`); si no, se decodifica el replay
+completo y se graba un flujo nuevo con los nombres registrados en ese momento.
+"""
+
+from __future__ import annotations
+
+import json
+import zlib
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING
+
+from rl_replay_analyzer.extractors import MATCH_ENDED, Extractor, Handler, available_extractors, extractor_class
+from rl_replay_analyzer.objects import ObjectIndex
+
+if TYPE_CHECKING:
+    from rl_replay_analyzer.cache import ResultCache
+
+# Versión del formato serializado; un flujo de otra versión cuenta como fallo
+EVENTS_VERSION = 1
+
+_EMPTY_FRAME: dict = {}
+
+
+def recorded_names() -> tuple[str, ...]:
+    """Objetos que usa algún extractor registrado (más bMatchEnded)."""
+    names = {MATCH_ENDED}
+    for name in available_extractors():
+        cls = extractor_class(name)
+        names.update(cls.object_names)
+        names.update(cls.reference_names)
+    return tuple(sorted(names))
+
+
+class EventStream:
+    """
+    Actualizaciones relevantes de un replay, en columnas.
+
+    Atributos:
+        names: Nombres de objeto grabados.
+        ids: object_id original de cada nombre (None si el replay no lo tenía).
+        frames_total: Frames recorridos al grabar.
+        ended: Si el recorrido terminó en bMatchEnded (no llegó al final del stream).
+        frame, name, attrs: Por evento, el frame, el índice en `names` y el
+            dict `attribute`.
+    """
+
+    __slots__ = ("names", "ids", "frames_total", "ended", "frame", "name", "attrs")
+
+    def __init__(
+        self,
+        names: tuple[str, ...],
+        ids: list[int | None],
+        frames_total: int,
+        ended: bool,
+        frame: array,
+        name: array,
+        attrs: list[dict],
+    ):
+        self.names = names
+        self.ids = ids
+        self.frames_total = frames_total
+        self.ended = ended
+        self.frame = frame
+        self.name = name
+        self.attrs = attrs
+
+    def __len__(self) -> int:
+        return len(self.attrs)
+
+    def covers(self, extractors: Iterable[str]) -> bool:
+        """True si el flujo basta para ejecutar los extractores de esos nombres."""
+        recorded = set(self.names)
+        for name in extractors:
+            cls = extractor_class(name)
+            if not recorded.issuperset(cls.object_names) or not recorded.issuperset(cls.reference_names):
+                return False
+            if self.ended and not cls.stop_at_match_end:
+                return False
+        return True
+
+    def object_index(self) -> ObjectIndex:
+        """Índice nombre → object_id original, para `run_extractors`."""
+        return ObjectIndex({n: oid for n, oid in zip(self.names, self.ids) if oid is not None})
+
+    def iter_frames(self) -> Iterator[dict]:
+        """Reconstruye los frames (solo con las actualizaciones grabadas), uno a uno."""
+        ids = self.ids
+        k = 0
+        n = len(self.attrs)
+        for f in range(self.frames_total):
+            if k >= n or self.frame[k] != f:
+                yield _EMPTY_FRAME
+                continue
+            updated = []
+            while k < n and self.frame[k] == f:
+                updated.append({"object_id": ids[self.name[k]], "attribute": self.attrs[k]})
+                k += 1
+            yield {"updated_actors": updated}
+
+    def to_replay_dict(self) -> dict:
+        """Replay mínimo (solo network_frames, en streaming) para `extract_match_data`."""
+        return {"network_frames": {"frames": self.iter_frames()}}
+
+    def dumps(self) -> bytes:
+        """Serializa el flujo (JSON comprimido con zlib)."""
+        payload = {
+            "version": EVENTS_VERSION,
+            "names": list(self.names),
+            "ids": self.ids,
+            "frames_total": self.frames_total,
+            "ended": self.ended,
+            "frame": self.frame.tolist(),
+            "name": self.name.tolist(),
+            "attrs": self.attrs,
+        }
+        return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 1)
+
+    @classmethod
+    def loads(cls, data: bytes) -> EventStream:
+        """
+        Lee un flujo serializado con `dumps`.
+
+        Raises:
+            ValueError: Datos corruptos o de otra versión del formato.
+        """
+        try:
+            payload = json.loads(zlib.decompress(data))
+        except zlib.error as e:
+            raise ValueError(f"Flujo de eventos corrupto: {e}") from e
+        if not isinstance(payload, dict) or payload.get("version") != EVENTS_VERSION:
+            raise ValueError("Flujo de eventos de otra versión")
+        try:
+            return cls(
+                tuple(payload["names"]),
+                list(payload["ids"]),
+                int(payload["frames_total"]),
+                bool(payload["ended"]),
+                array("i", payload["frame"]),
+                array("H", payload["name"]),
+                list(payload["attrs"]),
+            )
+        except (KeyError, TypeError, OverflowError) as e:
+            raise ValueError(f"Flujo de eventos corrupto: {e}") from e
+
+
+class EventRecorder(Extractor):
+    """
+    Extractor interno (no registrado) que graba las actualizaciones de `names`.
+
+    Se añade a la pasada normal; su resultado es un `EventStream`.
+    """
+
+    name = "_events"
+    json_result = False
+
+    def __init__(self, names: Iterable[str] | None = None):
+        self.names = tuple(names) if names is not None else recorded_names()
+        self.object_names = self.names
+        self.ids: list[int | None] = [None] * len(self.names)
+        self.current_frame = 0
+        self.frame = array("i")
+        self.name_col = array("H")
+        self.attrs: list[dict] = []
+
+    def bind(self, ids: dict[str, int | None]) -> dict[int, Handler] | None:
+        self.ids = [ids[n] for n in self.names]
+        table = {}
+        for i, oid in enumerate(self.ids):
+            if oid is not None and oid not in table:
+                table[oid] = self._handler(i)
+        return table
+
+    def _handler(self, i: int) -> Handler:
+        frame, name_col, attrs = self.frame, self.name_col, self.attrs
+
+        def _record(attr: dict) -> None:
+            frame.append(self.current_frame)
+            name_col.append(i)
+            attrs.append(attr)
+
+        return _record
+
+    def end_frame(self, frame_index: int) -> None:
+        self.current_frame = frame_index + 1
+
+    def result(self) -> EventStream:
+        ended = False
+        if MATCH_ENDED in self.names:
+            ended_i = self.names.index(MATCH_ENDED)
+            ended = any(n == ended_i and a.get("Boolean") is True for n, a in zip(self.name_col, self.attrs))
+        return EventStream(self.names, self.ids, self.current_frame, ended, self.frame, self.name_col, self.attrs)
+
+
+def load_events(cache: ResultCache, digest: str) -> EventStream | None:
+    """Flujo guardado para el replay con hash `digest`, o None (ausente, corrupto u obsoleto)."""
+    data = cache.get_blob(digest, ".events")
+    if data is None:
+        return None
+    try:
+        return EventStream.loads(data)
+    except ValueError:
+        return None
+
+
+def save_events(cache: ResultCache, digest: str, stream: EventStream) -> None:
+    """Guarda el flujo del replay con hash `digest` (los errores de disco se ignoran)."""
+    cache.put_blob(digest, ".events", stream.dumps())
@@ -0,0 +1,384 @@
+"""
+Extractores de eventos del stream de red, ejecutados en una sola pasada.
+
+Cada extractor declara los nombres de objeto cuyas actualizaciones le
+interesan (`object_names`, p. ej. "TAGame.GameEvent_Soccar_TA:SecondsRemaining")
+y los que solo necesita traducir a object_id (`reference_names`, p. ej.
+"StatEvents.Events.Goal"). `run_extractors` resuelve los ids una vez, monta
+una tabla object_id → handler con los de todos los extractores y recorre los
+frames una única vez: añadir N estadísticas cuesta una pasada, no N.
+
+Para añadir uno basta con registrarlo:
+
+    @register
+    class DemosExtractor(Extractor):
+        name = "demos"
+        object_names = ("TAGame.Car_TA:ReplicatedDemolish",)
+
+        def bind(self, ids):
+            oid = ids[self.object_names[0]]
+            return {oid: self.on_demolish} if oid is not None else None
+        ...
+
+y pedirlo por nombre (`extract_match_data(..., extractors=("demos",))` o
+`--extract demos` en la CLI).
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+from typing import Any, Callable
+
+from rl_replay_analyzer.objects import ObjectIndex, object_index
+from rl_replay_analyzer.stats import StageStats
+
+# Nombres de objetos del stream de red que usan los extractores incluidos
+SECONDS_REMAINING = "TAGame.GameEvent_Soccar_TA:SecondsRemaining"
+STAT_EVENT = "TAGame.GameEvent_Soccar_TA:ReplicatedStatEvent"
+SCORED_ON_TEAM = "TAGame.GameEvent_Soccar_TA:ReplicatedScoredOnTeam"
+MATCH_ENDED = "TAGame.GameEvent_Soccar_TA:bMatchEnded"
+OVERTIME = "TAGame.GameEvent_Soccar_TA:bOverTime"
+GOAL_EVENT = "StatEvents.Events.Goal"
+
+Handler = Callable[[dict], None]
+
+
+class Extractor:
+    """
+    Base de los extractores. Una instancia por replay.
+
+    Atributos de clase:
+        name: Nombre con el que se registra y se pide.
+        object_names: Objetos cuyas actualizaciones recibe el extractor.
+        reference_names: Objetos que solo necesita resolver a object_id.
+        stop_at_match_end: Si basta con recorrer hasta bMatchEnded. El recorrido
+            termina antes solo si todos los extractores activos lo permiten.
+        json_result: False si `result()` no es serializable a JSON (p. ej.
+            columnas binarias); entonces el análisis no pasa por la caché.
+    """
+
+    name: str = ""
+    object_names: tuple[str, ...] = ()
+    reference_names: tuple[str, ...] = ()
+    stop_at_match_end: bool = True
+    json_result: bool = True
+
+    def bind(self, ids: dict[str, int | None]) -> dict[int, Handler] | None:
+        """
+        Recibe los object_id de `object_names` y `reference_names` (None si el
+        replay no tiene ese objeto) y devuelve la tabla object_id → handler.
+        Cada handler recibe el dict `attribute` de la actualización.
+
+        Returns:
+            La tabla, o None si al replay le faltan objetos imprescindibles
+            (el extractor queda inactivo y devuelve su resultado vacío).
+        """
+        raise NotImplementedError
+
+    def end_frame(self, frame_index: int) -> None:
+        """Se llama al final de cada frame, solo si la subclase lo redefine."""
+
+    def result(self) -> Any:
+        """Resultado del extractor tras el recorrido (serializable a JSON salvo `json_result = False`)."""
+        raise NotImplementedError
+
+
+_REGISTRY: dict[str, type[Extractor]] = {}
+
+# Extractores incluidos que viven en su propio módulo: se importan (y con ello
+# se registran) solo cuando alguien los pide
+_LAZY_MODULES = {"timeline": "rl_replay_analyzer.timeline"}
+
+
+def register(cls: type[Extractor]) -> type[Extractor]:
+    """
+    Registra una clase de extractor por su `name` (usable como decorador).
+
+    Raises:
+        ValueError: Sin nombre o nombre ya registrado por otra clase.
+    """
+    if not cls.name:
+        raise ValueError(f"El extractor {cls.__name__} no define name")
+    current = _REGISTRY.get(cls.name)
+    if current is not None and current is not cls:
+        raise ValueError(f"Ya hay un extractor registrado como {cls.name!r}: {current.__name__}")
+    _REGISTRY[cls.name] = cls
+    return cls
+
+
+def available_extractors() -> list[str]:
+    """Nombres de los extractores registrados (incluidos los que aún no se han importado)."""
+    return sorted({*_REGISTRY, *_LAZY_MODULES})
+
+
+def extractor_class(name: str) -> type[Extractor]:
+    """
+    Clase registrada como `name`, importando su módulo si hace falta.
+
+    Raises:
+        ValueError: El nombre no está registrado.
+    """
+    cls = _REGISTRY.get(name)
+    if cls is None and name in _LAZY_MODULES:
+        import importlib
+
+        importlib.import_module(_LAZY_MODULES[name])
+        cls = _REGISTRY.get(name)
+    if cls is None:
+        raise ValueError(f"Extractor desconocido: {name!r} (disponibles: {', '.join(available_extractors())})")
+    return cls
+
+
+def create_extractors(names: Iterable[str]) -> list[Extractor]:
+    """
+    Instancia los extractores pedidos, en orden y sin duplicados.
+
+    Raises:
+        ValueError: Algún nombre no está registrado.
+    """
+    out: list[Extractor] = []
+    seen: set[str] = set()
+    for name in names:
+        cls = extractor_class(name)
+        if name not in seen:
+            seen.add(name)
+            out.append(cls())
+    return out
+
+
+def replay_object_index(replay_dict: dict) -> ObjectIndex:
+    """Índice nombre → object_id del replay (memoizado entre tablas idénticas)."""
+    return object_index(replay_dict.get("objects") or replay_dict.get("names") or [])
+
+
+def frame_source(replay_dict: dict) -> Iterable | None:
+    """
+    Secuencia de frames del replay: `network_frames.frames`,
+    `network_frames["frames"]` o el propio `network_frames` si es un iterador.
+    """
+    nf = replay_dict.get("network_frames")
+    if nf is None:
+        return None
+    if isinstance(nf, Iterator):
+        return nf
+    return getattr(nf, "frames", None) or (nf.get("frames") if isinstance(nf, dict) else None)
+
+
+def _drain(frames: list) -> Iterator:
+    """Recorre una lista de frames soltando cada uno en cuanto se entrega."""
+    for i in range(len(frames)):
+        frame = frames[i]
+        frames[i] = None
+        yield frame
+
+
+def _fan_out(handlers: list[Handler]) -> Handler:
+    """Un handler que reparte la actualización entre varios extractores."""
+
+    def _call(attr: dict) -> None:
+        for handler in handlers:
+            handler(attr)
+
+    return _call
+
+
+class _MatchEnd:
+    """Vigila bMatchEnded para cortar el recorrido."""
+
+    __slots__ = ("ended",)
+
+    def __init__(self):
+        self.ended = False
+
+    def on_match_ended(self, attr: dict) -> None:
+        if attr.get("Boolean") is True:
+            self.ended = True
+
+
+def run_extractors(
+    replay_dict: dict,
+    extractors: list[Extractor],
+    index: ObjectIndex | None = None,
+    stats: StageStats | None = None,
+    consume: bool = False,
+    stop_at_match_end: bool = True,
+) -> dict[str, Any]:
+    """
+    Recorre los frames del replay una sola vez alimentando a todos los extractores.
+
+    Cada actualización se enruta con una tabla object_id → handler construida
+    una vez, y el resto se descarta con una única búsqueda en dict. Con
+    `stop_at_match_end`, el recorrido termina en cuanto `bMatchEnded` pasa a
+    True si todos los extractores activos lo permiten.
+
+    Args:
+        replay_dict: Replay como dict (ver `parser._replay_to_dict`).
+        extractors: Instancias a alimentar (ver `create_extractors`).
+        index: Índice de objetos ya construido para el replay.
+        stats: Cuenta frames recorridos y updated_actors visitados.
+        consume: Vaciar la lista de frames a medida que se recorre (cada frame
+            se libera tras procesarlo; el replay queda inservible después).
+        stop_at_match_end: Permitir el corte en bMatchEnded.
+
+    Returns:
+        Dict nombre del extractor → `result()`.
+    """
+    frames = frame_source(replay_dict)
+    if not frames or not extractors:
+        return {ex.name: ex.result() for ex in extractors}
+
+    if index is None:
+        index = replay_object_index(replay_dict)
+
+    routes: dict[int, list[Handler]] = {}
+    active: list[Extractor] = []
+    for ex in extractors:
+        ids = {name: index.get(name) for name in (*ex.object_names, *ex.reference_names)}
+        table = ex.bind(ids)
+        if table is None:
+            continue
+        active.append(ex)
+        for oid, handler in table.items():
+            routes.setdefault(oid, []).append(handler)
+    if not active:
+        return {ex.name: ex.result() for ex in extractors}
+
+    match_end = _MatchEnd()
+    match_ended_oid = index.get(MATCH_ENDED)
+    if stop_at_match_end and match_ended_oid is not None and all(ex.stop_at_match_end for ex in active):
+        routes.setdefault(match_ended_oid, []).append(match_end.on_match_ended)
+
+    handlers = {oid: hs[0] if len(hs) == 1 else _fan_out(hs) for oid, hs in routes.items()}
+    get_handler = handlers.get
+    frame_hooks = [ex.end_frame for ex in active if type(ex).end_frame is not Extractor.end_frame]
+    if consume and isinstance(frames, list):
+        frames = _drain(frames)
+
+    frames_scanned = 0
+    actors_visited = 0
+    for frame in frames:
+        updated = frame.get("updated_actors") if isinstance(frame, dict) else None
+        if updated:
+            actors_visited += len(updated)
+            for ua in updated:
+                handler = get_handler(ua.get("object_id"))
+                if handler is not None:
+                    attr = ua.get("attribute")
+                    if isinstance(attr, dict):
+                        handler(attr)
+        for hook in frame_hooks:
+            hook(frames_scanned)
+        frames_scanned += 1
+        if match_end.ended:
+            break
+
+    if stats is not None:
+        stats.count("frames_scanned", frames_scanned)
+        stats.count("updated_actors_visited", actors_visited)
+    return {ex.name: ex.result() for ex in extractors}
+
+
+@register
+class GoalsExtractor(Extractor):
+    """
+    Goles con el tiempo EXACTO del marcador, leídos del stream de red.
+
+    Forma robusta (comprobada en replays reales):
+    - El tiempo REAL del marcador está en actualizaciones de
+      `TAGame.GameEvent_Soccar_TA:SecondsRemaining` (attribute `Int`).
+    - El gol se detecta cuando `TAGame.GameEvent_Soccar_TA:ReplicatedStatEvent`
+      publica `StatEvents.Events.Goal`.
+    - El equipo se obtiene del atributo `Byte` de
+      `TAGame.GameEvent_Soccar_TA:ReplicatedScoredOnTeam` (0/1).
+
+    Un gol se registra con el estado del marcador al final de su frame.
+    Resultado: lista de {"seconds_remaining": int, "team_index": int | None}
+    en orden cronológico del partido (primer gol primero).
+    """
+
+    name = "goals"
+    object_names = (SECONDS_REMAINING, STAT_EVENT, SCORED_ON_TEAM)
+    reference_names = (GOAL_EVENT,)
+
+    def __init__(self):
+        self.seconds_remaining: int | None = None
+        self.team_index: int | None = None
+        self.goal_in_frame = False
+        self.goal_event_oid: int | None = None
+        self.goals: list[dict] = []
+
+    def bind(self, ids: dict[str, int | None]) -> dict[int, Handler] | None:
+        seconds_oid = ids[SECONDS_REMAINING]
+        stat_oid = ids[STAT_EVENT]
+        self.goal_event_oid = ids[GOAL_EVENT]
+        if seconds_oid is None or stat_oid is None or self.goal_event_oid is None:
+            return None
+        table = {seconds_oid: self.on_seconds_remaining, stat_oid: self.on_stat_event}
+        if ids[SCORED_ON_TEAM] is not None:
+            table[ids[SCORED_ON_TEAM]] = self.on_scored_on_team
+        return table
+
+    def on_seconds_remaining(self, attr: dict) -> None:
+        # SecondsRemaining suele venir como Int
+        v = attr.get("Int")
+        if isinstance(v, int):
+            self.seconds_remaining = v
+            return
+        v = attr.get("Float")
+        if isinstance(v, (int, float)):
+            self.seconds_remaining = int(v)
+
+    def on_scored_on_team(self, attr: dict) -> None:
+        # En la práctica, en este replay el Byte ya viene como
+        # índice del equipo que anota: 0 = Local, 1 = Visitante.
+        v = attr.get("Byte")
+        if not isinstance(v, int):
+            v = attr.get("Int")
+        if isinstance(v, int) and v in (0, 1):
+            self.team_index = v
+
+    def on_stat_event(self, attr: dict) -> None:
+        # Detectar goal por ReplicatedStatEvent -> StatEvents.Events.Goal
+        se = attr.get("StatEvent")
+        if isinstance(se, dict) and se.get("object_id") == self.goal_event_oid:
+            self.goal_in_frame = True
+
+    def end_frame(self, frame_index: int) -> None:
+        if self.goal_in_frame:
+            self.goal_in_frame = False
+            if self.seconds_remaining is not None:
+                self.goals.append({"seconds_remaining": self.seconds_remaining, "team_index": self.team_index})
+
+    def result(self) -> list[dict]:
+        return sorted(self.goals, key=lambda g: g["seconds_remaining"], reverse=True)
+
+
+@register
+class OvertimeExtractor(Extractor):
+    """
+    Inicio de la prórroga (`bOverTime` pasa a True).
+
+    Resultado: {"overtime": bool, "frame": índice del frame o None}.
+    """
+
+    name = "overtime"
+    object_names = (OVERTIME,)
+
+    def __init__(self):
+        self.started = False
+        self.frame: int | None = None
+
+    def bind(self, ids: dict[str, int | None]) -> dict[int, Handler] | None:
+        oid = ids[OVERTIME]
+        return {oid: self.on_overtime} if oid is not None else None
+
+    def on_overtime(self, attr: dict) -> None:
+        if attr.get("Boolean") is True:
+            self.started = True
+
+    def end_frame(self, frame_index: int) -> None:
+        if self.started and self.frame is None:
+            self.frame = frame_index
+
+    def result(self) -> dict:
+        return {"overtime": self.started, "frame": self.frame}
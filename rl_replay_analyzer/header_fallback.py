@@ -8,47 +8,93 @@ TeamNames y Goals para poder dar un resultado útil.
 
 from __future__ import annotations
 
+import mmap
 import struct
-from typing import Any
+from pathlib import Path
+from typing import Any, Callable, Iterable
 
 
 class _Stream:
-    """Lectura little-endian sobre bytes."""
+    """
+    Lectura little-endian sobre un buffer (bytes, memoryview o mmap) sin copias.
+
+    Trabaja con un desplazamiento dentro de [start, end) del buffer original:
+    `read` devuelve vistas (memoryview) y los strings se decodifican desde la
+    vista, así que el header nunca se copia a un buffer intermedio.
+    """
 
-    __slots__ = ("_buf", "_pos")
+    __slots__ = ("_buf", "_pos", "_end")
 
-    def __init__(self, data: bytes):
-        self._buf = data
-        self._pos = 0
+    def __init__(self, data, start: int = 0, end: int | None = None):
+        self._buf = data if isinstance(data, memoryview) else memoryview(data)
+        self._pos = start
+        self._end = len(self._buf) if end is None else end
 
     def remaining(self) -> int:
-        return len(self._buf) - self._pos
+        return self._end - self._pos
 
-    def read(self, n: int) -> bytes:
-        if self._pos + n > len(self._buf):
+    def tell(self) -> int:
+        """Desplazamiento actual dentro del buffer original."""
+        return self._pos
+
+    def _need(self, n: int) -> None:
+        if self._pos + n > self._end:
             raise ValueError("Fin de datos del header")
+
+    def read(self, n: int) -> memoryview:
+        self._need(n)
         out = self._buf[self._pos : self._pos + n]
         self._pos += n
         return out
 
     def read_i32(self) -> int:
-        val = struct.unpack_from("<i", self._buf, self._pos)[0]
+        self._need(4)
+        val = _I32.unpack_from(self._buf, self._pos)[0]
         self._pos += 4
         return val
 
     def read_u32(self) -> int:
-        val = struct.unpack_from("<I", self._buf, self._pos)[0]
+        self._need(4)
+        val = _U32.unpack_from(self._buf, self._pos)[0]
         self._pos += 4
         return val
 
     def read_f32(self) -> float:
+        self._need(4)
+        val = _F32.unpack_from(self._buf, self._pos)[0]
         self._pos += 4
-        return struct.unpack_from("<f", self._buf, self._pos - 4)[0]
+        return val
+
+    def read_u8(self) -> int:
+        self._need(1)
+        val = self._buf[self._pos]
+        self._pos += 1
+        return val
+
+    def read_str(self, n: int, encoding: str, strip: int) -> str:
+        """Decodifica n bytes como `encoding`, quitando `strip` bytes nulos finales."""
+        self._need(n)
+        start = self._pos
+        end = start + n
+        self._pos = end
+        buf = self._buf
+        if strip and n >= strip and not any(buf[end - strip : end]):
+            end -= strip
+        return str(buf[start:end], encoding, "replace")
 
     def advance(self, n: int) -> None:
         self._pos += n
 
 
+_I32 = struct.Struct("<i")
+_U32 = struct.Struct("<I")
+_F32 = struct.Struct("<f")
+
+
+# Claves que cierran un bloque de propiedades
+_END_KEYS = frozenset(("None", "\x00\x00\x00None", ""))
+
+
 def _read_string8(s: _Stream) -> str:
     """String8: UInt32 length, luego length bytes UTF-8."""
     length = s.read_u32()
@@ -56,10 +102,7 @@ def _read_string8(s: _Stream) -> str:
         return ""
     if length > s.remaining() or length > 50000:
         raise ValueError("Longitud de string inválida")
-    raw = s.read(length)
-    if raw and raw[-1:] == b"\x00":
-        raw = raw[:-1]
-    return raw.decode("utf-8", errors="replace")
+    return s.read_str(length, "utf-8", 1)
 
 
 def _read_string16(s: _Stream) -> str:
@@ -70,64 +113,71 @@ def _read_string16(s: _Stream) -> str:
     if length > 0:
         if length > s.remaining() or length > 50000:
             raise ValueError("Longitud string16 inválida")
-        raw = s.read(length)
-        if raw and raw[-1:] == b"\x00":
-            raw = raw[:-1]
-        return raw.decode("windows-1252", errors="replace")
+        return s.read_str(length, "windows-1252", 1)
     byte_count = (-length) * 2
     if byte_count > s.remaining() or byte_count > 50000:
         raise ValueError("Longitud string16 inválida")
-    raw = s.read(byte_count)
-    if len(raw) >= 2 and raw[-2:] == b"\x00\x00":
-        raw = raw[:-2]
-    return raw.decode("utf-16-le", errors="replace")
+    return s.read_str(byte_count, "utf-16-le", 2)
 
 
-def _skip_property_value(s: _Stream, prop_type: str) -> None:
-    """Avanza el stream sin guardar el valor (para saltar StructProperty, etc.)."""
-    if prop_type == "IntProperty":
-        s.advance(4)
-        return
-    if prop_type == "FloatProperty":
-        s.advance(4)
-        return
-    if prop_type in ("StrProperty", "NameProperty"):
-        _ = _read_string16(s)
-        return
-    if prop_type == "BoolProperty":
-        s.advance(1)
-        return
-    if prop_type == "QWordProperty":
-        s.advance(8)
-        return
-    if prop_type in ("ByteProperty", "EnumProperty"):
-        s.advance(1)
-        return
-    if prop_type == "ArrayProperty":
-        count = s.read_u32()
-        if count > 100000:
-            raise ValueError("Array demasiado grande")
-        for _ in range(count):
-            _skip_properties(s)
-        return
-    if prop_type == "StructProperty":
-        # Nombre del tipo de struct (String16): Int32 length + bytes
-        length = s.read_i32()
-        if length > 0 and length < 50000:
-            s.advance(length)
-        elif length < 0 and length > -50000:
-            s.advance((-length) * 2)
-        else:
-            try:
-                _ = _read_string16(s)
-            except ValueError:
-                pass
+def _skip_fixed(n: int) -> Callable[[_Stream], None]:
+    def _skip(s: _Stream) -> None:
+        s.advance(n)
+
+    return _skip
+
+
+def _skip_string16(s: _Stream) -> None:
+    _read_string16(s)
+
+
+def _skip_array(s: _Stream) -> None:
+    count = s.read_u32()
+    if count > 100000:
+        raise ValueError("Array demasiado grande")
+    for _ in range(count):
+        _skip_properties(s)
+
+
+def _skip_struct(s: _Stream) -> None:
+    # Nombre del tipo de struct (String16): Int32 length + bytes
+    length = s.read_i32()
+    if length > 0 and length < 50000:
+        s.advance(length)
+    elif length < 0 and length > -50000:
+        s.advance((-length) * 2)
+    else:
         try:
-            _skip_properties(s)
+            _ = _read_string16(s)
         except ValueError:
             pass
-        return
-    raise ValueError(f"Tipo de propiedad no soportado al saltar: {prop_type!r}")
+    try:
+        _skip_properties(s)
+    except ValueError:
+        pass
+
+
+# Tabla tipo → función que salta el valor sin decodificarlo
+_SKIPPERS: dict[str, Callable[[_Stream], None]] = {
+    "IntProperty": _skip_fixed(4),
+    "FloatProperty": _skip_fixed(4),
+    "StrProperty": _skip_string16,
+    "NameProperty": _skip_string16,
+    "BoolProperty": _skip_fixed(1),
+    "QWordProperty": _skip_fixed(8),
+    "ByteProperty": _skip_fixed(1),
+    "EnumProperty": _skip_fixed(1),
+    "ArrayProperty": _skip_array,
+    "StructProperty": _skip_struct,
+}
+
+
+def _skip_property_value(s: _Stream, prop_type: str) -> None:
+    """Avanza el stream sin guardar el valor (para saltar StructProperty, etc.)."""
+    skipper = _SKIPPERS.get(prop_type)
+    if skipper is None:
+        raise ValueError(f"Tipo de propiedad no soportado al saltar: {prop_type!r}")
+    skipper(s)
 
 
 def _skip_properties(s: _Stream) -> None:
@@ -137,7 +187,7 @@ def _skip_properties(s: _Stream) -> None:
             key = _read_string8(s)
         except ValueError:
             break
-        if key in ("None", "\x00\x00\x00None", ""):
+        if key in _END_KEYS:
             break
         try:
             prop_type = _read_string8(s)
@@ -150,31 +200,27 @@ def _skip_properties(s: _Stream) -> None:
             break
 
 
+def _read_none(n: int) -> Callable[[_Stream], Any]:
+    """Lector para tipos que no nos interesan: avanza n bytes y devuelve None."""
+
+    def _read(s: _Stream) -> None:
+        s.advance(n)
+        return None
+
+    return _read
+
+
+def _read_struct(s: _Stream) -> list[tuple[str, Any]]:
+    _ = _read_string16(s)
+    return _read_properties(s)
+
+
 def _read_property_value(s: _Stream, prop_type: str) -> Any:
     """Lee el valor de una propiedad (solo tipos que nos interesan)."""
-    if prop_type == "IntProperty":
-        return s.read_i32()
-    if prop_type == "FloatProperty":
-        return s.read_f32()
-    if prop_type in ("StrProperty", "NameProperty"):
-        return _read_string16(s)
-    if prop_type == "BoolProperty":
-        return s.read(1)[0] != 0
-    if prop_type == "QWordProperty":
-        s.advance(8)
-        return None
-    if prop_type == "ByteProperty":
-        s.advance(1)
-        return None
-    if prop_type == "ArrayProperty":
-        return _read_array_property(s)
-    if prop_type == "StructProperty":
-        _ = _read_string16(s)
-        return _read_properties(s)
-    if prop_type == "EnumProperty":
-        s.advance(1)
-        return None
-    raise ValueError(f"Tipo no esperado: {prop_type!r}")
+    reader = _READERS.get(prop_type)
+    if reader is None:
+        raise ValueError(f"Tipo no esperado: {prop_type!r}")
+    return reader(s)
 
 
 def _read_properties(s: _Stream, stop_at_goals: bool = True) -> list[tuple[str, Any]]:
@@ -182,7 +228,7 @@ def _read_properties(s: _Stream, stop_at_goals: bool = True) -> list[tuple[str,
     out: list[tuple[str, Any]] = []
     while True:
         key = _read_string8(s)
-        if key in ("None", "\x00\x00\x00None", ""):
+        if key in _END_KEYS:
             break
         prop_type = _read_string8(s)
         s.advance(8)
@@ -201,6 +247,36 @@ def _read_properties(s: _Stream, stop_at_goals: bool = True) -> list[tuple[str,
     return out
 
 
+def _read_selected_properties(s: _Stream, keys: frozenset[str]) -> list[tuple[str, Any]]:
+    """
+    Lee solo las propiedades de `keys` y salta el resto sin decodificarlo.
+
+    Termina en cuanto se han encontrado todas las claves pedidas. Si el stream
+    deja de ser legible antes (tipos que el lector no conoce bien), devuelve
+    lo encontrado hasta ese punto en lugar de fallar.
+    """
+    out: list[tuple[str, Any]] = []
+    pending = set(keys)
+    while pending:
+        try:
+            key = _read_string8(s)
+            if key in _END_KEYS:
+                break
+            prop_type = _read_string8(s)
+            s.advance(8)
+            if key not in pending or prop_type == "StructProperty":
+                _skip_property_value(s, prop_type)
+                continue
+            value = _read_property_value(s, prop_type)
+        except ValueError:
+            if out:
+                break
+            raise
+        out.append((key, value))
+        pending.discard(key)
+    return out
+
+
 def _read_array_property(s: _Stream) -> list[list[tuple[str, Any]]]:
     """ArrayProperty: UInt32 count, luego count bloques de Properties."""
     count = s.read_u32()
@@ -209,32 +285,95 @@ def _read_array_property(s: _Stream) -> list[list[tuple[str, Any]]]:
     return [_read_properties(s, stop_at_goals=False) for _ in range(count)]
 
 
-def parse_header(data: bytes) -> dict[str, Any]:
+# Tabla tipo → función que lee el valor (solo tipos que nos interesan)
+_READERS: dict[str, Callable[[_Stream], Any]] = {
+    "IntProperty": _Stream.read_i32,
+    "FloatProperty": _Stream.read_f32,
+    "StrProperty": _read_string16,
+    "NameProperty": _read_string16,
+    "BoolProperty": lambda s: s.read_u8() != 0,
+    "QWordProperty": _read_none(8),
+    "ByteProperty": _read_none(1),
+    "ArrayProperty": _read_array_property,
+    "StructProperty": _read_struct,
+    "EnumProperty": _read_none(1),
+}
+
+
+def _header_bounds(data) -> tuple[memoryview, int, int]:
+    """Valida el prefijo (header_size, crc) y devuelve (vista, inicio, fin) del header."""
+    view = data if isinstance(data, memoryview) else memoryview(data)
+    if len(view) < 12:
+        raise ValueError("Archivo demasiado corto")
+    header_size = _I32.unpack_from(view, 0)[0]
+    # 4 bytes de header_crc a continuación
+    if header_size < 8 or header_size > 50 * 1024 * 1024 or 8 + header_size > len(view):
+        raise ValueError("Tamaño de header inválido")
+    return view, 8, 8 + header_size
+
+
+def parse_header(
+    data,
+    keys: Iterable[str] | None = None,
+    stop_at_goals: bool = True,
+) -> dict[str, Any]:
     """
     Parsea el header del replay y devuelve un dict con 'properties'
-    en formato lista de (nombre, valor). Salta StructProperty y otros
-    tipos problemáticos para poder leer TeamNames y Goals.
+    en formato lista de (nombre, valor) y la versión ('major_version',
+    'minor_version', 'net_version'; este último 0 en replays anteriores a
+    866.18, como en boxcars). Salta StructProperty y otros tipos
+    problemáticos para poder leer TeamNames y Goals.
+
+    `data` puede ser bytes, memoryview o mmap: se lee por desplazamiento
+    sobre el buffer original, sin copiar el header ni tocar el cuerpo.
+
+    Con `keys` (p. ej. {"TeamNames", "Goals", "MapName"}) solo se decodifican
+    esas propiedades, el resto se salta, y la lectura para en cuanto están
+    todas; así se pueden leer propiedades posteriores a Goals. Sin `keys`,
+    `stop_at_goals=False` lee el header completo.
     """
-    if len(data) < 12:
-        raise ValueError("Archivo demasiado corto")
-    s = _Stream(data)
-    header_size = s.read_i32()
-    s.advance(4)  # header_crc
-    if header_size < 8 or header_size > 50 * 1024 * 1024 or s._pos + header_size > len(data):
-        raise ValueError("Tamaño de header inválido")
-    header_data = s.read(header_size)
-    s = _Stream(header_data)
+    view, start, end = _header_bounds(data)
+    s = _Stream(view, start, end)
     major = s.read_i32()
     minor = s.read_i32()
     # En versiones recientes (866+) hay net_version
-    if (major, minor) >= (866, 18):
-        s.read_i32()  # net_version
+    net_version = s.read_i32() if (major, minor) >= (866, 18) else 0
     # Game type string (String16)
     length = s.read_i32()
     if length > 0:
         s.advance(min(length, s.remaining()))
     elif length < 0:
         s.advance(min((-length) * 2, s.remaining()))
-    props_list = _read_properties(s, stop_at_goals=True)
+    if keys is not None:
+        props_list = _read_selected_properties(s, frozenset(keys))
+    else:
+        props_list = _read_properties(s, stop_at_goals=stop_at_goals)
     properties = [[name, value] for name, value in props_list]
-    return {"properties": properties}
+    return {"major_version": major, "minor_version": minor, "net_version": net_version, "properties": properties}
+
+
+def parse_header_file(
+    path: str | Path,
+    keys: Iterable[str] | None = None,
+    stop_at_goals: bool = True,
+) -> dict[str, Any]:
+    """
+    Como `parse_header`, pero leyendo el archivo con mmap.
+
+    Solo se paginan los bytes del header; el cuerpo del replay (frames de
+    red) nunca se lee, así que escanear una biblioteca entera queda limitado
+    por la E/S y no por copias en memoria.
+    """
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # archivo vacío: mmap no admite longitud 0
+            raise ValueError("Archivo demasiado corto") from None
+        try:
+            view = memoryview(mm)
+            try:
+                return parse_header(view, keys=keys, stop_at_goals=stop_at_goals)
+            finally:
+                view.release()
+        finally:
+            mm.close()
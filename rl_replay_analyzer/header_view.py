@@ -0,0 +1,190 @@
+"""
+Acceso por clave a las propiedades del header de un replay.
+
+`utils.get_prop` recorre la lista de propiedades en cada llamada y
+`utils.first_string_from_header_prop` vuelve a recorrer los Array/Struct
+anidados cada vez. `HeaderView` indexa las propiedades una sola vez (dict
+nombre → valor) y decodifica los valores anidados bajo demanda, guardando el
+resultado: pedir varias veces Goals, TeamNames o PlayerStats cuesta un
+acceso a dict.
+
+Acepta las dos formas del header que circulan por el paquete:
+
+- las `properties` de boxcars: [[nombre, {"Int": 3}], [nombre, {"Array": [...]}], ...]
+- la salida de `header_fallback.parse_header`: {"properties": [(nombre, 3), ...], ...}
+
+Los goles se exponen como registros `GoalRecord` (frame, jugador, equipo que
+anota) en lugar de listas anidadas de tuplas.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import Any, NamedTuple
+
+from rl_replay_analyzer.utils import first_string_from_header_prop
+
+# Claves con que boxcars envuelve los escalares del header
+_SCALAR_KEYS = ("Int", "Float", "Str", "Name", "Byte", "Bool", "QWord")
+
+
+def header_scalar(value: Any) -> Any:
+    """Desenvuelve un valor escalar del header ({"Int": 3} en boxcars, 3 en header_fallback)."""
+    if isinstance(value, dict):
+        for k in _SCALAR_KEYS:
+            if k in value:
+                return value[k]
+        return None
+    return value
+
+
+def header_struct_fields(entry: Any) -> dict:
+    """Convierte una entrada de un ArrayProperty del header en dict nombre→valor."""
+    fields: dict = {}
+    if isinstance(entry, dict):
+        entry = entry.get("fields", entry.get("Struct", []))
+    if not isinstance(entry, (list, tuple)):
+        return fields
+    for item in entry:
+        if isinstance(item, (list, tuple)) and len(item) >= 2 and isinstance(item[0], str):
+            fields[item[0]] = header_scalar(item[1])
+    return fields
+
+
+class GoalRecord(NamedTuple):
+    """Una entrada de header["Goals"]. `team` es el equipo que anota (PlayerTeam: 0 o 1)."""
+
+    frame: int | None
+    player: str | None
+    team: int | None
+
+
+# Marcador de "no calculado todavía" en la memoización (None es un valor válido)
+_MISSING = object()
+
+
+class HeaderView:
+    """
+    Vista indexada de las propiedades del header.
+
+    Construirla cuesta un recorrido de la lista de propiedades; a partir de
+    ahí cada acceso es O(1) y cada valor anidado se decodifica como mucho una
+    vez. Si una propiedad aparece repetida gana la primera, como en `get_prop`.
+
+    Args:
+        header: Dict con clave "properties" (replay de boxcars o salida de
+            `parse_header`), o directamente la lista de pares / el dict de
+            propiedades.
+    """
+
+    __slots__ = ("_props", "_memo", "versions")
+
+    def __init__(self, header: Any):
+        properties = header.get("properties") if isinstance(header, Mapping) and "properties" in header else header
+        props: dict[str, Any] = {}
+        if isinstance(properties, Mapping):
+            props.update(properties)
+        elif properties:
+            for item in properties:
+                if isinstance(item, (list, tuple)) and len(item) >= 2 and item[0] not in props:
+                    props[item[0]] = item[1]
+        self._props = props
+        self._memo: dict[tuple[str, str], Any] = {}
+        # Versiones del formato (solo en la salida de parse_header)
+        self.versions: tuple[int, int, int] | None = None
+        if isinstance(header, Mapping) and "major_version" in header:
+            self.versions = (header["major_version"], header["minor_version"], header.get("net_version", 0))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._props
+
+    def __len__(self) -> int:
+        return len(self._props)
+
+    def keys(self):
+        return self._props.keys()
+
+    def raw(self, key: str, default: Any = None) -> Any:
+        """Valor tal como viene del header (sin desenvolver)."""
+        return self._props.get(key, default)
+
+    def _cached(self, kind: str, key: str, decode) -> Any:
+        memo_key = (kind, key)
+        value = self._memo.get(memo_key, _MISSING)
+        if value is _MISSING:
+            value = self._memo[memo_key] = decode(self._props.get(key))
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Valor escalar de la propiedad (desenvuelto), o `default` si no existe."""
+        if key not in self._props:
+            return default
+        return self._cached("scalar", key, header_scalar)
+
+    def string(self, key: str) -> str | None:
+        """Propiedad de texto, o None si no existe o no es texto."""
+        value = self.get(key)
+        return value if isinstance(value, str) else None
+
+    def integer(self, key: str) -> int | None:
+        """Propiedad entera, o None si no existe o no es entera."""
+        value = self.get(key)
+        return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+    def first_string(self, key: str) -> str | None:
+        """Primera cadena dentro de la propiedad (Array/Struct anidados), memoizada."""
+        return self._cached("first_string", key, first_string_from_header_prop)
+
+    def array(self, key: str) -> tuple[dict, ...]:
+        """Entradas de un ArrayProperty como dicts nombre→valor escalar (tupla vacía si no existe)."""
+
+        def _decode(value: Any) -> tuple[dict, ...]:
+            if isinstance(value, dict):
+                value = value.get("Array", [])
+            if not isinstance(value, (list, tuple)):
+                return ()
+            return tuple(header_struct_fields(e) for e in value)
+
+        return self._cached("array", key, _decode)
+
+    @property
+    def goals(self) -> tuple[GoalRecord, ...]:
+        """header["Goals"] como registros, en el orden del header."""
+
+        def _decode(_value: Any) -> tuple[GoalRecord, ...]:
+            out = []
+            for e in self.array("Goals"):
+                frame, player, team = e.get("frame"), e.get("PlayerName"), e.get("PlayerTeam")
+                out.append(
+                    GoalRecord(
+                        frame if isinstance(frame, int) else None,
+                        player if isinstance(player, str) else None,
+                        team if isinstance(team, int) else None,
+                    )
+                )
+            return tuple(out)
+
+        return self._cached("goals", "Goals", _decode)
+
+    @property
+    def team_names(self) -> tuple[str | None, str | None]:
+        """(Team0Name, Team1Name), o las dos primeras cadenas de TeamNames si no están."""
+
+        def _decode(_value: Any) -> tuple[str | None, str | None]:
+            names = [self.string("Team0Name"), self.string("Team1Name")]
+            if None in names and "TeamNames" in self._props:
+                nested = self.raw("TeamNames")
+                if isinstance(nested, dict):
+                    nested = nested.get("Array", nested)
+                if isinstance(nested, (list, tuple)):
+                    found = [first_string_from_header_prop(e) for e in nested[:2]]
+                    found += [None] * (2 - len(found))
+                    names = [n if n is not None else f for n, f in zip(names, found)]
+            return names[0], names[1]
+
+        return self._cached("team_names", "TeamNames", _decode)
+
+    @property
+    def player_stats(self) -> tuple[dict, ...]:
+        """header["PlayerStats"]: un dict por jugador (Name, Team, Score, Goals, ...)."""
+        return self.array("PlayerStats")
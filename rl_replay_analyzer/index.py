@@ -0,0 +1,302 @@
+"""
+Índice SQLite de los headers de una biblioteca de replays (subcomandos
+`index` y `query`).
+
+`ReplayIndex.update` recorre carpetas y archivos, lee solo el header de cada
+replay (`header_fallback.parse_header_file` con las claves de INDEX_KEYS, sin
+tocar los frames de red) y guarda Id, mapa, fecha, nombres y marcador de los
+equipos y los goles en una base SQLite local. Solo se vuelven a leer los
+archivos cuyo tamaño o mtime han cambiado; las filas se insertan por lotes
+dentro de transacciones. `ReplayIndex.query` busca por equipo, jugador, mapa,
+fecha o Id con consultas indexadas, sin abrir ningún replay.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from rl_replay_analyzer.cache import default_cache_dir
+from rl_replay_analyzer.header_fallback import parse_header_file
+from rl_replay_analyzer.header_view import HeaderView
+from rl_replay_analyzer.watch import scan_replays
+
+# Propiedades del header que se indexan
+INDEX_KEYS = frozenset(("Id", "MapName", "Date", "Team0Name", "Team1Name", "Team0Score", "Team1Score", "NumFrames", "Goals"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS replays (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    replay_id TEXT,
+    map TEXT,
+    date TEXT,
+    team0 TEXT,
+    team1 TEXT,
+    team0_score INTEGER,
+    team1_score INTEGER,
+    num_frames INTEGER,
+    error TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS goals (
+    path TEXT NOT NULL REFERENCES replays(path) ON DELETE CASCADE,
+    frame INTEGER,
+    player TEXT,
+    team INTEGER
+);
+CREATE INDEX IF NOT EXISTS replays_replay_id ON replays(replay_id);
+CREATE INDEX IF NOT EXISTS replays_map ON replays(map);
+CREATE INDEX IF NOT EXISTS replays_date ON replays(date);
+CREATE INDEX IF NOT EXISTS replays_team0 ON replays(team0 COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS replays_team1 ON replays(team1 COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS goals_path ON goals(path);
+CREATE INDEX IF NOT EXISTS goals_player ON goals(player COLLATE NOCASE);
+"""
+
+# Rutas por consulta al leer los goles de los resultados (límite de parámetros de SQLite)
+_GOALS_CHUNK = 500
+
+_REPLAY_COLUMNS = (
+    "path",
+    "size",
+    "mtime_ns",
+    "replay_id",
+    "map",
+    "date",
+    "team0",
+    "team1",
+    "team0_score",
+    "team1_score",
+    "num_frames",
+    "error",
+    "indexed_at",
+)
+
+
+def default_index_path() -> Path:
+    """Base de datos por defecto: $RL_REPLAY_INDEX, o index.sqlite en el directorio de caché."""
+    env = os.environ.get("RL_REPLAY_INDEX")
+    if env:
+        return Path(env)
+    return default_cache_dir() / "index.sqlite"
+
+
+def read_header_record(path: str | Path) -> tuple[dict, list[tuple[int | None, str | None, int | None]]]:
+    """
+    Lee el header de un replay y devuelve (campos de la fila, goles).
+
+    Los goles son tuplas (frame, jugador, equipo que anota).
+
+    Raises:
+        ValueError: Header ilegible.
+        OSError: No se pudo abrir el archivo.
+    """
+    view = HeaderView(parse_header_file(path, keys=INDEX_KEYS, stop_at_goals=False))
+    row = {
+        "replay_id": view.string("Id"),
+        "map": view.string("MapName"),
+        "date": view.string("Date"),
+        "team0": view.string("Team0Name"),
+        "team1": view.string("Team1Name"),
+        "team0_score": view.integer("Team0Score"),
+        "team1_score": view.integer("Team1Score"),
+        "num_frames": view.integer("NumFrames"),
+    }
+    goals = [tuple(g) for g in view.goals]
+    return row, goals
+
+
+def _iter_replay_files(roots: Iterable[str | Path]) -> Iterator[tuple[str, int, int]]:
+    """(ruta absoluta, tamaño, mtime_ns) de cada .replay de las carpetas o archivos dados."""
+    for root in roots:
+        root = Path(root).resolve()
+        if root.is_dir():
+            for path, (size, mtime_ns) in scan_replays(root).items():
+                yield path, size, mtime_ns
+        elif root.is_file():
+            st = root.stat()
+            yield str(root), st.st_size, st.st_mtime_ns
+
+
+class ReplayIndex:
+    """
+    Base SQLite con los headers indexados.
+
+    Args:
+        db_path: Archivo de la base (se crea si no existe).
+    """
+
+    def __init__(self, db_path: str | Path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(_SCHEMA)
+
+    def __enter__(self) -> ReplayIndex:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _known(self) -> dict[str, tuple[int, int]]:
+        return {row[0]: (row[1], row[2]) for row in self.conn.execute("SELECT path, size, mtime_ns FROM replays")}
+
+    def _flush(self, rows: list[tuple], goals: list[tuple]) -> None:
+        """Inserta un lote de filas (y sus goles) en una única transacción."""
+        with self.conn:
+            paths = [(row[0],) for row in rows]
+            self.conn.executemany("DELETE FROM goals WHERE path = ?", paths)
+            placeholders = ", ".join("?" for _ in _REPLAY_COLUMNS)
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO replays ({', '.join(_REPLAY_COLUMNS)}) VALUES ({placeholders})", rows
+            )
+            self.conn.executemany("INSERT INTO goals (path, frame, player, team) VALUES (?, ?, ?, ?)", goals)
+        rows.clear()
+        goals.clear()
+
+    def update(
+        self,
+        roots: Iterable[str | Path],
+        prune: bool = True,
+        batch_size: int = 500,
+        on_error: Callable[[str, str], None] | None = None,
+    ) -> dict[str, int]:
+        """
+        Indexa los replays nuevos o modificados (por tamaño o mtime) de `roots`.
+
+        Los replays con el header ilegible se guardan con su error, para no
+        reintentarlos hasta que el archivo cambie; `query` los ignora.
+
+        Args:
+            roots: Carpetas (recursivas) o archivos .replay.
+            prune: Borrar del índice los replays de esas carpetas que ya no existen.
+            batch_size: Filas por transacción.
+            on_error: Callback (ruta, mensaje) para cada header ilegible.
+
+        Returns:
+            Contadores {"scanned", "indexed", "unchanged", "errors", "removed"}.
+        """
+        roots = list(roots)
+        known = self._known()
+        counts = {"scanned": 0, "indexed": 0, "unchanged": 0, "errors": 0, "removed": 0}
+        seen: set[str] = set()
+        rows: list[tuple] = []
+        goals: list[tuple] = []
+        for path, size, mtime_ns in _iter_replay_files(roots):
+            counts["scanned"] += 1
+            seen.add(path)
+            if known.get(path) == (size, mtime_ns):
+                counts["unchanged"] += 1
+                continue
+            error = None
+            try:
+                row, replay_goals = read_header_record(path)
+            except (OSError, ValueError) as e:
+                row, replay_goals, error = {}, [], str(e)
+                counts["errors"] += 1
+                if on_error is not None:
+                    on_error(path, error)
+            else:
+                counts["indexed"] += 1
+            values = {"path": path, "size": size, "mtime_ns": mtime_ns, "error": error, "indexed_at": time.time(), **row}
+            rows.append(tuple(values.get(col) for col in _REPLAY_COLUMNS))
+            goals.extend((path, *g) for g in replay_goals)
+            if len(rows) >= batch_size:
+                self._flush(rows, goals)
+        if rows:
+            self._flush(rows, goals)
+
+        if prune:
+            dirs = [str(Path(r).resolve()) for r in roots if Path(r).is_dir()]
+            gone = [(p,) for p in known if p not in seen and any(p.startswith(d + os.sep) for d in dirs)]
+            with self.conn:
+                self.conn.executemany("DELETE FROM replays WHERE path = ?", gone)
+            counts["removed"] = len(gone)
+        return counts
+
+    def query(
+        self,
+        teams: Iterable[str] = (),
+        player: str | None = None,
+        map_name: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        replay_id: str | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """
+        Busca replays indexados. Todos los filtros se combinan con AND.
+
+        Args:
+            teams: Nombres de equipo (sin distinguir mayúsculas); cada uno debe
+                ser team0 o team1 del replay. Dos nombres = "X contra Y".
+            player: Jugador que marcó algún gol.
+            map_name: Nombre interno del mapa (p. ej. "Stadium_P").
+            since, until: Límites de fecha, comparados como texto con el
+                formato del header ("2026-01-31 20-15-00"); basta un prefijo.
+            replay_id: Id del replay.
+            limit: Número máximo de resultados.
+
+        Returns:
+            Lista de dicts (columnas de la tabla replays salvo el error, más
+            "goals": [{"frame", "player", "team"}]), de la más reciente a la más antigua.
+        """
+        where = ["error IS NULL"]
+        params: list = []
+        for team in teams:
+            where.append("(team0 = ? COLLATE NOCASE OR team1 = ? COLLATE NOCASE)")
+            params += [team, team]
+        if player is not None:
+            where.append("path IN (SELECT path FROM goals WHERE player = ? COLLATE NOCASE)")
+            params.append(player)
+        if map_name is not None:
+            where.append("map = ?")
+            params.append(map_name)
+        if since is not None:
+            where.append("date >= ?")
+            params.append(since)
+        if until is not None:
+            # "2026-01-31" debe incluir todo ese día
+            where.append("date <= ?")
+            params.append(until + "\uffff")
+        if replay_id is not None:
+            where.append("replay_id = ?")
+            params.append(replay_id)
+        sql = f"SELECT * FROM replays WHERE {' AND '.join(where)} ORDER BY date DESC, path"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        out = []
+        for row in self.conn.execute(sql, params).fetchall():
+            item = {k: row[k] for k in row.keys() if k != "error"}
+            item["goals"] = []
+            out.append(item)
+        # Los goles de todos los resultados en unas pocas consultas (no una por replay)
+        by_path = {item["path"]: item["goals"] for item in out}
+        paths = list(by_path)
+        for start in range(0, len(paths), _GOALS_CHUNK):
+            chunk = paths[start : start + _GOALS_CHUNK]
+            rows = self.conn.execute(
+                f"SELECT path, frame, player, team FROM goals WHERE path IN ({', '.join('?' for _ in chunk)}) "
+                "ORDER BY path, frame",
+                chunk,
+            )
+            for g in rows:
+                by_path[g["path"]].append({"frame": g["frame"], "player": g["player"], "team": g["team"]})
+        return out
+
+    def count(self) -> int:
+        """Replays indexados correctamente."""
+        return self.conn.execute("SELECT COUNT(*) FROM replays WHERE error IS NULL").fetchone()[0]
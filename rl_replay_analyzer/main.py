@@ -4,67 +4,1095 @@ Punto de entrada por línea de comandos para el analizador de replays de Rocket
 Uso:
     python -m rl_replay_analyzer archivo.replay
     python -m rl_replay_analyzer archivo.replay -o resultado.json --indent 2
+    python -m rl_replay_analyzer carpeta/ "otros/*.replay" -j 8 --output-dir salida/
+    python -m rl_replay_analyzer carpeta/ -o todos.json
+    python -m rl_replay_analyzer carpeta/ --header-only -o todos.json
+    python -m rl_replay_analyzer carpeta/ --format ndjson -o todos.ndjson
+    python -m rl_replay_analyzer carpeta/ --format bin -o todos.rlrb
+    python -m rl_replay_analyzer carpeta/ --no-cache
+    python -m rl_replay_analyzer carpeta/ --timeout 60 --max-memory-mb 2048 --max-tasks-per-child 50
+    python -m rl_replay_analyzer carpeta/ --dedup
+    python -m rl_replay_analyzer carpeta/ --season --extract overtime
+    python -m rl_replay_analyzer //servidor/replays/ --read-ahead 16 --stats
+    python -m rl_replay_analyzer --clear-cache
+    python -m rl_replay_analyzer carpeta/ --stats --stats-json estadisticas.json
+    python -m rl_replay_analyzer carpeta/ --extract overtime
+    python -m rl_replay_analyzer carpeta/ --timeline lineas/ --timeline-format bin
+    python -m rl_replay_analyzer watch carpeta/ --output-dir salida/
+    python -m rl_replay_analyzer serve -j 4
+    python -m rl_replay_analyzer index carpeta/
+    python -m rl_replay_analyzer query --team "Equipo A" --team "Equipo B"
+    python -m rl_replay_analyzer dedup carpeta/
+    python -m rl_replay_analyzer routes
+    python -m rl_replay_analyzer season --bucket 30 --late 60
+    python -m rl_replay_analyzer season --from todos.ndjson --merge otra_maquina.json
+    python -m rl_replay_analyzer archivo.replay --server
 """
 
 from __future__ import annotations
 
 import argparse
+import glob
 import json
+import os
 import sys
+import time
 from pathlib import Path
 
-from rl_replay_analyzer.parser import parse_replay_file
+from rl_replay_analyzer.cache import ResultCache, default_cache_dir
 
+# El lote, el parser, el pool de procesos y las estadísticas se importan dentro
+# de las funciones que los usan: `--help` y el modo header arrancan sin cargarlos.
+# Por eso -j no lleva default_jobs() como valor por defecto: None ya significa
+# "uno por CPU" en run_batch, Watcher y AnalysisServer.
 
-def main() -> int:
-    """Ejecuta el analizador desde la CLI. Retorna 0 en éxito, 1 en error."""
-    parser = argparse.ArgumentParser(
-        description="Analiza un archivo .replay de Rocket League y genera resultado.json con equipos y goles (tiempo desde network_frames)."
+
+def _write_json(out_path: Path, data: dict, indent: int) -> str | None:
+    """Escribe `data` como JSON. Retorna el mensaje de error o None si todo fue bien."""
+    try:
+        with open(out_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=indent if indent else None)
+    except OSError as e:
+        return f"No se pudo escribir {out_path} - {e}"
+    return None
+
+
+def _timed_write_json(out_path: Path, data: dict, indent: int, stats: dict | None) -> str | None:
+    """`_write_json` midiendo la etapa "json_dump" en `stats` (dict de StageStats.as_dict)."""
+    if stats is None:
+        return _write_json(out_path, data, indent)
+    start = time.perf_counter()
+    err = _write_json(out_path, data, indent)
+    stats["stages"]["json_dump"] = {"wall_s": time.perf_counter() - start}
+    return err
+
+
+def _sink_write(sink, path: Path, result: dict | None, error: str | None, stats: dict | None) -> str | None:
+    """`sink.write` midiendo la etapa "json_dump" en `stats` (dict de StageStats.as_dict)."""
+    if stats is None:
+        return sink.write(path, result, error)
+    start = time.perf_counter()
+    dest = sink.write(path, result, error)
+    stats["stages"]["json_dump"] = {"wall_s": time.perf_counter() - start}
+    return dest
+
+
+def _emit_stats(args: argparse.Namespace, per_file: dict[str, dict], extra: dict | None = None) -> int:
+    """Muestra/guarda las estadísticas pedidas con --stats/--profile/--stats-json."""
+    from rl_replay_analyzer.stats import aggregate, format_summary
+
+    summary = aggregate(per_file.values())
+    if extra:
+        summary.update(extra)
+    if args.stats:
+        print(format_summary(summary), file=sys.stderr)
+    if args.stats_json is not None:
+        err = _write_json(args.stats_json, {"aggregate": summary, "files": per_file}, 2)
+        if err:
+            print(f"Error: {err}", file=sys.stderr)
+            return 1
+    return 0
+
+
+def _export_timeline(args: argparse.Namespace, replay: Path, result: dict) -> str | None:
+    """
+    Escribe la línea de tiempo del resultado en --timeline y la sustituye en el
+    JSON por un resumen. Retorna el mensaje de error o None si todo fue bien.
+    """
+    timeline = result.get("extractors", {}).get("timeline")
+    if timeline is None or args.timeline is None:
+        return None
+    out_path = args.timeline / f"{replay.stem}.timeline.{args.timeline_format}"
+    try:
+        timeline.write(out_path, args.timeline_format)
+    except OSError as e:
+        return f"No se pudo escribir {out_path} - {e}"
+    result["extractors"]["timeline"] = {"frames": len(timeline), "path": str(out_path)}
+    return None
+
+
+def _open_router(args: argparse.Namespace):
+    """Tabla de rutas por versión de --routes, o None (desactivada o ilegible, con aviso)."""
+    if args.routes is None:
+        return None
+    import sqlite3
+
+    from rl_replay_analyzer.routing import Router
+
+    try:
+        return Router(args.routes)
+    except (OSError, sqlite3.Error) as e:
+        print(f"AVISO: No se pudo abrir la tabla de rutas {args.routes} - {e}", file=sys.stderr)
+        return None
+
+
+def _run_single(args: argparse.Namespace, replay: Path, cache: ResultCache | None) -> int:
+    """Modo clásico: un replay → un JSON."""
+    from rl_replay_analyzer.parser import parse_replay_file
+    from rl_replay_analyzer.stats import StageStats
+
+    out_path = args.output or Path("resultado.json")
+    stats = StageStats(args.profile) if args.collect_stats else None
+    try:
+        result = None
+        if args.server and not args.extract:
+            from rl_replay_analyzer.server import ServerUnavailable, analyze_via_server
+
+            try:
+                result = analyze_via_server(args.server, replay, args.mode)
+            except ServerUnavailable:
+                result = None  # sin servidor: analizar en local
+        if result is None:
+            router = _open_router(args)
+            try:
+                result = parse_replay_file(
+                    replay, mode=args.mode, cache=cache, stats=stats, extractors=args.extract, router=router
+                )
+            finally:
+                if router is not None:
+                    router.close()
+    except FileNotFoundError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    except ImportError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    err = _export_timeline(args, replay, result)
+    if err:
+        print(f"Error: {err}", file=sys.stderr)
+        return 1
+    stats_dict = stats.as_dict() if stats is not None else None
+    err = _timed_write_json(out_path, result, args.indent, stats_dict)
+    if err:
+        print(f"Error: {err}", file=sys.stderr)
+        return 1
+
+    print(f"Resultado guardado en: {out_path}")
+    if stats_dict is not None:
+        return _emit_stats(args, {str(replay): stats_dict})
+    return 0
+
+
+def _run_batch(args: argparse.Namespace) -> int:
+    """Modo lote: varios replays en paralelo, salida por archivo, combinada o en flujo (ver sinks)."""
+    from rl_replay_analyzer.batch import expand_replay_paths
+
+    paths = expand_replay_paths(args.replays)
+    if not paths:
+        print("Error: No se encontraron archivos .replay", file=sys.stderr)
+        return 1
+
+    season = None
+    known = 0
+    if args.season is not None:
+        from rl_replay_analyzer.season import SeasonAggregate, replay_key
+
+        try:
+            season = SeasonAggregate.load(args.season)
+        except (OSError, ValueError) as e:
+            print(f"Error: No se pudo leer el agregado {args.season} - {e}", file=sys.stderr)
+            return 1
+        # Solo se analizan los replays que el agregado no ha contado todavía
+        keys = {p: replay_key(p) for p in paths}
+        paths = [p for p in paths if keys[p] not in season]
+        known = len(keys) - len(paths)
+        season_before = len(season)
+
+    from rl_replay_analyzer.sinks import open_sink
+
+    try:
+        sink = open_sink(args.format, args.output, args.output_dir, args.indent)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    # Con la salida en stdout, el progreso va a stderr
+    log = sys.stderr if sink.uses_stdout else sys.stdout
+    if known:
+        print(f"Agregado de temporada: {known} replays ya contados, no se vuelven a analizar", file=log)
+
+    errors: dict[str, str] = {}
+    per_file_stats: dict[str, dict] = {}
+    ok = 0
+    cache_hits = 0
+    from rl_replay_analyzer.batch import run_batch
+
+    batch = None
+    via_server = False
+    # Con --read-ahead el lote va por etapas: lectura, análisis y escritura (ver pipeline)
+    pipelined = args.read_ahead > 0 and args.mode == "full"
+    pipeline_stats: dict = {}
+    if args.server and not args.extract:
+        from rl_replay_analyzer.server import run_batch_via_server, server_available
+
+        if server_available(args.server):
+            batch = run_batch_via_server(
+                args.server, paths, jobs=args.jobs, mode=args.mode, header_fallback=not args.no_header_fallback
+            )
+            via_server = True
+    if batch is None:
+        batch = run_batch(
+            paths,
+            jobs=args.jobs,
+            mode=args.mode,
+            cache_dir=args.cache_dir,
+            cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+            collect_stats=args.collect_stats,
+            trace_memory=args.profile,
+            extractors=args.extract,
+            timeout=args.timeout or None,
+            memory_limit=args.max_memory_mb * 1024 * 1024 or None,
+            max_tasks_per_child=args.max_tasks_per_child or None,
+            header_fallback=not args.no_header_fallback,
+            dedup=args.dedup,
+            read_ahead=args.read_ahead if pipelined else 0,
+            read_threads=args.read_threads,
+            max_buffered_bytes=args.read_ahead_mb * 1024 * 1024,
+            pipeline_stats=pipeline_stats,
+            routes_path=args.routes,
+        )
+    else:
+        pipelined = False
+    outcomes: dict[str, int] = {}
+    fallbacks = 0
+    duplicates = 0
+
+    def _deliver(item) -> None:
+        """Registra un resultado y lo escribe en el destino (en el hilo de escritura con --read-ahead)."""
+        nonlocal ok, cache_hits, fallbacks, duplicates
+        key = str(item.path)
+        if item.duplicate_of is not None:
+            duplicates += 1
+        cache_hits += item.cache_hit
+        outcomes[item.outcome] = outcomes.get(item.outcome, 0) + 1
+        if item.stats is not None:
+            per_file_stats[key] = item.stats
+        if item.fallback is not None:
+            fallbacks += 1
+            print(
+                f"AVISO {item.path} [{item.outcome}]: {item.error}; resultado aproximado desde el {item.fallback}",
+                file=sys.stderr,
+            )
+        elif item.error is not None:
+            errors[key] = item.error
+            print(f"ERROR {item.path} [{item.outcome}]: {item.error}", file=sys.stderr)
+            try:
+                sink.write(item.path, None, item.error)
+            except OSError:
+                pass  # el siguiente resultado informará del fallo de escritura
+            return
+        err = _export_timeline(args, item.path, item.result)
+        if err is None:
+            try:
+                dest = _sink_write(sink, item.path, item.result, item.error, item.stats)
+            except OSError as e:
+                err = str(e)
+        if err:
+            errors[key] = err
+            print(f"ERROR {item.path}: {err}", file=sys.stderr)
+            try:
+                sink.write(item.path, None, err)
+            except OSError:
+                pass
+            return
+        ok += 1
+        if season is not None and item.fallback is None:
+            # Un duplicado tiene el resultado de otro replay: se recuerda sin sumarlo
+            if item.duplicate_of is not None:
+                season.mark(replay_key(item.path))
+            else:
+                season.add(item.result, replay_key(item.path))
+        if dest is not None:
+            note = f" (duplicado de {item.duplicate_of})" if item.duplicate_of is not None else ""
+            print(f"OK {item.path} -> {dest}{note}", file=log)
+
+    if pipelined:
+        from rl_replay_analyzer.pipeline import WriterStage
+
+        writer = WriterStage(_deliver, args.write_queue)
+        with writer:
+            for item in batch:
+                writer.put(item)
+        pipeline_stats.setdefault("stages", {})["write"] = writer.meter.as_dict(
+            pipeline_stats.get("wall_s") or writer.meter.busy_s
+        )
+    else:
+        for item in batch:
+            _deliver(item)
+
+    start = time.perf_counter()
+    try:
+        sink.close()
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    extra_stats = {"pipeline": pipeline_stats} if pipelined else {}
+    if args.output is not None:
+        if args.format == "json":
+            extra_stats["combined_json_dump_s"] = time.perf_counter() - start
+            print(f"Resultado combinado guardado en: {args.output}", file=log)
+        elif not sink.uses_stdout:
+            print(f"Resultados guardados en: {args.output}", file=log)
+
+    print(f"Procesados: {ok} correctos, {len(errors)} con error (de {len(paths)})", file=log)
+    failed = {k: v for k, v in outcomes.items() if k != "ok"}
+    if failed:
+        detail = ", ".join(f"{k}: {v}" for k, v in sorted(failed.items()))
+        print(f"Fallos del análisis completo: {detail} ({fallbacks} recuperados desde el header)", file=log)
+    if duplicates:
+        print(f"Duplicados: {duplicates} (resultado copiado de un replay idéntico, sin volver a analizar)", file=log)
+    # Con --timeline el análisis no pasa por la caché (el resultado no es JSON)
+    if args.cache_dir is not None and args.mode == "full" and not via_server and args.timeline is None:
+        print(f"Caché: {cache_hits} aciertos, {len(paths) - duplicates - cache_hits} fallos", file=log)
+    if season is not None:
+        try:
+            season.save(args.season)
+        except OSError as e:
+            print(f"Error: No se pudo guardar el agregado {args.season} - {e}", file=sys.stderr)
+            return 1
+        print(
+            f"Agregado de temporada: {len(season) - season_before} replays nuevos, {len(season)} en total ({args.season})",
+            file=log,
+        )
+    if args.collect_stats and _emit_stats(args, per_file_stats, extra_stats):
+        return 1
+    return 1 if errors else 0
+
+
+def _add_common_options(parser: argparse.ArgumentParser) -> None:
+    """Opciones compartidas por el análisis directo y los subcomandos que analizan."""
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Número de procesos para analizar en paralelo. Por defecto: uno por CPU",
+    )
+    parser.add_argument(
+        "--header-only",
+        dest="mode",
+        action="store_const",
+        const="header",
+        default="full",
+        help="Lee solo el header (sin decodificar frames de red): mucho más rápido, tiempos aproximados",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=Path,
+        default=default_cache_dir(),
+        help="Directorio de la caché de resultados (por defecto: $RL_REPLAY_CACHE o la caché del usuario)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=256,
+        help="Tamaño máximo de la caché en MB; se expulsan primero las entradas menos usadas. Por defecto: 256",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="No leer ni escribir la caché de resultados",
+    )
+    parser.add_argument(
+        "--indent",
+        type=int,
+        default=2,
+        help="Indentación del JSON (0 = compacto). Por defecto: 2",
+    )
+
+
+def _add_stats_options(parser: argparse.ArgumentParser) -> None:
+    """Opciones de instrumentación por etapas."""
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Muestra en stderr tiempos por etapa (p50/p90/p99) y contadores",
     )
     parser.add_argument(
-        "replay",
+        "--profile",
+        action="store_true",
+        help="Como --stats, midiendo además el pico de memoria por etapa (tracemalloc, más lento)",
+    )
+    parser.add_argument(
+        "--stats-json",
         type=Path,
-        help="Ruta al archivo .replay",
+        default=None,
+        help="Guarda las estadísticas (por replay y agregadas) en este JSON",
+    )
+
+
+def _main_analyze(argv: list[str]) -> int:
+    """Análisis de uno o varios replays (comportamiento por defecto)."""
+    parser = argparse.ArgumentParser(
+        description=(
+            "Analiza archivos .replay de Rocket League y genera JSON con equipos y goles "
+            "(tiempo desde network_frames). Subcomandos: watch, serve, index, query, dedup, routes, season."
+        )
+    )
+    parser.add_argument(
+        "replays",
+        nargs="*",
+        help="Rutas a archivos .replay, directorios o patrones glob",
     )
     parser.add_argument(
         "-o",
         "--output",
         type=Path,
         default=None,
-        help="Archivo de salida JSON (por defecto: resultado.json en el directorio actual)",
+        help=(
+            "Archivo de salida JSON (por defecto: resultado.json en el directorio actual). "
+            "Con varios replays, escribe un único JSON combinado"
+        ),
     )
     parser.add_argument(
-        "--indent",
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="Con varios replays: directorio donde escribir un JSON por replay (por defecto: junto a cada replay)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("json", "ndjson", "bin"),
+        default="json",
+        help=(
+            "Formato de salida: json (un archivo por replay, o combinado con -o), ndjson (una línea por replay) "
+            "o bin (registros con prefijo de longitud, ver rl_replay_analyzer.sinks). ndjson y bin escriben "
+            "en -o o, sin -o o con -o -, en stdout. Por defecto: json"
+        ),
+    )
+    _add_common_options(parser)
+    _add_stats_options(parser)
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const=os.environ.get("RL_REPLAY_SERVER") or "http://127.0.0.1:8765",
+        default=None,
+        metavar="URL",
+        help=(
+            "Usa el servidor local (subcomando serve) si está en marcha; si no, analiza en local. "
+            "URL http://host:puerto o unix:/ruta (por defecto: $RL_REPLAY_SERVER o http://127.0.0.1:8765)"
+        ),
+    )
+    parser.add_argument(
+        "--extract",
+        default="",
+        metavar="NOMBRES",
+        help=(
+            "Extractores adicionales, separados por comas, que se ejecutan en la misma pasada "
+            "por los frames (p. ej. overtime); el resultado va en \"extractors\""
+        ),
+    )
+    parser.add_argument(
+        "--timeline",
+        type=Path,
+        default=None,
+        metavar="DIR",
+        help=(
+            "Exporta la línea de tiempo por frame (reloj, equipo que recibe, goles) de cada replay "
+            "a este directorio, como <replay>.timeline.csv o .bin"
+        ),
+    )
+    parser.add_argument(
+        "--timeline-format",
+        choices=("csv", "bin"),
+        default="csv",
+        help="Formato de --timeline: csv o binario columnar (ver rl_replay_analyzer.timeline). Por defecto: csv",
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=300.0,
+        metavar="SEG",
+        help="Con varios replays: segundos máximos por replay antes de matar su worker (0 = sin límite). Por defecto: 300",
+    )
+    parser.add_argument(
+        "--max-memory-mb",
         type=int,
-        default=2,
-        help="Indentación del JSON (0 = compacto). Por defecto: 2",
+        default=0,
+        metavar="MB",
+        help="Con varios replays: límite de memoria (espacio de direcciones) por worker, solo Unix (0 = sin límite)",
+    )
+    parser.add_argument(
+        "--max-tasks-per-child",
+        type=int,
+        default=100,
+        metavar="N",
+        help="Con varios replays: sustituir cada worker tras N replays (0 = nunca). Por defecto: 100",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help=(
+            "Con varios replays: detecta los archivos idénticos (Id del header, tamaño y hash parcial, "
+            "confirmado con el hash del contenido completo) y analiza solo uno de cada grupo; los demás "
+            "reciben el mismo resultado. No se aplica con --server"
+        ),
+    )
+    parser.add_argument(
+        "--read-ahead",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Con varios replays: lee hasta N replays por adelantado en hilos mientras los workers analizan, "
+            "y escribe los resultados en un hilo aparte (útil con los replays en red). 0 = desactivado"
+        ),
+    )
+    parser.add_argument(
+        "--read-threads",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Con --read-ahead: hilos de lectura. Por defecto: 4",
+    )
+    parser.add_argument(
+        "--read-ahead-mb",
+        type=int,
+        default=512,
+        metavar="MB",
+        help="Con --read-ahead: MB leídos por adelantado como máximo. Por defecto: 512",
+    )
+    parser.add_argument(
+        "--write-queue",
+        type=int,
+        default=64,
+        metavar="N",
+        help="Con --read-ahead: resultados en cola para el hilo de escritura. Por defecto: 64",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--no-routing",
+        action="store_true",
+        help=(
+            "No elegir el backend por versión del replay (tabla de rutas en $RL_REPLAY_ROUTES o la caché); "
+            "usar siempre el primero instalado"
+        ),
+    )
+    parser.add_argument(
+        "--season",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="ARCHIVO",
+        help=(
+            "Suma los resultados al agregado de temporada de este archivo (por defecto: $RL_REPLAY_SEASON "
+            "o season.json en la carpeta de datos del usuario); los replays ya contados no se vuelven a analizar. "
+            "Ver el subcomando season"
+        ),
+    )
+    parser.add_argument(
+        "--no-header-fallback",
+        action="store_true",
+        help="No reintentar en modo header los replays cuyo análisis completo falla",
+    )
+    parser.add_argument(
+        "--clear-cache",
+        action="store_true",
+        help="Vacía la caché de resultados antes de analizar",
+    )
+    args = parser.parse_args(argv)
+
+    if args.clear_cache:
+        removed = ResultCache(args.cache_dir).clear()
+        print(f"Caché vaciada: {removed} entradas borradas de {args.cache_dir}")
+        if not args.replays:
+            return 0
+    if not args.replays:
+        parser.error("Indica al menos un replay, directorio o patrón")
+    if args.no_cache:
+        args.cache_dir = None
+    args.routes = None
+    if not args.no_routing and args.mode == "full":
+        from rl_replay_analyzer.routing import default_routes_path
+
+        args.routes = default_routes_path()
+    if args.profile:
+        args.stats = True
+    args.collect_stats = args.stats or args.stats_json is not None
+    args.extract = tuple(n.strip() for n in args.extract.split(",") if n.strip())
+    if args.timeline is not None:
+        if "timeline" not in args.extract:
+            args.extract += ("timeline",)
+        try:
+            args.timeline.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"Error: No se pudo crear {args.timeline} - {e}", file=sys.stderr)
+            return 1
+    elif "timeline" in args.extract:
+        parser.error("El extractor timeline se exporta con --timeline DIR")
+    if args.extract:
+        from rl_replay_analyzer.extractors import available_extractors
+
+        unknown = [n for n in args.extract if n not in available_extractors()]
+        if unknown:
+            parser.error(f"Extractores desconocidos: {', '.join(unknown)} (disponibles: {', '.join(available_extractors())})")
+        if args.mode == "header":
+            parser.error("--extract/--timeline necesitan el stream de red: no se pueden combinar con --header-only")
+
+    if args.season is not None:
+        if args.mode == "header":
+            parser.error("--season necesita los tiempos exactos del análisis completo: no se puede combinar con --header-only")
+        from rl_replay_analyzer.season import default_season_path
+
+        args.season = Path(args.season) if args.season else default_season_path()
+
+    if args.format != "json":
+        if args.output_dir is not None:
+            parser.error(f"--output-dir solo se usa con --format json (--format {args.format} escribe un único flujo)")
+        if args.format == "bin" and (args.output is None or str(args.output) == "-") and sys.stdout.isatty():
+            parser.error("--format bin no se escribe en una terminal: usa -o archivo o redirige stdout")
+
+    # Un único archivo explícito (sin directorio ni glob) mantiene el modo clásico
+    if len(args.replays) == 1 and args.output_dir is None and args.format == "json" and args.season is None:
+        only = Path(args.replays[0])
+        if not only.is_dir() and not glob.has_magic(args.replays[0]):
+            cache = ResultCache(args.cache_dir, args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+            return _run_single(args, only, cache)
+
+    if args.output_dir is not None:
+        try:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"Error: No se pudo crear {args.output_dir} - {e}", file=sys.stderr)
+            return 1
+    return _run_batch(args)
 
-    out_path = args.output or Path("resultado.json")
 
+def _main_watch(argv: list[str]) -> int:
+    """Subcomando `watch`: vigila una carpeta y analiza los replays nuevos."""
+    from rl_replay_analyzer.watch import Watcher
+
+    parser = argparse.ArgumentParser(
+        prog="rl_replay_analyzer watch",
+        description="Vigila una carpeta y analiza cada replay nuevo o modificado (sondeo periódico).",
+    )
+    parser.add_argument("directory", type=Path, help="Carpeta a vigilar (incluye subcarpetas)")
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=None,
+        help="Directorio donde escribir un JSON por replay (por defecto: junto a cada replay)",
+    )
+    parser.add_argument(
+        "--state",
+        type=Path,
+        default=None,
+        help="JSON con el estado de lo ya procesado (por defecto: dentro de la carpeta vigilada)",
+    )
+    parser.add_argument("--interval", type=float, default=2.0, help="Segundos entre sondeos. Por defecto: 2")
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=2.0,
+        help="Segundos que un archivo debe permanecer sin cambios antes de analizarlo. Por defecto: 2",
+    )
+    parser.add_argument("--once", action="store_true", help="Un solo barrido y salir (para tareas programadas)")
+    _add_common_options(parser)
+    args = parser.parse_args(argv)
+
+    if not args.directory.is_dir():
+        print(f"Error: No es un directorio: {args.directory}", file=sys.stderr)
+        return 1
+    if args.output_dir is not None:
+        try:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            print(f"Error: No se pudo crear {args.output_dir} - {e}", file=sys.stderr)
+            return 1
+
+    def _on_result(item) -> None:
+        if item.error is not None:
+            print(f"ERROR {item.path}: {item.error}", file=sys.stderr, flush=True)
+            return
+        out_path = (args.output_dir or item.path.parent) / f"{item.path.stem}.json"
+        err = _write_json(out_path, item.result, args.indent)
+        if err:
+            print(f"ERROR {item.path}: {err}", file=sys.stderr, flush=True)
+        else:
+            print(f"OK {item.path} -> {out_path}", flush=True)
+
+    watcher = Watcher(
+        args.directory,
+        _on_result,
+        state_path=args.state,
+        jobs=args.jobs,
+        interval=args.interval,
+        settle=args.settle,
+        mode=args.mode,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+    )
+    if args.once:
+        watcher.run_once()
+        return 0
+    print(f"Vigilando {args.directory} (Ctrl+C para salir)", flush=True)
     try:
-        result = parse_replay_file(args.replay)
-    except FileNotFoundError as e:
-        print(f"Error: {e}", file=sys.stderr)
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _main_serve(argv: list[str]) -> int:
+    """Subcomando `serve`: servidor local que mantiene el parser cargado."""
+    import asyncio
+
+    from rl_replay_analyzer.server import DEFAULT_HOST, DEFAULT_MAX_BODY, DEFAULT_PORT, AnalysisServer
+
+    parser = argparse.ArgumentParser(
+        prog="rl_replay_analyzer serve",
+        description=(
+            "Servidor local de análisis: mantiene el parser y el backend cargados y atiende "
+            "GET /health, GET /stats y POST /analyze?mode=full|header."
+        ),
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"Dirección de escucha. Por defecto: {DEFAULT_HOST}")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Puerto. Por defecto: {DEFAULT_PORT}")
+    parser.add_argument("--unix", default=None, metavar="RUTA", help="Escuchar en un socket Unix en lugar de TCP")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Procesos de análisis. Por defecto: uno por CPU",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=None,
+        help="Peticiones en curso antes de responder 503 (por defecto: 4 por proceso)",
+    )
+    parser.add_argument(
+        "--max-body-mb",
+        type=int,
+        default=DEFAULT_MAX_BODY // (1024 * 1024),
+        help="Tamaño máximo de un replay enviado en el cuerpo, en MB",
+    )
+    parser.add_argument("--cache-dir", type=Path, default=default_cache_dir(), help="Directorio de la caché de resultados")
+    parser.add_argument("--cache-max-mb", type=int, default=256, help="Tamaño máximo de la caché en MB. Por defecto: 256")
+    parser.add_argument("--no-cache", action="store_true", help="No leer ni escribir la caché de resultados")
+    args = parser.parse_args(argv)
+
+    server = AnalysisServer(
+        jobs=args.jobs,
+        max_pending=args.max_pending,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_max_bytes=args.cache_max_mb * 1024 * 1024,
+        max_body=args.max_body_mb * 1024 * 1024,
+    )
+    where = f"unix:{args.unix}" if args.unix else f"http://{args.host}:{args.port}"
+    print(f"Servidor escuchando en {where} (Ctrl+C para salir)", flush=True)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Error: No se pudo abrir {where} - {e}", file=sys.stderr)
         return 1
-    except ValueError as e:
-        print(f"Error: {e}", file=sys.stderr)
+    return 0
+
+
+def _main_index(argv: list[str]) -> int:
+    """Subcomando `index`: indexa los headers de una biblioteca en SQLite."""
+    import sqlite3
+
+    from rl_replay_analyzer.index import ReplayIndex, default_index_path
+
+    parser = argparse.ArgumentParser(
+        prog="rl_replay_analyzer index",
+        description=(
+            "Guarda en una base SQLite los metadatos del header (Id, mapa, fecha, equipos, goles) "
+            "de cada replay. Solo relee los archivos cuyo tamaño o fecha de modificación cambió."
+        ),
+    )
+    parser.add_argument("paths", nargs="+", type=Path, help="Carpetas (recursivas) o archivos .replay")
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=default_index_path(),
+        help="Base de datos (por defecto: $RL_REPLAY_INDEX o index.sqlite en el directorio de caché)",
+    )
+    parser.add_argument(
+        "--no-prune",
+        action="store_true",
+        help="No borrar del índice los replays que ya no están en las carpetas indicadas",
+    )
+    args = parser.parse_args(argv)
+
+    def _on_error(path: str, message: str) -> None:
+        print(f"ERROR {path}: {message}", file=sys.stderr)
+
+    try:
+        with ReplayIndex(args.db) as index:
+            counts = index.update(args.paths, prune=not args.no_prune, on_error=_on_error)
+            total = index.count()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: No se pudo actualizar el índice {args.db} - {e}", file=sys.stderr)
         return 1
-    except ImportError as e:
-        print(f"Error: {e}", file=sys.stderr)
+    print(
+        f"Índice {args.db}: {counts['indexed']} indexados, {counts['unchanged']} sin cambios, "
+        f"{counts['errors']} con error, {counts['removed']} eliminados ({total} replays en total)"
+    )
+    return 0
+
+
+def _main_query(argv: list[str]) -> int:
+    """Subcomando `query`: busca en el índice creado con `index`."""
+    import sqlite3
+
+    from rl_replay_analyzer.index import ReplayIndex, default_index_path
+
+    parser = argparse.ArgumentParser(
+        prog="rl_replay_analyzer query",
+        description="Busca replays en el índice SQLite (ver subcomando index) sin abrir ningún archivo.",
+    )
+    parser.add_argument(
+        "--team",
+        action="append",
+        default=[],
+        help="Nombre de equipo; repetir para \"X contra Y\" (sin distinguir mayúsculas)",
+    )
+    parser.add_argument("--player", default=None, help="Jugador que marcó algún gol")
+    parser.add_argument("--map", dest="map_name", default=None, help="Mapa (nombre interno, p. ej. Stadium_P)")
+    parser.add_argument("--since", default=None, help="Fecha mínima (formato del header, p. ej. 2026-01-31)")
+    parser.add_argument("--until", default=None, help="Fecha máxima, inclusive")
+    parser.add_argument("--id", dest="replay_id", default=None, help="Id del replay")
+    parser.add_argument("--limit", type=int, default=None, help="Número máximo de resultados")
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de una línea por replay")
+    parser.add_argument("--db", type=Path, default=default_index_path(), help="Base de datos del índice")
+    args = parser.parse_args(argv)
+
+    if not args.db.exists():
+        print(f"Error: No existe el índice {args.db} (créalo con el subcomando index)", file=sys.stderr)
+        return 1
+    try:
+        with ReplayIndex(args.db) as index:
+            rows = index.query(
+                teams=args.team,
+                player=args.player,
+                map_name=args.map_name,
+                since=args.since,
+                until=args.until,
+                replay_id=args.replay_id,
+                limit=args.limit,
+            )
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: No se pudo consultar el índice {args.db} - {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    for row in rows:
+        score = f"{row['team0_score'] if row['team0_score'] is not None else '?'}-{row['team1_score'] if row['team1_score'] is not None else '?'}"
+        teams = f"{row['team0'] or 'Local'} {score} {row['team1'] or 'Visitante'}"
+        print(f"{row['date'] or '?':<20} {row['map'] or '?':<16} {teams}  {row['path']}")
+    print(f"{len(rows)} replays", file=sys.stderr)
+    return 0
+
+
+def _main_dedup(argv: list[str]) -> int:
+    """Subcomando `dedup`: informe de replays duplicados, sin analizarlos."""
+    from rl_replay_analyzer.batch import expand_replay_paths
+    from rl_replay_analyzer.dedup import dedup_report
+
+    parser = argparse.ArgumentParser(
+        prog="rl_replay_analyzer dedup",
+        description=(
+            "Agrupa los replays idénticos (mismo Id del header, tamaño y hash del header y de los extremos "
+            "del cuerpo, confirmado con el hash del contenido completo) sin decodificar los frames de red."
+        ),
+    )
+    parser.add_argument("replays", nargs="+", help="Rutas a archivos .replay, directorios o patrones glob")
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de texto")
+    args = parser.parse_args(argv)
+
+    paths = expand_replay_paths(args.replays)
+    if not paths:
+        print("Error: No se encontraron archivos .replay", file=sys.stderr)
+        return 1
+    report = dedup_report(paths)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+    for group in report["groups"]:
+        print(f"{group['keep']}  (Id {group['replay_id'] or '?'}, {group['size']} bytes)")
+        for dup in group["duplicates"]:
+            print(f"  = {dup}")
+    print(
+        f"{report['files']} replays: {report['unique']} distintos, {report['duplicates']} duplicados "
+        f"({report['duplicate_bytes'] / (1024 * 1024):.1f} MB)",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def _main_routes(argv: list[str]) -> int:
+    """Subcomando `routes`: muestra la tabla de rutas por versión de replay."""
+    import sqlite3
+
+    from rl_replay_analyzer.routing import Router, available_backends, default_routes_path
+
+    parser = argparse.ArgumentParser(
+        prog="rl_replay_analyzer routes",
+        description=(
+            "Muestra qué backend funciona, y cuán rápido, con cada versión de replay "
+            "(la tabla se rellena sola al analizar en modo completo)."
+        ),
+    )
+    parser.add_argument("--db", type=Path, default=default_routes_path(), help="Base de datos de la tabla de rutas")
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de texto")
+    parser.add_argument("--reset", action="store_true", help="Borra la tabla (se vuelve a aprender al analizar)")
+    args = parser.parse_args(argv)
+
+    if args.reset:
+        try:
+            args.db.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Error: No se pudo borrar {args.db} - {e}", file=sys.stderr)
+            return 1
+        print(f"Tabla de rutas borrada: {args.db}")
+        return 0
+    if not args.db.exists():
+        print(f"Sin tabla de rutas en {args.db} (se crea al analizar replays)", file=sys.stderr)
+        return 0
+    try:
+        with Router(args.db) as router:
+            rows = router.rows()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: No se pudo leer la tabla de rutas {args.db} - {e}", file=sys.stderr)
         return 1
 
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+    for row in rows:
+        speed = f"{row['s_per_mb'] * 1000:8.1f} ms/MB" if row["s_per_mb"] is not None else " " * 13
+        line = f"{row['version']:<12} {row['backend']:<10} {row['status']:<7} ok {row['ok']:<6} fallos {row['fail']:<6} {speed}"
+        if row["status"] != "ok" and row["last_error"]:
+            line += f"  {row['last_error']}"
+        print(line)
+    print(f"Backends instalados: {', '.join(available_backends())}", file=sys.stderr)
+    return 0
+
+
+def _main_season(argv: list[str]) -> int:
+    """Subcomando `season`: muestra (y amplía) el agregado de temporada."""
+    from rl_replay_analyzer.season import (
+        BUCKET_SECONDS,
+        LATE_SECONDS,
+        SeasonAggregate,
+        aggregate_records,
+        default_season_path,
+        format_season,
+    )
+    from rl_replay_analyzer.sinks import read_records
+
+    parser = argparse.ArgumentParser(
+        prog="rl_replay_analyzer season",
+        description=(
+            "Estadísticas agregadas de todos los replays contados con --season: goles por tramo de tiempo "
+            "restante, goles tardíos, prórrogas y totales por equipo. Con --from y --merge se suman antes "
+            "otros resultados al agregado y se guarda."
+        ),
+    )
+    parser.add_argument("--state", type=Path, default=default_season_path(), help="Archivo del agregado")
+    parser.add_argument(
+        "--from",
+        dest="records",
+        type=Path,
+        nargs="+",
+        default=[],
+        metavar="ARCHIVO",
+        help="Salidas --format ndjson/bin del lote cuyos resultados se suman (los replays ya contados se ignoran)",
+    )
+    parser.add_argument(
+        "--merge",
+        type=Path,
+        nargs="+",
+        default=[],
+        metavar="ARCHIVO",
+        help="Agregados parciales (de otras máquinas u otros lotes, sin replays en común) que se suman",
+    )
+    parser.add_argument(
+        "--bucket", type=int, default=BUCKET_SECONDS, metavar="SEG", help=f"Tamaño de los tramos. Por defecto: {BUCKET_SECONDS}"
+    )
+    parser.add_argument(
+        "--late", type=int, default=LATE_SECONDS, metavar="SEG", help=f"Umbral de gol tardío. Por defecto: {LATE_SECONDS}"
+    )
+    parser.add_argument("--json", action="store_true", help="Salida JSON en lugar de texto")
+    parser.add_argument("--reset", action="store_true", help="Borra el agregado (el próximo lote con --season empieza de cero)")
+    args = parser.parse_args(argv)
+
+    if args.reset:
+        try:
+            args.state.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Error: No se pudo borrar {args.state} - {e}", file=sys.stderr)
+            return 1
+        print(f"Agregado borrado: {args.state}")
+        return 0
     try:
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=args.indent if args.indent else None)
-    except OSError as e:
-        print(f"Error: No se pudo escribir {out_path} - {e}", file=sys.stderr)
+        season = SeasonAggregate.load(args.state)
+    except (OSError, ValueError) as e:
+        print(f"Error: No se pudo leer el agregado {args.state} - {e}", file=sys.stderr)
         return 1
 
-    print(f"Resultado guardado en: {out_path}")
+    for path in args.records:
+        try:
+            _, counts = aggregate_records(read_records(path), season)
+        except (OSError, ValueError) as e:
+            print(f"Error: No se pudo leer {path} - {e}", file=sys.stderr)
+            return 1
+        print(
+            f"{path}: {counts['added']} sumados, {counts['known']} ya contados, {counts['skipped']} con error",
+            file=sys.stderr,
+        )
+    for path in args.merge:
+        try:
+            season.merge(SeasonAggregate.load(path, missing_ok=False))
+        except (OSError, ValueError) as e:
+            print(f"Error: No se pudo combinar {path} - {e}", file=sys.stderr)
+            return 1
+    if args.records or args.merge:
+        try:
+            season.save(args.state)
+        except OSError as e:
+            print(f"Error: No se pudo guardar el agregado {args.state} - {e}", file=sys.stderr)
+            return 1
+
+    try:
+        summary = season.summary(args.bucket, args.late)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.json:
+        print(json.dumps(summary, ensure_ascii=False, indent=2))
+    else:
+        print(format_season(summary))
     return 0
 
 
+# Subcomandos: primer argumento → función que recibe el resto de argumentos
+_COMMANDS = {
+    "watch": _main_watch,
+    "serve": _main_serve,
+    "index": _main_index,
+    "query": _main_query,
+    "dedup": _main_dedup,
+    "routes": _main_routes,
+    "season": _main_season,
+}
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Ejecuta el analizador desde la CLI. Retorna 0 en éxito, 1 en error."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if argv and argv[0] in _COMMANDS:
+        return _COMMANDS[argv[0]](argv[1:])
+    return _main_analyze(argv)
+
+
 if __name__ == "__main__":
     sys.exit(main())
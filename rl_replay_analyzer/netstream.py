@@ -0,0 +1,914 @@
+"""
+Decodificador selectivo del stream de red en Python puro.
+
+Sustituye a `parse_replay` de boxcars cuando la extensión nativa no está
+instalada (ver `parser.load_backend`). Las tablas del cuerpo del replay
+(objetos, nombres, clases y caché de red por clase) se leen con el `_Stream`
+de `header_fallback`; el stream de red se recorre con `BitReader`, un lector
+de bits LSB-first sobre el mismo buffer, sin copiarlo.
+
+En el stream de red los atributos no llevan longitud: para llegar al
+siguiente hay que saber cuánto ocupa cada uno. Por eso cada atributo de cada
+clase se compila una vez por replay en una de estas formas:
+
+- un entero: ancho fijo en bits, que se salta sumándolo a la posición;
+- una función que avanza sin construir el valor (vectores, strings, RigidBody...);
+- para los objetos pedidos (por defecto los que usan los extractores
+  registrados: SecondsRemaining, ReplicatedStatEvent, ReplicatedScoredOnTeam,
+  bMatchEnded, bOverTime), un decodificador que devuelve el dict `attribute`
+  con la misma forma que boxcars ({"Int": 287}, {"StatEvent": {...}}).
+
+Los frames se generan a demanda y solo con esas actualizaciones, así que
+`run_extractors` deja de decodificar en cuanto termina el partido. Un
+atributo cuyo tipo no figura en ATTRIBUTE_TYPES impide seguir (no se sabe
+cuántos bits saltar): se lanza ValueError y el lote puede recurrir al modo
+header.
+"""
+
+from __future__ import annotations
+
+import functools
+import re
+import struct
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+from rl_replay_analyzer.header_fallback import _header_bounds, _read_string16, _Stream, parse_header
+from rl_replay_analyzer.objects import object_index
+
+_F32 = struct.Struct("<f")
+_U32 = struct.Struct("<I")
+
+
+class BitReader:
+    """
+    Lectura de bits LSB-first (el orden del stream de red de Unreal) sobre un buffer.
+
+    Como `_Stream`, no copia: `data` se recorta con una vista y `pos` cuenta
+    bits desde su inicio. Las lecturas de hasta 57 bits toman una palabra de
+    8 bytes del buffer y la desplazan.
+    """
+
+    __slots__ = ("_buf", "_bits", "pos")
+
+    def __init__(self, data, start: int = 0, end: int | None = None):
+        view = data if isinstance(data, memoryview) else memoryview(data)
+        self._buf = view[start:end]
+        self._bits = len(self._buf) * 8
+        self.pos = 0
+
+    def remaining(self) -> int:
+        return self._bits - self.pos
+
+    def read(self, n: int) -> int:
+        """`n` bits (n <= 57) como entero sin signo."""
+        pos = self.pos
+        end = pos + n
+        if end > self._bits:
+            raise ValueError("Fin de datos del stream de red")
+        self.pos = end
+        i = pos >> 3
+        return (int.from_bytes(self._buf[i : i + 8], "little") >> (pos & 7)) & ((1 << n) - 1)
+
+    def read_bit(self) -> int:
+        pos = self.pos
+        if pos >= self._bits:
+            raise ValueError("Fin de datos del stream de red")
+        self.pos = pos + 1
+        return (self._buf[pos >> 3] >> (pos & 7)) & 1
+
+    def read_i32(self) -> int:
+        v = self.read(32)
+        return v - (1 << 32) if v & 0x80000000 else v
+
+    def read_f32(self) -> float:
+        return _F32.unpack(_U32.pack(self.read(32)))[0]
+
+    def read_serialized_int(self, limit: int) -> int:
+        """Entero en [0, limit) codificado bit a bit (SerializeInt de Unreal)."""
+        # Los primeros floor(log2(limit)) bits siempre están; el último solo si
+        # el valor resultante cabe por debajo de limit. Una sola palabra basta.
+        pos = self.pos
+        bits = limit.bit_length() - 1
+        top = 1 << bits
+        i = pos >> 3
+        word = int.from_bytes(self._buf[i : i + 8], "little") >> (pos & 7)
+        value = word & (top - 1)
+        if value + top < limit:
+            value |= word & top
+            bits += 1
+        if pos + bits > self._bits:
+            raise ValueError("Fin de datos del stream de red")
+        self.pos = pos + bits
+        return value
+
+    def read_bytes(self, n: int) -> bytes:
+        if self.pos + n * 8 > self._bits:
+            raise ValueError("Fin de datos del stream de red")
+        i = self.pos >> 3
+        shift = self.pos & 7
+        self.pos += n * 8
+        if not shift:
+            return bytes(self._buf[i : i + n])
+        return (int.from_bytes(self._buf[i : i + n + 1], "little") >> shift).to_bytes(n + 1, "little")[:n]
+
+    def _string_size(self) -> tuple[int, str]:
+        """Longitud en bytes y codificación de un string (Int32: >0 bytes, <0 UTF-16)."""
+        length = self.read_i32()
+        if length >= 0:
+            return length, "windows-1252"
+        return -length * 2, "utf-16-le"
+
+    def read_string(self) -> str:
+        size, encoding = self._string_size()
+        if size * 8 > self.remaining():
+            raise ValueError("Longitud de string inválida en el stream de red")
+        return self.read_bytes(size).decode(encoding, "replace").rstrip("\x00")
+
+    def skip_string(self) -> None:
+        size, _ = self._string_size()
+        self.advance(size * 8)
+
+    def advance(self, n: int) -> None:
+        if self.pos + n > self._bits:
+            raise ValueError("Fin de datos del stream de red")
+        self.pos += n
+
+
+class _Context(NamedTuple):
+    """Lo que cambia el tamaño de los atributos entre replays."""
+
+    version: tuple[int, int, int]
+    objects: list[str]
+    vector_limit: int  # tope del tamaño por componente de los vectores cuantizados
+
+
+# --- Saltar valores sin construirlos -------------------------------------------
+
+
+def _skip_vector(r: BitReader, ctx: _Context) -> None:
+    # Vector cuantizado: tamaño por componente y tres enteros con sesgo
+    size = r.read_serialized_int(ctx.vector_limit)
+    r.advance(3 * (size + 2))
+
+
+def _skip_rotation(r: BitReader, ctx: _Context) -> None:
+    for _ in range(3):
+        if r.read_bit():
+            r.advance(8)
+
+
+def _skip_string(r: BitReader, ctx: _Context) -> None:
+    r.skip_string()
+
+
+def _skip_rigid_body(r: BitReader, ctx: _Context) -> None:
+    sleeping = r.read_bit()
+    _skip_vector(r, ctx)
+    # Rotación: cuaternión comprimido (2 + 3 × 18 bits) o, antes de net 7, 3 × 16 bits
+    r.advance(56 if ctx.version[2] >= 7 else 48)
+    if not sleeping:
+        _skip_vector(r, ctx)
+        _skip_vector(r, ctx)
+
+
+def _skip_remote_id(r: BitReader, ctx: _Context, system: int) -> None:
+    net = ctx.version[2]
+    if system == 0:  # pantalla dividida
+        r.advance(24)
+    elif system in (1, 4):  # Steam, Xbox
+        r.advance(64)
+    elif system == 2:  # PlayStation: nombre, bytes sin uso e id
+        r.advance(128 + (64 if net >= 1 else 0) + 64)
+    elif system == 6:  # Switch
+        r.advance(256)
+    elif system == 7:  # PsyNet
+        r.advance(64 if net >= 10 else 256)
+    elif system == 11:  # Epic
+        r.skip_string()
+    else:
+        raise ValueError(f"Plataforma de UniqueId desconocida: {system}")
+
+
+def _skip_unique_id(r: BitReader, ctx: _Context) -> int:
+    system = r.read(8)
+    _skip_remote_id(r, ctx, system)
+    r.advance(8)  # local_id
+    return system
+
+
+def _skip_party_leader(r: BitReader, ctx: _Context) -> None:
+    system = r.read(8)
+    if system:
+        _skip_remote_id(r, ctx, system)
+        r.advance(8)
+
+
+def _skip_reservation(r: BitReader, ctx: _Context) -> None:
+    r.advance(3)
+    if _skip_unique_id(r, ctx):
+        r.skip_string()
+    r.advance(2)
+    if ctx.version >= (868, 12, 0):
+        r.advance(6)
+
+
+def _skip_loadout(r: BitReader, ctx: _Context) -> None:
+    version = r.read(8)
+    count = 7 + (version > 10) + 3 * (version >= 16) + (version >= 17) + (version >= 19) + 3 * (version >= 22)
+    r.advance(32 * count)
+
+
+def _skip_team_loadout(r: BitReader, ctx: _Context) -> None:
+    _skip_loadout(r, ctx)
+    _skip_loadout(r, ctx)
+
+
+def _skip_product(r: BitReader, ctx: _Context) -> None:
+    r.advance(1)
+    oid = r.read(32)
+    name = ctx.objects[oid] if oid < len(ctx.objects) else None
+    if name in ("TAGame.ProductAttribute_TeamEdition_TA", "TAGame.ProductAttribute_SpecialEdition_TA"):
+        r.advance(31)
+    elif name == "TAGame.ProductAttribute_Painted_TA":
+        if ctx.version >= (868, 18, 0):
+            r.advance(31)
+        else:
+            r.read_serialized_int(14)
+    elif name == "TAGame.ProductAttribute_UserColor_TA":
+        if ctx.version >= (868, 23, 8):
+            r.advance(32)
+        elif r.read_bit():
+            r.advance(31)
+    elif name == "TAGame.ProductAttribute_TitleID_TA":
+        r.skip_string()
+    else:
+        raise ValueError(f"Atributo de producto desconocido: {name!r}")
+
+
+def _skip_loadout_online(r: BitReader, ctx: _Context) -> None:
+    for _ in range(r.read(8)):
+        for _ in range(r.read(8)):
+            _skip_product(r, ctx)
+
+
+def _skip_loadouts_online(r: BitReader, ctx: _Context) -> None:
+    _skip_loadout_online(r, ctx)
+    _skip_loadout_online(r, ctx)
+    r.advance(2)
+
+
+def _fixed_then_vectors(head: int, vectors: int, tail: int = 0) -> Callable[[BitReader, _Context], None]:
+    """Valor con `head` bits fijos, `vectors` vectores cuantizados y `tail` bits fijos."""
+
+    def _skip(r: BitReader, ctx: _Context) -> None:
+        r.advance(head)
+        for _ in range(vectors):
+            _skip_vector(r, ctx)
+        r.advance(tail)
+
+    return _skip
+
+
+def _skip_pickup(bits: int) -> Callable[[BitReader, _Context], None]:
+    def _skip(r: BitReader, ctx: _Context) -> None:
+        if r.read_bit():  # instigador
+            r.advance(32)
+        r.advance(bits)
+
+    return _skip
+
+
+def _skip_welded(r: BitReader, ctx: _Context) -> None:
+    r.advance(33)
+    _skip_vector(r, ctx)
+    r.advance(32)  # masa
+    _skip_rotation(r, ctx)
+
+
+def _skip_private_match(r: BitReader, ctx: _Context) -> None:
+    r.skip_string()  # mutadores
+    r.advance(64)
+    r.skip_string()  # nombre
+    r.skip_string()  # contraseña
+    r.advance(1)
+
+
+def _skip_rep_stat_title(r: BitReader, ctx: _Context) -> None:
+    r.advance(1)
+    r.skip_string()
+    r.advance(33 + 32)
+
+
+def _skip_game_server(r: BitReader, ctx: _Context) -> None:
+    if ctx.version >= (868, 24, 10):
+        r.skip_string()
+    else:
+        r.advance(64)
+
+
+# Tipo de atributo → ancho fijo en bits
+_FIXED_WIDTHS: dict[str, int] = {
+    "Boolean": 1,
+    "Byte": 8,
+    "Int": 32,
+    "Float": 32,
+    "QWord": 64,
+    "Int64": 64,
+    "Enum": 11,
+    "FlaggedInt": 33,
+    "ActiveActor": 33,
+    "StatEvent": 33,
+    "LogoData": 33,
+    "ReplicatedBoost": 32,
+    "MusicStinger": 41,
+    "TeamPaint": 88,
+    "ClubColors": 18,
+    "Title": 163,
+    "PlayerHistoryKey": 14,
+}
+
+# Tipo de atributo → función que lo salta
+_SKIPPERS: dict[str, Callable[[BitReader, _Context], None]] = {
+    "String": _skip_string,
+    "Location": _skip_vector,
+    "RotationTag": _skip_rotation,
+    "RigidBody": _skip_rigid_body,
+    "UniqueId": _skip_unique_id,
+    "PartyLeader": _skip_party_leader,
+    "Reservation": _skip_reservation,
+    "Loadout": _skip_loadout,
+    "TeamLoadout": _skip_team_loadout,
+    "LoadoutOnline": _skip_loadout_online,
+    "LoadoutsOnline": _skip_loadouts_online,
+    "Demolish": _fixed_then_vectors(66, 2),
+    "DemolishFx": _fixed_then_vectors(99, 2),
+    "DemolishExtended": _fixed_then_vectors(166, 2),
+    "Explosion": _fixed_then_vectors(33, 1),
+    "ExtendedExplosion": _fixed_then_vectors(33, 1, 33),
+    "AppliedDamage": _fixed_then_vectors(8, 1, 64),
+    "DamageState": _fixed_then_vectors(41, 1, 2),
+    "Pickup": _skip_pickup(1),
+    "PickupNew": _skip_pickup(8),
+    "Welded": _skip_welded,
+    "PrivateMatchSettings": _skip_private_match,
+    "RepStatTitle": _skip_rep_stat_title,
+    "GameServer": _skip_game_server,
+}
+
+
+def _fixed_width(kind: str, ctx: _Context) -> int | None:
+    """Ancho fijo del tipo en esta versión, o None si hay que recorrerlo."""
+    if kind == "CamSettings":
+        return 32 * (7 if ctx.version >= (868, 20, 0) else 6)
+    if kind == "GameMode":
+        return 8 if ctx.version >= (868, 12, 0) else 2
+    return _FIXED_WIDTHS.get(kind)
+
+
+# --- Decodificar los atributos pedidos -----------------------------------------
+
+
+def _decode_stat_event(r: BitReader) -> dict:
+    unknown1 = r.read_bit() == 1
+    return {"StatEvent": {"unknown1": unknown1, "object_id": r.read_i32()}}
+
+
+def _decode_flagged(key: str, inner: str) -> Callable[[BitReader], dict]:
+    def _decode(r: BitReader) -> dict:
+        flag = r.read_bit() == 1
+        return {key: {"active" if key == "ActiveActor" else "flag": flag, inner: r.read_i32()}}
+
+    return _decode
+
+
+# Tipo de atributo → decodificador al dict `attribute` de boxcars
+_DECODERS: dict[str, Callable[[BitReader], dict]] = {
+    "Boolean": lambda r: {"Boolean": r.read_bit() == 1},
+    "Byte": lambda r: {"Byte": r.read(8)},
+    "Int": lambda r: {"Int": r.read_i32()},
+    "Float": lambda r: {"Float": r.read_f32()},
+    "Enum": lambda r: {"Enum": r.read(11)},
+    "String": lambda r: {"String": r.read_string()},
+    "StatEvent": _decode_stat_event,
+    "ActiveActor": _decode_flagged("ActiveActor", "actor"),
+    "FlaggedInt": _decode_flagged("FlaggedInt", "int"),
+}
+
+
+# Atributo replicado → tipo. Ampliable: un replay con atributos que no estén
+# aquí no se puede recorrer (ValueError al encontrarlos).
+ATTRIBUTE_TYPES: dict[str, str] = {
+    # Engine
+    "Engine.Actor:bBlockActors": "Boolean",
+    "Engine.Actor:bCollideActors": "Boolean",
+    "Engine.Actor:bHidden": "Boolean",
+    "Engine.Actor:bTearOff": "Boolean",
+    "Engine.Actor:DrawScale": "Float",
+    "Engine.Actor:Location": "Location",
+    "Engine.Actor:Rotation": "RotationTag",
+    "Engine.Actor:Role": "Enum",
+    "Engine.Actor:RemoteRole": "Enum",
+    "Engine.GameReplicationInfo:bMatchIsOver": "Boolean",
+    "Engine.GameReplicationInfo:GameClass": "ActiveActor",
+    "Engine.GameReplicationInfo:ServerName": "String",
+    "Engine.Pawn:PlayerReplicationInfo": "ActiveActor",
+    "Engine.PlayerReplicationInfo:bBot": "Boolean",
+    "Engine.PlayerReplicationInfo:bIsSpectator": "Boolean",
+    "Engine.PlayerReplicationInfo:bReadyToPlay": "Boolean",
+    "Engine.PlayerReplicationInfo:bTimedOut": "Boolean",
+    "Engine.PlayerReplicationInfo:bWaitingPlayer": "Boolean",
+    "Engine.PlayerReplicationInfo:Ping": "Byte",
+    "Engine.PlayerReplicationInfo:PlayerID": "Int",
+    "Engine.PlayerReplicationInfo:PlayerName": "String",
+    "Engine.PlayerReplicationInfo:RemoteUserData": "String",
+    "Engine.PlayerReplicationInfo:Score": "Int",
+    "Engine.PlayerReplicationInfo:Team": "ActiveActor",
+    "Engine.PlayerReplicationInfo:UniqueId": "UniqueId",
+    "Engine.TeamInfo:Score": "Int",
+    # ProjectX
+    "ProjectX.GRI_X:bGameStarted": "Boolean",
+    "ProjectX.GRI_X:GameServerID": "GameServer",
+    "ProjectX.GRI_X:MatchGUID": "String",
+    "ProjectX.GRI_X:ReplicatedGamePlaylist": "Int",
+    "ProjectX.GRI_X:ReplicatedGameMutatorIndex": "Int",
+    "ProjectX.GRI_X:ReplicatedServerRegion": "String",
+    "ProjectX.GRI_X:Reservations": "Reservation",
+    # Balón
+    "TAGame.Ball_Breakout_TA:AppliedDamage": "AppliedDamage",
+    "TAGame.Ball_Breakout_TA:DamageIndex": "Int",
+    "TAGame.Ball_Breakout_TA:LastTeamTouch": "Byte",
+    "TAGame.Ball_God_TA:TargetSpeed": "Float",
+    "TAGame.Ball_TA:bEndOfGameHidden": "Boolean",
+    "TAGame.Ball_TA:GameEvent": "ActiveActor",
+    "TAGame.Ball_TA:HitTeamNum": "Byte",
+    "TAGame.Ball_TA:ReplicatedAddedCarBounceScale": "Float",
+    "TAGame.Ball_TA:ReplicatedBallGravityScale": "Float",
+    "TAGame.Ball_TA:ReplicatedBallMaxLinearSpeedScale": "Float",
+    "TAGame.Ball_TA:ReplicatedBallScale": "Float",
+    "TAGame.Ball_TA:ReplicatedExplosionData": "Explosion",
+    "TAGame.Ball_TA:ReplicatedExplosionDataExtended": "ExtendedExplosion",
+    "TAGame.Ball_TA:ReplicatedPhysMatOverride": "ActiveActor",
+    "TAGame.Ball_TA:ReplicatedWorldBounceScale": "Float",
+    "TAGame.BreakOutActor_Platform_TA:DamageState": "DamageState",
+    # Cámara
+    "TAGame.CameraSettingsActor_TA:bMouseCameraToggleEnabled": "Boolean",
+    "TAGame.CameraSettingsActor_TA:bUsingBehindView": "Boolean",
+    "TAGame.CameraSettingsActor_TA:bUsingSecondaryCamera": "Boolean",
+    "TAGame.CameraSettingsActor_TA:bUsingSwivel": "Boolean",
+    "TAGame.CameraSettingsActor_TA:CameraPitch": "Byte",
+    "TAGame.CameraSettingsActor_TA:CameraYaw": "Byte",
+    "TAGame.CameraSettingsActor_TA:PRI": "ActiveActor",
+    "TAGame.CameraSettingsActor_TA:ProfileSettings": "CamSettings",
+    # Coche y componentes
+    "TAGame.Car_TA:AddedBallForceMultiplier": "Float",
+    "TAGame.Car_TA:AddedCarForceMultiplier": "Float",
+    "TAGame.Car_TA:AttachedPickup": "ActiveActor",
+    "TAGame.Car_TA:ClubColors": "ClubColors",
+    "TAGame.Car_TA:ReplicatedCarScale": "Float",
+    "TAGame.Car_TA:ReplicatedDemolish": "Demolish",
+    "TAGame.Car_TA:ReplicatedDemolishExtended": "DemolishExtended",
+    "TAGame.Car_TA:ReplicatedDemolishGoalExplosion": "DemolishFx",
+    "TAGame.Car_TA:ReplicatedDemolish_CustomFX": "DemolishFx",
+    "TAGame.Car_TA:RumblePickups": "ActiveActor",
+    "TAGame.Car_TA:TeamPaint": "TeamPaint",
+    "TAGame.CarComponent_Boost_TA:bNoBoost": "Boolean",
+    "TAGame.CarComponent_Boost_TA:BoostModifier": "Float",
+    "TAGame.CarComponent_Boost_TA:bUnlimitedBoost": "Boolean",
+    "TAGame.CarComponent_Boost_TA:CurrentBoostAmount": "Float",
+    "TAGame.CarComponent_Boost_TA:RechargeDelay": "Float",
+    "TAGame.CarComponent_Boost_TA:RechargeRate": "Float",
+    "TAGame.CarComponent_Boost_TA:ReplicatedBoost": "ReplicatedBoost",
+    "TAGame.CarComponent_Boost_TA:ReplicatedBoostAmount": "Byte",
+    "TAGame.CarComponent_Boost_TA:UnlimitedBoostRefCount": "Int",
+    "TAGame.CarComponent_Dodge_TA:DodgeTorque": "Location",
+    "TAGame.CarComponent_FlipCar_TA:bFlipRight": "Boolean",
+    "TAGame.CarComponent_FlipCar_TA:FlipCarTime": "Float",
+    "TAGame.CarComponent_TA:ReplicatedActive": "Byte",
+    "TAGame.CarComponent_TA:ReplicatedActivityTime": "Float",
+    "TAGame.CarComponent_TA:Vehicle": "ActiveActor",
+    "TAGame.RBActor_TA:bFrozen": "Boolean",
+    "TAGame.RBActor_TA:bIgnoreSyncing": "Boolean",
+    "TAGame.RBActor_TA:bReplayActor": "Boolean",
+    "TAGame.RBActor_TA:MaxAngularSpeed": "Float",
+    "TAGame.RBActor_TA:MaxLinearSpeed": "Float",
+    "TAGame.RBActor_TA:ReplicatedRBState": "RigidBody",
+    "TAGame.RBActor_TA:WeldedInfo": "Welded",
+    "TAGame.Vehicle_TA:bDriving": "Boolean",
+    "TAGame.Vehicle_TA:bReplicatedHandbrake": "Boolean",
+    "TAGame.Vehicle_TA:ReplicatedSteer": "Byte",
+    "TAGame.Vehicle_TA:ReplicatedThrottle": "Byte",
+    # Público
+    "TAGame.CrowdActor_TA:GameEvent": "ActiveActor",
+    "TAGame.CrowdActor_TA:ModifiedNoise": "Float",
+    "TAGame.CrowdActor_TA:ReplicatedCountDownNumber": "Int",
+    "TAGame.CrowdActor_TA:ReplicatedOneShotSound": "ActiveActor",
+    "TAGame.CrowdActor_TA:ReplicatedRoundEndSound": "ActiveActor",
+    "TAGame.CrowdManager_TA:GameEvent": "ActiveActor",
+    "TAGame.CrowdManager_TA:ReplicatedGlobalOneShotSound": "ActiveActor",
+    # Evento de partido
+    "TAGame.GameEvent_Soccar_TA:bBallHasBeenHit": "Boolean",
+    "TAGame.GameEvent_Soccar_TA:bClubMatch": "Boolean",
+    "TAGame.GameEvent_Soccar_TA:bMatchEnded": "Boolean",
+    "TAGame.GameEvent_Soccar_TA:bNoContest": "Boolean",
+    "TAGame.GameEvent_Soccar_TA:bOverTime": "Boolean",
+    "TAGame.GameEvent_Soccar_TA:bUnlimitedTime": "Boolean",
+    "TAGame.GameEvent_Soccar_TA:GameTime": "Int",
+    "TAGame.GameEvent_Soccar_TA:GameWinner": "ActiveActor",
+    "TAGame.GameEvent_Soccar_TA:MatchWinner": "ActiveActor",
+    "TAGame.GameEvent_Soccar_TA:MaxScore": "Int",
+    "TAGame.GameEvent_Soccar_TA:MVP": "ActiveActor",
+    "TAGame.GameEvent_Soccar_TA:ReplicatedMusicStinger": "MusicStinger",
+    "TAGame.GameEvent_Soccar_TA:ReplicatedScoredOnTeam": "Byte",
+    "TAGame.GameEvent_Soccar_TA:ReplicatedServerPerformanceState": "Byte",
+    "TAGame.GameEvent_Soccar_TA:ReplicatedStatEvent": "StatEvent",
+    "TAGame.GameEvent_Soccar_TA:RoundNum": "Int",
+    "TAGame.GameEvent_Soccar_TA:SecondsRemaining": "Int",
+    "TAGame.GameEvent_Soccar_TA:SeriesLength": "Int",
+    "TAGame.GameEvent_Soccar_TA:SubRulesArchetype": "ActiveActor",
+    "TAGame.GameEvent_SoccarPrivate_TA:MatchSettings": "PrivateMatchSettings",
+    "TAGame.GameEvent_TA:bCanVoteToForfeit": "Boolean",
+    "TAGame.GameEvent_TA:bHasLeaveMatchPenalty": "Boolean",
+    "TAGame.GameEvent_TA:BotSkill": "Int",
+    "TAGame.GameEvent_TA:GameMode": "GameMode",
+    "TAGame.GameEvent_TA:MatchTypeClass": "ActiveActor",
+    "TAGame.GameEvent_TA:ReplicatedGameStateTimeRemaining": "Int",
+    "TAGame.GameEvent_TA:ReplicatedRoundCountDownNumber": "Int",
+    "TAGame.GameEvent_TA:ReplicatedStateIndex": "Byte",
+    "TAGame.GameEvent_TA:ReplicatedStateName": "Int",
+    "TAGame.GameEvent_Team_TA:bDisableMutingOtherTeam": "Boolean",
+    "TAGame.GameEvent_Team_TA:bForfeit": "Boolean",
+    "TAGame.GameEvent_Team_TA:MaxTeamSize": "Int",
+    "TAGame.GRI_TA:NewDedicatedServerIP": "String",
+    # Jugadores
+    "TAGame.PRI_TA:bIsDistracted": "Boolean",
+    "TAGame.PRI_TA:bIsInSplitScreen": "Boolean",
+    "TAGame.PRI_TA:bMatchMVP": "Boolean",
+    "TAGame.PRI_TA:bOnlineLoadoutSet": "Boolean",
+    "TAGame.PRI_TA:bOnlineLoadoutsSet": "Boolean",
+    "TAGame.PRI_TA:BotProductName": "Int",
+    "TAGame.PRI_TA:bReady": "Boolean",
+    "TAGame.PRI_TA:bUsingBehindView": "Boolean",
+    "TAGame.PRI_TA:bUsingItems": "Boolean",
+    "TAGame.PRI_TA:bUsingSecondaryCamera": "Boolean",
+    "TAGame.PRI_TA:bVoteToForfeitDisabled": "Boolean",
+    "TAGame.PRI_TA:CameraPitch": "Byte",
+    "TAGame.PRI_TA:CameraSettings": "CamSettings",
+    "TAGame.PRI_TA:CameraYaw": "Byte",
+    "TAGame.PRI_TA:ClientLoadout": "Loadout",
+    "TAGame.PRI_TA:ClientLoadoutOnline": "LoadoutOnline",
+    "TAGame.PRI_TA:ClientLoadouts": "TeamLoadout",
+    "TAGame.PRI_TA:ClientLoadoutsOnline": "LoadoutsOnline",
+    "TAGame.PRI_TA:ClubID": "Int64",
+    "TAGame.PRI_TA:MatchAssists": "Int",
+    "TAGame.PRI_TA:MatchBreakoutDamage": "Int",
+    "TAGame.PRI_TA:MatchGoals": "Int",
+    "TAGame.PRI_TA:MatchSaves": "Int",
+    "TAGame.PRI_TA:MatchScore": "Int",
+    "TAGame.PRI_TA:MatchShots": "Int",
+    "TAGame.PRI_TA:MaxTimeTillItem": "Int",
+    "TAGame.PRI_TA:PartyLeader": "PartyLeader",
+    "TAGame.PRI_TA:PawnType": "Byte",
+    "TAGame.PRI_TA:PersistentCamera": "ActiveActor",
+    "TAGame.PRI_TA:PlayerHistoryKey": "PlayerHistoryKey",
+    "TAGame.PRI_TA:PlayerHistoryValid": "Boolean",
+    "TAGame.PRI_TA:PrimaryTitle": "Title",
+    "TAGame.PRI_TA:ReplicatedGameEvent": "ActiveActor",
+    "TAGame.PRI_TA:ReplicatedWorstNetQualityBeyondLatency": "Byte",
+    "TAGame.PRI_TA:RepStatTitles": "RepStatTitle",
+    "TAGame.PRI_TA:SecondaryTitle": "Title",
+    "TAGame.PRI_TA:SpectatorShortcut": "Int",
+    "TAGame.PRI_TA:SteeringSensitivity": "Float",
+    "TAGame.PRI_TA:TimeTillItem": "Int",
+    "TAGame.PRI_TA:Title": "Int",
+    "TAGame.PRI_TA:TotalXP": "Int",
+    # Equipos
+    "TAGame.Team_Soccar_TA:GameScore": "Int",
+    "TAGame.Team_TA:ClubColors": "ClubColors",
+    "TAGame.Team_TA:ClubID": "Int64",
+    "TAGame.Team_TA:CustomTeamName": "String",
+    "TAGame.Team_TA:GameEvent": "ActiveActor",
+    "TAGame.Team_TA:LogoData": "LogoData",
+    # Objetos del mapa y modos especiales
+    "TAGame.SpecialPickup_BallFreeze_TA:RepOrigSpeed": "Float",
+    "TAGame.SpecialPickup_BallVelcro_TA:AttachTime": "Float",
+    "TAGame.SpecialPickup_BallVelcro_TA:bBroken": "Boolean",
+    "TAGame.SpecialPickup_BallVelcro_TA:bHit": "Boolean",
+    "TAGame.SpecialPickup_BallVelcro_TA:BreakTime": "Float",
+    "TAGame.SpecialPickup_Rugby_TA:bBallWelded": "Boolean",
+    "TAGame.SpecialPickup_Targeted_TA:Targeted": "ActiveActor",
+    "TAGame.VehiclePickup_TA:NewReplicatedPickupData": "PickupNew",
+    "TAGame.VehiclePickup_TA:ReplicatedPickupData": "Pickup",
+}
+
+
+# --- Actores: arquetipo → clase ------------------------------------------------
+
+# Arquetipos cuyo nombre no permite deducir la clase
+_ARCHETYPE_CLASSES: dict[str, str] = {
+    "Archetypes.Ball.Ball_Anniversary": "TAGame.Ball_TA",
+    "Archetypes.Ball.Ball_Basketball": "TAGame.Ball_TA",
+    "Archetypes.Ball.Ball_BasketBall_Mutator": "TAGame.Ball_TA",
+    "Archetypes.Ball.Ball_Beachball": "TAGame.Ball_TA",
+    "Archetypes.Ball.Ball_Default": "TAGame.Ball_TA",
+    "Archetypes.Ball.Ball_Puck": "TAGame.Ball_TA",
+    "Archetypes.Ball.CubeBall": "TAGame.Ball_TA",
+    "Archetypes.Ball.Ball_Breakout": "TAGame.Ball_Breakout_TA",
+    "Archetypes.Ball.Ball_Haunted": "TAGame.Ball_Haunted_TA",
+    "Archetypes.Ball.Ball_God": "TAGame.Ball_God_TA",
+    "Archetypes.Car.Car_Default": "TAGame.Car_TA",
+    "Archetypes.CarComponents.CarComponent_Boost": "TAGame.CarComponent_Boost_TA",
+    "Archetypes.CarComponents.CarComponent_Dodge": "TAGame.CarComponent_Dodge_TA",
+    "Archetypes.CarComponents.CarComponent_DoubleJump": "TAGame.CarComponent_DoubleJump_TA",
+    "Archetypes.CarComponents.CarComponent_FlipCar": "TAGame.CarComponent_FlipCar_TA",
+    "Archetypes.CarComponents.CarComponent_Jump": "TAGame.CarComponent_Jump_TA",
+    "Archetypes.GameEvent.GameEvent_Basketball": "TAGame.GameEvent_Soccar_TA",
+    "Archetypes.GameEvent.GameEvent_Breakout": "TAGame.GameEvent_Soccar_TA",
+    "Archetypes.GameEvent.GameEvent_Hockey": "TAGame.GameEvent_Soccar_TA",
+    "Archetypes.GameEvent.GameEvent_Items": "TAGame.GameEvent_Soccar_TA",
+    "Archetypes.GameEvent.GameEvent_Soccar": "TAGame.GameEvent_Soccar_TA",
+    "Archetypes.GameEvent.GameEvent_SoccarLan": "TAGame.GameEvent_Soccar_TA",
+    "Archetypes.GameEvent.GameEvent_BasketballPrivate": "TAGame.GameEvent_SoccarPrivate_TA",
+    "Archetypes.GameEvent.GameEvent_BreakoutPrivate": "TAGame.GameEvent_SoccarPrivate_TA",
+    "Archetypes.GameEvent.GameEvent_HockeyPrivate": "TAGame.GameEvent_SoccarPrivate_TA",
+    "Archetypes.GameEvent.GameEvent_SoccarPrivate": "TAGame.GameEvent_SoccarPrivate_TA",
+    "Archetypes.GameEvent.GameEvent_BasketballSplitscreen": "TAGame.GameEvent_SoccarSplitscreen_TA",
+    "Archetypes.GameEvent.GameEvent_HockeySplitscreen": "TAGame.GameEvent_SoccarSplitscreen_TA",
+    "Archetypes.GameEvent.GameEvent_SoccarSplitscreen": "TAGame.GameEvent_SoccarSplitscreen_TA",
+    "Archetypes.GameEvent.GameEvent_Season": "TAGame.GameEvent_Season_TA",
+    "Archetypes.Teams.Team0": "TAGame.Team_Soccar_TA",
+    "Archetypes.Teams.Team1": "TAGame.Team_Soccar_TA",
+    "Archetypes.Tutorial.Cannon": "TAGame.Cannon_TA",
+}
+
+# Clases cuyos actores nacen con posición y rotación
+_ROTATION_CLASSES = frozenset(
+    (
+        "TAGame.Ball_TA",
+        "TAGame.Ball_Breakout_TA",
+        "TAGame.Ball_Haunted_TA",
+        "TAGame.Ball_God_TA",
+        "TAGame.Car_TA",
+        "TAGame.Car_Season_TA",
+    )
+)
+
+_INSTANCE_SUFFIX = re.compile(r"_\d+$")
+
+
+def _class_of(name: str, short_classes: dict[str, str]) -> str | None:
+    """Clase de un arquetipo u objeto del mapa ("...PersistentLevel.CrowdActor_TA_0")."""
+    cls = _ARCHETYPE_CLASSES.get(name)
+    if cls is not None:
+        return cls
+    if name.endswith(":GameReplicationInfoArchetype"):
+        return "TAGame.GRI_TA"
+    short = _INSTANCE_SUFFIX.sub("", name.rsplit(".", 1)[-1]).replace("Default__", "", 1)
+    return short_classes.get(short) or short_classes.get(short + "_TA")
+
+
+# --- Cuerpo del replay ---------------------------------------------------------
+
+
+def _read_list(s: _Stream, read_item: Callable[[_Stream], Any]) -> list:
+    count = s.read_u32()
+    if count > s.remaining():
+        raise ValueError("Lista demasiado grande en el cuerpo del replay")
+    return [read_item(s) for _ in range(count)]
+
+
+def _read_cache_entry(s: _Stream) -> tuple[int, int, int, list[tuple[int, int]]]:
+    class_oid, parent_id, cache_id = s.read_i32(), s.read_i32(), s.read_i32()
+    return class_oid, parent_id, cache_id, _read_list(s, lambda s: (s.read_i32(), s.read_i32()))
+
+
+def _skip_entries(s: _Stream, count: int, skip: Callable[[_Stream], None]) -> None:
+    if count > s.remaining():
+        raise ValueError("Lista demasiado grande en el cuerpo del replay")
+    for _ in range(count):
+        skip(s)
+
+
+class _Body(NamedTuple):
+    network_start: int
+    network_end: int
+    objects: list[str]
+    names: list[str]
+    class_indices: list[tuple[str, int]]
+    net_cache: list[tuple[int, int, int, list[tuple[int, int]]]]
+
+
+def _read_body(view: memoryview, start: int) -> _Body:
+    """Lee las tablas del cuerpo; del stream de red solo guarda los límites."""
+    s = _Stream(view, start)
+    s.read_i32()  # content_size
+    s.read_u32()  # content_crc
+    _skip_entries(s, s.read_u32(), _read_string16)  # niveles
+    keyframes = s.read_u32()
+    if keyframes * 12 > s.remaining():
+        raise ValueError("Lista de keyframes inválida")
+    s.advance(keyframes * 12)
+    network_size = s.read_u32()
+    if network_size > s.remaining():
+        raise ValueError("Tamaño del stream de red inválido")
+    network_start = s.tell()
+    s.advance(network_size)
+
+    def _skip_debug(s: _Stream) -> None:
+        s.advance(4)
+        _read_string16(s)
+        _read_string16(s)
+
+    def _skip_tick_mark(s: _Stream) -> None:
+        _read_string16(s)
+        s.advance(4)
+
+    _skip_entries(s, s.read_u32(), _skip_debug)
+    _skip_entries(s, s.read_u32(), _skip_tick_mark)
+    _skip_entries(s, s.read_u32(), _read_string16)  # paquetes
+    objects = _read_list(s, _read_string16)
+    names = _read_list(s, _read_string16)
+    class_indices = _read_list(s, lambda s: (_read_string16(s), s.read_i32()))
+    net_cache = _read_list(s, _read_cache_entry)
+    return _Body(network_start, network_start + network_size, objects, names, class_indices, net_cache)
+
+
+def _class_attributes(net_cache: list) -> dict[int, dict[int, int]]:
+    """object_id de la clase → {stream_id: object_id del atributo}, incluidos los heredados."""
+    by_cache_id: dict[int, dict[int, int]] = {}
+    out: dict[int, dict[int, int]] = {}
+    for class_oid, parent_id, cache_id, props in net_cache:
+        # El padre es la entrada anterior más reciente con ese cache_id
+        attrs = dict(by_cache_id.get(parent_id, ()))
+        attrs.update((stream_id, oid) for oid, stream_id in props)
+        by_cache_id[cache_id] = attrs
+        out[class_oid] = attrs
+    return out
+
+
+# --- Stream de red -------------------------------------------------------------
+
+
+def _unknown_attribute(name: str, r: BitReader) -> None:
+    raise ValueError(f"Atributo sin tipo conocido en el stream de red: {name!r} (ver netstream.ATTRIBUTE_TYPES)")
+
+
+class _Decoder:
+    """Estado de la decodificación de un replay: tablas compiladas por clase y arquetipo."""
+
+    def __init__(self, body: _Body, ctx: _Context, wanted: frozenset[int]):
+        self.ctx = ctx
+        self.wanted = wanted
+        self.attributes = _class_attributes(body.net_cache)
+        self.class_ids = {name: oid for name, oid in body.class_indices}
+        self.short_classes = {name.rsplit(".", 1)[-1]: name for name, _ in body.class_indices}
+        self.compiled: dict[int, tuple[int, dict[int, Any]]] = {}
+        self.archetypes: dict[int, tuple[tuple[int, dict[int, Any]], int]] = {}
+
+    def _entry(self, oid: int) -> Any:
+        """Forma compilada de un atributo (ver el docstring del módulo)."""
+        objects = self.ctx.objects
+        name = objects[oid] if 0 <= oid < len(objects) else f"#{oid}"
+        kind = ATTRIBUTE_TYPES.get(name)
+        if kind is None:
+            return functools.partial(_unknown_attribute, name)
+        if oid in self.wanted and kind in _DECODERS:
+            return (oid, _DECODERS[kind])
+        width = _fixed_width(kind, self.ctx)
+        if width is not None:
+            return width
+        return functools.partial(_SKIPPERS[kind], ctx=self.ctx)
+
+    def _compile_class(self, class_oid: int) -> tuple[int, dict[int, Any]]:
+        info = self.compiled.get(class_oid)
+        if info is None:
+            attrs = self.attributes.get(class_oid, {})
+            entries = {stream_id: self._entry(oid) for stream_id, oid in attrs.items()}
+            info = (max(attrs, default=1) + 1, entries)
+            self.compiled[class_oid] = info
+        return info
+
+    def archetype(self, oid: int) -> tuple[tuple[int, dict[int, Any]], int]:
+        """(clase compilada, trayectoria inicial: 0 nada, 1 posición, 2 posición y rotación)."""
+        found = self.archetypes.get(oid)
+        if found is not None:
+            return found
+        objects = self.ctx.objects
+        if not 0 <= oid < len(objects):
+            raise ValueError(f"Actor nuevo con objeto fuera de rango: {oid}")
+        name = objects[oid]
+        cls = _class_of(name, self.short_classes)
+        if cls is None or cls not in self.class_ids:
+            raise ValueError(f"Clase desconocida para el actor {name!r}")
+        if ":PersistentLevel." in name:
+            spawn = 0  # actores fijos del mapa
+        elif cls in _ROTATION_CLASSES:
+            spawn = 2
+        else:
+            spawn = 1
+        found = (self._compile_class(self.class_ids[cls]), spawn)
+        self.archetypes[oid] = found
+        return found
+
+    def frames(self, r: BitReader, num_frames: int | None, max_channels: int) -> Iterator[dict]:
+        """Frames con solo las actualizaciones pedidas, generados a demanda."""
+        ctx = self.ctx
+        read_bit = r.read_bit
+        read_i32 = r.read_i32
+        read_f32 = r.read_f32
+        read_int = r.read_serialized_int
+        name_ids = ctx.version >= (868, 14, 0)
+        actors: dict[int, tuple[int, dict[int, Any]]] = {}
+        frame = 0
+        while (frame < num_frames) if num_frames is not None else r.remaining() >= 65:
+            time = read_f32()
+            delta = read_f32()
+            updated: list[dict] = []
+            while read_bit():
+                actor_id = read_int(max_channels)
+                if not read_bit():  # canal cerrado: actor eliminado
+                    actors.pop(actor_id, None)
+                    continue
+                if read_bit():  # actor nuevo
+                    if name_ids:
+                        r.advance(32)
+                    r.advance(1)
+                    info, spawn = self.archetype(read_i32())
+                    actors[actor_id] = info
+                    if spawn:
+                        _skip_vector(r, ctx)
+                        if spawn == 2:
+                            _skip_rotation(r, ctx)
+                    continue
+                info = actors.get(actor_id)
+                if info is None:
+                    raise ValueError(f"Actualización de un actor inexistente ({actor_id}) en el frame {frame}")
+                limit, entries = info
+                while read_bit():
+                    stream_id = read_int(limit)
+                    entry = entries.get(stream_id)
+                    if entry.__class__ is int:
+                        r.pos += entry  # la siguiente lectura comprueba el límite
+                    elif entry.__class__ is tuple:
+                        updated.append(
+                            {"actor_id": actor_id, "stream_id": stream_id, "object_id": entry[0], "attribute": entry[1](r)}
+                        )
+                    elif entry is None:
+                        raise ValueError(f"stream_id {stream_id} desconocido para el actor {actor_id} en el frame {frame}")
+                    else:
+                        entry(r)
+            yield {"time": time, "delta": delta, "updated_actors": updated}
+            frame += 1
+
+
+def default_object_names() -> tuple[str, ...]:
+    """Objetos que usa algún extractor registrado (los que se decodifican por defecto)."""
+    from rl_replay_analyzer.events import recorded_names
+
+    return recorded_names()
+
+
+def parse_replay(data, object_names: Iterable[str] | None = None) -> dict:
+    """
+    Sustituto en Python puro de `parse_replay` de boxcars.
+
+    Devuelve el replay como dict ("properties", "objects", "names",
+    "network_frames" y la versión). Los frames de `network_frames["frames"]`
+    son un generador que solo contiene las actualizaciones de `object_names`
+    (por defecto, `default_object_names()`); el resto del stream se salta.
+
+    Args:
+        data: Bytes (o memoryview/mmap) del archivo .replay completo. El
+            generador de frames mantiene una vista sobre ellos hasta agotarse.
+        object_names: Atributos a decodificar (p. ej. SECONDS_REMAINING).
+
+    Raises:
+        ValueError: Header o cuerpo ilegible. Los errores del stream de red
+            (atributo de tipo desconocido, datos truncados) se lanzan al
+            recorrer los frames.
+    """
+    view, _, header_end = _header_bounds(data)
+    header = parse_header(view, stop_at_goals=False)
+    version = (header["major_version"], header["minor_version"], header["net_version"])
+    body = _read_body(view, header_end)
+
+    props = dict(header["properties"])
+    num_frames = props.get("NumFrames")
+    max_channels = props.get("MaxChannels")
+    if not isinstance(max_channels, int) or max_channels <= 0:
+        max_channels = 1023
+
+    names = default_object_names() if object_names is None else tuple(object_names)
+    wanted = frozenset(object_index(body.objects).subset(names).values())
+
+    decoder = _Decoder(body, _Context(version, body.objects, 22 if version[2] >= 7 else 20), wanted)
+    reader = BitReader(view, body.network_start, body.network_end)
+    frames = decoder.frames(reader, num_frames if isinstance(num_frames, int) else None, max_channels)
+    return {
+        "major_version": version[0],
+        "minor_version": version[1],
+        "net_version": version[2],
+        "properties": header["properties"],
+        "objects": body.objects,
+        "names": body.names,
+        "network_frames": {"frames": frames},
+    }
@@ -0,0 +1,69 @@
+"""
+Índice nombre → object_id de la tabla de objetos de un replay.
+
+La tabla `objects` de boxcars tiene miles de entradas y los extractores
+necesitan resolver unos pocos nombres. En lugar de `objects.index(name)`
+(búsqueda lineal por nombre) se construye un dict una vez por replay. Los
+replays de una misma build del juego comparten tabla idéntica, así que el
+índice se memoiza por contenido y un lote no lo reconstruye en cada archivo.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Iterable, Mapping, Sequence
+
+
+class ObjectIndex:
+    """Búsqueda O(1) de object_id por nombre (primera aparición, como list.index)."""
+
+    __slots__ = ("_ids",)
+
+    def __init__(self, ids: Mapping[str, int]):
+        self._ids = dict(ids)
+
+    @classmethod
+    def from_objects(cls, objects: Sequence[str]) -> "ObjectIndex":
+        """Construye el índice desde la tabla completa de objetos."""
+        # Recorrer al revés para que gane la primera aparición de cada nombre
+        n = len(objects)
+        return cls(dict(zip(reversed(objects), range(n - 1, -1, -1))))
+
+    def get(self, name: str) -> int | None:
+        """object_id del nombre, o None si el replay no lo contiene."""
+        return self._ids.get(name)
+
+    def subset(self, names: Iterable[str]) -> dict[str, int]:
+        """Solo los nombres pedidos que existen en el replay."""
+        ids = self._ids
+        return {n: ids[n] for n in names if n in ids}
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+
+@lru_cache(maxsize=8)
+def _cached_index(objects: tuple[str, ...]) -> ObjectIndex:
+    return ObjectIndex.from_objects(objects)
+
+
+def object_index(objects: Sequence[str] | None) -> ObjectIndex:
+    """
+    Devuelve el índice de una tabla de objetos, reutilizando el de una tabla idéntica.
+
+    Args:
+        objects: Tabla `objects` (o `names`) del replay.
+
+    Returns:
+        ObjectIndex compartido por todas las tablas con el mismo contenido.
+    """
+    if not objects:
+        return ObjectIndex({})
+    try:
+        return _cached_index(tuple(objects))
+    except TypeError:  # elementos no hashables: índice sin memoizar
+        pairs = [(o, i) for i, o in enumerate(objects) if isinstance(o, str)]
+        return ObjectIndex(dict(reversed(pairs)))
@@ -4,15 +4,47 @@ Parser de archivos .replay de Rocket League.
 Extrae equipos (blue/orange) y lista de goles con tiempo EXACTO del marcador
 y equipo que anotó, usando ÚNICAMENTE el stream de red (network_frames).
 NO se usa header["Goals"], Frame, ni conversión frame→segundos ni tick_rate.
+
+Existe además un modo rápido (`mode="header"`) que solo lee el header con
+`header_fallback.parse_header`, sin decodificar frames de red; en ese modo los
+tiempos son aproximados (se derivan del frame de cada gol).
+
+Los frames se consumen como un flujo: si el backend entrega
+`network_frames` como iterador (o `{"frames": iterador}`), cada frame se
+procesa y se descarta sin materializar la lista completa, y la memoria queda
+acotada sea cual sea la duración del partido. Con una lista ya construida y
+un replay propio (`consume=True`), los frames se sueltan a medida que se
+recorren. La pasada la hace `extractors.run_extractors`: los goles son un
+extractor más y se pueden añadir otros en el mismo recorrido.
 """
 
 from __future__ import annotations
 
+import time
+from collections.abc import Iterable, Iterator
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any, Callable
 
+from rl_replay_analyzer.extractors import Extractor, GoalsExtractor, create_extractors, extractor_class, run_extractors
+from rl_replay_analyzer.header_fallback import parse_header, parse_header_file
+from rl_replay_analyzer.header_view import HeaderView
+from rl_replay_analyzer.objects import ObjectIndex
+from rl_replay_analyzer.stats import StageStats, stage
 from rl_replay_analyzer.utils import seconds_to_mm_ss
 
+if TYPE_CHECKING:
+    from rl_replay_analyzer.cache import ResultCache
+    from rl_replay_analyzer.routing import Router
+
+MODES = ("full", "header")
+
+# Duración reglamentaria y FPS por defecto para aproximar tiempos en modo header
+_MATCH_SECONDS = 300
+_DEFAULT_RECORD_FPS = 30.0
+
+# Propiedades del header que necesita el modo header (RecordFPS va después de Goals)
+HEADER_KEYS = frozenset(("Goals", "RecordFPS"))
+
 
 def _replay_to_dict(replay: Any) -> dict:
     """Convierte el objeto replay (boxcars) a dict para acceso uniforme."""
@@ -24,8 +56,9 @@ def _replay_to_dict(replay: Any) -> dict:
     for name in ("properties", "network_frames", "objects", "names"):
         if hasattr(replay, name):
             val = getattr(replay, name)
-            # network_frames es un objeto con .frames, no convertirlo a lista
-            if name == "network_frames":
+            # network_frames es un objeto con .frames, no convertirlo a lista;
+            # las tablas que ya son list/tuple se usan tal cual (sin copiar)
+            if name == "network_frames" or isinstance(val, (list, tuple)):
                 out[name] = val
             elif hasattr(val, "__iter__") and not isinstance(val, (str, bytes)):
                 try:
@@ -37,121 +70,59 @@ def _replay_to_dict(replay: Any) -> dict:
     return out
 
 
-def _extract_goals_from_network_frames(replay_dict: dict) -> list[dict]:
-    """
-    Extrae goles recorriendo `replay.network_frames` y leyendo el stream de red.
-
-    Forma robusta (comprobada en este replay):
-    - El tiempo REAL del marcador está en actualizaciones de
-      `TAGame.GameEvent_Soccar_TA:SecondsRemaining` (attribute `Int`).
-    - El gol se detecta cuando `TAGame.GameEvent_Soccar_TA:ReplicatedStatEvent`
-      publica `StatEvents.Events.Goal`.
-    - El equipo que anota se obtiene del atributo `Byte` de
-      `TAGame.GameEvent_Soccar_TA:ReplicatedScoredOnTeam` (0/1).
-
-    Returns:
-        Lista de dicts {"seconds_remaining": int, "team_index": int | None},
-        en orden cronológico del partido (primer gol primero).
-    """
-    objects = replay_dict.get("objects") or replay_dict.get("names") or []
-
-    nf = replay_dict.get("network_frames")
-    if nf is None:
-        return []
-    frames = getattr(nf, "frames", None) or (nf.get("frames") if isinstance(nf, dict) else None)
-    if not frames:
-        return []
-
-    def _obj_index(name: str) -> int | None:
-        try:
-            return objects.index(name)
-        except ValueError:
-            return None
-
-    seconds_oid = _obj_index("TAGame.GameEvent_Soccar_TA:SecondsRemaining")
-    stat_oid = _obj_index("TAGame.GameEvent_Soccar_TA:ReplicatedStatEvent")
-    scored_team_oid = _obj_index("TAGame.GameEvent_Soccar_TA:ReplicatedScoredOnTeam")
-    goal_event_oid = _obj_index("StatEvents.Events.Goal")
-
-    if seconds_oid is None or stat_oid is None or goal_event_oid is None:
-        return []
-
-    current_seconds_remaining: int | None = None
-    current_team_index: int | None = None
-    goals: list[dict] = []
-
-    for frame in frames:
-        updated = frame.get("updated_actors", []) if isinstance(frame, dict) else []
-
-        for ua in updated:
-            oid = ua.get("object_id")
-            attr = ua.get("attribute")
-
-            if oid == seconds_oid and isinstance(attr, dict):
-                # SecondsRemaining suele venir como Int
-                if "Int" in attr and isinstance(attr["Int"], int):
-                    current_seconds_remaining = attr["Int"]
-                elif "Float" in attr and isinstance(attr["Float"], (int, float)):
-                    current_seconds_remaining = int(attr["Float"])
-
-            if oid == scored_team_oid and isinstance(attr, dict):
-                # En la práctica, en este replay el Byte ya viene como
-                # índice del equipo que anota: 0 = Local, 1 = Visitante.
-                if "Byte" in attr and isinstance(attr["Byte"], int):
-                    b = attr["Byte"]
-                    if b in (0, 1):
-                        current_team_index = b
-                elif "Int" in attr and isinstance(attr["Int"], int):
-                    i = attr["Int"]
-                    if i in (0, 1):
-                        current_team_index = i
-
-        # Detectar goal por ReplicatedStatEvent -> StatEvents.Events.Goal
-        is_goal = False
-        for ua in updated:
-            if ua.get("object_id") != stat_oid:
-                continue
-            attr = ua.get("attribute")
-            if not isinstance(attr, dict):
-                continue
-            se = attr.get("StatEvent")
-            if isinstance(se, dict) and se.get("object_id") == goal_event_oid:
-                is_goal = True
-                break
-
-        if is_goal and current_seconds_remaining is not None:
-            goals.append(
-                {
-                    "seconds_remaining": current_seconds_remaining,
-                    "team_index": current_team_index,
-                }
-            )
-
-    goals.sort(key=lambda g: g["seconds_remaining"], reverse=True)
-    return goals
-
-
-def extract_match_data(replay: Any) -> dict:
+def extract_match_data(
+    replay: Any,
+    stats: StageStats | None = None,
+    consume: bool = False,
+    extractors: Iterable[str] = (),
+    index: ObjectIndex | None = None,
+    observers: Iterable[Extractor] = (),
+) -> dict:
     """
     Extrae equipos y goles desde un replay ya parseado (boxcars_py).
 
     Los goles se obtienen ÚNICAMENTE del stream de red (network_frames),
     evento TAGame.GameEvent_Soccar_TA:GoalScored y atributo SecondsRemaining.
+    Con `stats` se miden las etapas "to_dict" y "extract_goals". Con
+    `consume=True` los frames se liberan mientras se recorren; úsese solo si
+    nadie más va a leer el replay.
+
+    Args:
+        extractors: Nombres de extractores adicionales (ver
+            `rl_replay_analyzer.extractors`) que se ejecutan en la misma
+            pasada; sus resultados van en "extractors".
+        index: Índice de objetos a usar en lugar del de la tabla del replay
+            (p. ej. el de un flujo de eventos, que no trae la tabla completa).
+        observers: Instancias de extractores que participan en la pasada sin
+            que su resultado se incluya (p. ej. `events.EventRecorder`).
 
     Returns:
         Dict con estructura:
         {
           "teams": { "blue": str, "orange": str },
-          "goals": [ { "time": "mm:ss", "team": str }, ... ]
+          "goals": [ { "time": "mm:ss", "team": str }, ... ],
+          "extractors": { nombre: resultado }   # solo si se piden
         }
+
+    Raises:
+        ValueError: Algún extractor no está registrado.
     """
-    replay_dict = _replay_to_dict(replay)
+    extra = create_extractors(name for name in extractors if name != GoalsExtractor.name)
+    with stage(stats, "to_dict"):
+        replay_dict = _replay_to_dict(replay)
 
     # Requisito del proyecto: blue/orange → Local/Visitante
     blue_name = "Local"
     orange_name = "Visitante"
 
-    goals_raw = _extract_goals_from_network_frames(replay_dict)
+    with stage(stats, "extract_goals"):
+        observers = list(observers)
+        results = run_extractors(replay_dict, [GoalsExtractor(), *extra, *observers], index=index, stats=stats, consume=consume)
+    for observer in observers:
+        results.pop(observer.name, None)
+    goals_raw = results.pop(GoalsExtractor.name)
+    if stats is not None:
+        stats.count("goals_found", len(goals_raw))
 
     goals: list[dict] = []
     for g in goals_raw:
@@ -167,50 +138,377 @@ def extract_match_data(replay: Any) -> dict:
             team_name = "Unknown"
         goals.append({"time": seconds_to_mm_ss(sec_rem), "team": team_name})
 
+    out = {"teams": {"blue": blue_name, "orange": orange_name}, "goals": goals}
+    if results:
+        out["extractors"] = results
+    return out
+
+
+def extract_header_match_data(header: dict | HeaderView) -> dict:
+    """
+    Extrae equipos y goles SOLO desde las propiedades del header.
+
+    Acepta el dict de `header_fallback.parse_header`, las `properties` de
+    boxcars o un `HeaderView` ya construido. Los goles salen de
+    header["Goals"] (frame y PlayerTeam); el tiempo del marcador se aproxima
+    como 300 - frame / RecordFPS, por lo que no descuenta pausas de saque ni
+    repeticiones y los goles en prórroga aparecen como 00:00.
+
+    Returns:
+        Dict con la misma estructura que `extract_match_data`.
+    """
+    blue_name = "Local"
+    orange_name = "Visitante"
+
+    view = header if isinstance(header, HeaderView) else HeaderView(header)
+    fps = view.get("RecordFPS")
+    if not isinstance(fps, (int, float)) or fps <= 0:
+        fps = _DEFAULT_RECORD_FPS
+
+    entries = sorted((g for g in view.goals if g.frame is not None), key=lambda g: g.frame)
+
+    goals: list[dict] = []
+    for g in entries:
+        sec_rem = max(0.0, _MATCH_SECONDS - g.frame / fps)
+        # PlayerTeam es el equipo que anota (no el que recibe como
+        # ReplicatedScoredOnTeam), así que aquí no hace falta invertir.
+        team_index = g.team
+        if team_index == 0:
+            team_name = blue_name
+        elif team_index == 1:
+            team_name = orange_name
+        else:
+            team_name = "Unknown"
+        goals.append({"time": seconds_to_mm_ss(sec_rem), "team": team_name})
+
     return {"teams": {"blue": blue_name, "orange": orange_name}, "goals": goals}
 
 
-def parse_replay_file(path: str | Path) -> dict:
+# Backend resuelto una sola vez por proceso
+_backend: Callable[[bytes], Any] | None = None
+
+
+def load_backend() -> Callable[[bytes], Any]:
+    """
+    Devuelve la función `parse_replay` del backend disponible.
+
+    Prefiere la extensión nativa (sprocket_boxcars_py, luego boxcars_py); sin
+    ninguna de las dos usa `netstream.parse_replay`, el decodificador en
+    Python puro (más lento, pero no necesita compilar nada). La búsqueda se
+    hace una sola vez por proceso; las llamadas siguientes devuelven el mismo
+    backend sin volver a recorrer sys.path.
+    """
+    global _backend
+    if _backend is not None:
+        return _backend
+    # Preferir el fork mantenido (sprocket) ya que soporta replays recientes.
+    try:
+        from sprocket_boxcars_py import parse_replay
+    except ImportError:
+        try:
+            from boxcars_py import parse_replay
+        except ImportError:
+            from rl_replay_analyzer.netstream import parse_replay
+    _backend = parse_replay
+    return _backend
+
+
+def parse_replay_file(
+    path: str | Path,
+    mode: str = "full",
+    cache: ResultCache | None = None,
+    backend: Callable[[bytes], Any] | None = None,
+    stats: StageStats | None = None,
+    extractors: Iterable[str] = (),
+    router: Router | None = None,
+) -> dict:
     """
     Abre un archivo .replay, lo parsea con boxcars_py y devuelve el resultado.
 
-    Requiere boxcars_py instalado (y compilación con MSVC en Windows).
+    Sin boxcars_py instalado se usa el decodificador en Python puro de
+    `rl_replay_analyzer.netstream` (mismo resultado, más lento). Con
+    `mode="header"` solo se lee el header y no se decodifican los frames de
+    red (mucho más rápido, tiempos aproximados).
 
     Args:
         path: Ruta al archivo .replay.
+        mode: "full" (stream de red, tiempos exactos) o "header".
+        cache: Caché de resultados opcional (solo se usa en modo "full";
+            el modo header ya es barato).
+        backend: Función bytes → replay que sustituye a `load_backend()`
+            (p. ej. el backend sintético de los benchmarks).
+        stats: Registro opcional de tiempos/memoria por etapa ("read",
+            "header", "cache", "backend_parse", "to_dict", "extract_goals")
+            y contadores.
+        extractors: Extractores adicionales a ejecutar en la pasada por los
+            frames (solo modo "full"; ver `extract_match_data`).
+        router: Tabla de rutas por versión (`routing.Router`): sin `backend`,
+            el replay se analiza con el backend más rápido que funciona para
+            su versión, probando los siguientes si falla.
 
     Returns:
         Dict con "teams" y "goals" listos para resultado.json.
 
     Raises:
         FileNotFoundError: Archivo no encontrado.
-        ValueError: No es un .replay o fallo al parsear.
+        ValueError: No es un .replay, modo desconocido, extractores en modo
+            header o fallo al parsear.
     """
-    path = Path(path)
-    if not path.exists():
-        raise FileNotFoundError(f"Archivo no encontrado: {path}")
-    if path.suffix.lower() != ".replay":
-        raise ValueError(f"Se esperaba extensión .replay: {path}")
+    extractors = _check_mode(mode, extractors)
+    path = _check_replay_path(path)
+
+    if mode == "header":
+        # Solo se mapea el header; el cuerpo del archivo no se lee
+        with stage(stats, "header"):
+            return extract_header_match_data(parse_header_file(path, keys=HEADER_KEYS))
+
+    # Los bytes viajan en una lista para que _parse_owned_bytes pueda soltar
+    # la única referencia en cuanto el backend los ha decodificado
+    with stage(stats, "read"):
+        with open(path, "rb") as f:
+            owned = [f.read()]
+    if stats is not None:
+        stats.count("bytes_read", len(owned[0]))
+
+    return _parse_owned_bytes(owned, mode, cache, backend, stats, extractors, router)
+
+
+def parse_replay_bytes(
+    data: bytes,
+    mode: str = "full",
+    cache: ResultCache | None = None,
+    backend: Callable[[bytes], Any] | None = None,
+    stats: StageStats | None = None,
+    extractors: Iterable[str] = (),
+    router: Router | None = None,
+) -> dict:
+    """
+    Como `parse_replay_file`, pero sobre el contenido ya leído de un .replay.
 
-    with open(path, "rb") as f:
-        data = f.read()
+    Útil cuando los bytes no vienen de disco (p. ej. enviados al servidor local).
 
-    # Preferir el fork mantenido (sprocket) ya que soporta replays recientes.
-    try:
-        from sprocket_boxcars_py import parse_replay
-    except ImportError:
-        try:
-            from boxcars_py import parse_replay
-        except ImportError as e:
-            raise ImportError(
-                "Se requiere boxcars_py o sprocket_boxcars_py. "
-                "Recomendado: pip install sprocket-boxcars-py. "
-                "En Windows necesitas Visual Studio Build Tools (MSVC)."
-            ) from e
+    Returns:
+        Dict con "teams" y "goals" listos para resultado.json.
+
+    Raises:
+        ValueError: Modo desconocido, extractores en modo header o fallo al parsear.
+    """
+    extractors = _check_mode(mode, extractors)
+    return _parse_owned_bytes([data], mode, cache, backend, stats, extractors, router)
 
-    replay = parse_replay(data)
 
+def _extract_owned(
+    replay: Any, cache: ResultCache | None, digest: str | None, stats: StageStats | None, extractors: tuple[str, ...]
+) -> dict:
+    """Extracción completa de un replay recién decodificado (y flujo de eventos a la caché)."""
     if replay is None:
         raise ValueError("El parser devolvió None")
 
-    return extract_match_data(replay)
+    observers = []
+    if cache is not None:
+        from rl_replay_analyzer.events import EventRecorder
+
+        observers.append(EventRecorder())
+    # El replay es nuestro: los frames se sueltan según se recorren
+    result = extract_match_data(replay, stats=stats, consume=True, extractors=extractors, observers=observers)
+    if observers:
+        from rl_replay_analyzer.events import save_events
+
+        save_events(cache, digest, observers[0].result())
+    return result
+
+
+class _BackendFrameError(Exception):
+    """Fallo al decodificar un frame de un backend perezoso: es del backend, no de la extracción."""
+
+
+def _guarded_frames(frames: Iterator) -> Iterator:
+    """Entrega los frames de `frames` convirtiendo sus errores de decodificación en `_BackendFrameError`."""
+    while True:
+        try:
+            frame = next(frames)
+        except StopIteration:
+            return
+        except MemoryError:
+            raise
+        except Exception as e:
+            raise _BackendFrameError(f"{type(e).__name__}: {e}") from e
+        yield frame
+
+
+def _guard_lazy_frames(replay: Any) -> bool:
+    """
+    Si el backend entrega los frames como iterador (p. ej. `netstream`), los
+    envuelve con `_guarded_frames` y devuelve True: la decodificación real
+    ocurre durante la extracción.
+    """
+    if not isinstance(replay, dict):
+        return False
+    nf = replay.get("network_frames")
+    if isinstance(nf, Iterator):
+        replay["network_frames"] = _guarded_frames(nf)
+        return True
+    if isinstance(nf, dict) and isinstance(nf.get("frames"), Iterator):
+        nf["frames"] = _guarded_frames(nf["frames"])
+        return True
+    return False
+
+
+def _parse_routed(
+    owned: list[bytes],
+    router: Router,
+    cache: ResultCache | None,
+    digest: str | None,
+    stats: StageStats | None,
+    extractors: tuple[str, ...],
+) -> dict:
+    """
+    Análisis completo por los backends que `router` propone para la versión
+    del replay, en orden, hasta que uno decodifique el replay entero. Los
+    bytes (la lista `owned`, que se vacía) se conservan solo mientras pueda
+    hacer falta otro intento: con un backend que decodifica de una vez se
+    sueltan antes de extraer, como en el camino sin rutas.
+
+    Un backend con frames perezosos no se da por bueno al devolver el
+    replay: la extracción, que es la que decodifica los frames, va dentro
+    del intento, y su tiempo cuenta para la velocidad del backend.
+
+    Solo los errores del backend (incluidos los de sus frames) cuentan como
+    fallo suyo en la tabla, y solo con archivos íntegros
+    (`routing.replay_intact`); los de la extracción se propagan sin tocarla.
+    """
+    from rl_replay_analyzer.routing import HEADER_ROUTE, file_key, format_version, replay_intact, replay_version
+
+    data = owned.pop()
+    size = len(data)
+    version = replay_version(data)
+    route = router.order(version)
+    if not route:
+        if stats is not None:
+            stats.count(f"route_{HEADER_ROUTE}")
+        raise ValueError(f"Ningún backend decodifica replays {format_version(version)} (ruta: {HEADER_ROUTE})")
+
+    errors = []
+    intact = None
+    for name in route:
+        start = time.perf_counter()
+        extracting = False
+        try:
+            with stage(stats, "backend_parse"):
+                replay = router.backends[name](data)
+            if replay is None:
+                raise ValueError("El parser devolvió None")
+            if _guard_lazy_frames(replay):
+                extracting = True
+                result = _extract_owned(replay, cache, digest, stats, extractors)
+            else:
+                result = None
+        except MemoryError:
+            raise
+        except Exception as e:
+            if extracting and not isinstance(e, _BackendFrameError):
+                raise
+            replay = None
+            message = str(e) if isinstance(e, _BackendFrameError) else f"{type(e).__name__}: {e}"
+            if intact is None:
+                intact = replay_intact(data)
+            if intact:
+                router.record(version, name, False, time.perf_counter() - start, size, message, digest or file_key(data))
+            if stats is not None:
+                stats.count(f"route_failed_{name}")
+            errors.append(f"{name}: {e}")
+            continue
+        router.record(version, name, True, time.perf_counter() - start, size)
+        if stats is not None:
+            stats.count(f"route_{name}")
+        if result is not None:
+            return result
+        del data
+        return _extract_owned(replay, cache, digest, stats, extractors)
+    suffix = "" if intact else "; el archivo parece truncado o dañado"
+    raise ValueError(f"Fallo al parsear con todos los backends ({'; '.join(errors)}){suffix}")
+
+
+def _check_replay_path(path: str | Path) -> Path:
+    """Comprueba que `path` existe y tiene extensión .replay (FileNotFoundError / ValueError)."""
+    path = Path(path)
+    if not path.exists():
+        raise FileNotFoundError(f"Archivo no encontrado: {path}")
+    if path.suffix.lower() != ".replay":
+        raise ValueError(f"Se esperaba extensión .replay: {path}")
+    return path
+
+
+def _check_mode(mode: str, extractors: Iterable[str]) -> tuple[str, ...]:
+    """Valida modo y extractores; devuelve los extractores como tupla."""
+    if mode not in MODES:
+        raise ValueError(f"Modo desconocido: {mode!r} (esperado: {', '.join(MODES)})")
+    extractors = tuple(extractors)
+    if extractors and mode == "header":
+        raise ValueError("Los extractores necesitan el stream de red: no se pueden usar en modo header")
+    return extractors
+
+
+def _parse_owned_bytes(
+    owned: list[bytes],
+    mode: str,
+    cache: ResultCache | None,
+    backend: Callable[[bytes], Any] | None,
+    stats: StageStats | None,
+    extractors: tuple[str, ...] = (),
+    router: Router | None = None,
+) -> dict:
+    """
+    Núcleo de `parse_replay_bytes`. `owned` es una lista con los bytes que se
+    vacía tras decodificarlos: si el llamador no guarda otra referencia, el
+    archivo se libera antes de recorrer los frames.
+    """
+    data = owned.pop()
+    if mode == "header":
+        with stage(stats, "header"):
+            return extract_header_match_data(parse_header(data, keys=HEADER_KEYS))
+
+    # Un extractor con resultado no serializable (p. ej. timeline) no pasa por
+    # la caché de resultados, pero sí puede usar el flujo de eventos
+    cache_results = cache is not None and all(extractor_class(name).json_result for name in extractors)
+    digest = cache_key = stream = None
+    if cache is not None:
+        from rl_replay_analyzer.events import load_events
+
+        with stage(stats, "cache"):
+            digest = cache.content_hash(data)
+            if cache_results:
+                # Los extractores pedidos cambian el resultado: forman parte de la clave
+                cache_key = cache.key_for_digest(digest, "+".join((mode, *sorted(extractors))))
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    if stats is not None:
+                        stats.count("cache_hits")
+                    return cached
+            stream = load_events(cache, digest)
+        if stream is not None and not stream.covers((GoalsExtractor.name, *extractors)):
+            stream = None
+
+    if stream is not None:
+        # Re-extracción desde el flujo de eventos guardado: sin backend
+        del data
+        if stats is not None:
+            stats.count("events_hits")
+        result = extract_match_data(
+            stream.to_replay_dict(), stats=stats, extractors=extractors, index=stream.object_index()
+        )
+    elif router is not None and backend is None:
+        # Sin referencia local: `_parse_routed` suelta los bytes tras decodificarlos
+        owned.append(data)
+        del data
+        result = _parse_routed(owned, router, cache, digest, stats, extractors)
+    else:
+        parse_replay = backend or load_backend()
+        with stage(stats, "backend_parse"):
+            replay = parse_replay(data)
+        del data
+        result = _extract_owned(replay, cache, digest, stats, extractors)
+
+    if cache_results:
+        cache.put(cache_key, result)
+    return result
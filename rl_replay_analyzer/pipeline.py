@@ -0,0 +1,413 @@
+"""
+Lote en etapas solapadas: lectura anticipada, análisis y escritura.
+
+En `run_batch` cada worker abre su replay y espera a `f.read()` antes de
+poder decodificarlo; con los replays en un disco de red los núcleos pasan
+buena parte del lote parados. Aquí el lote se divide en tres etapas unidas
+por colas acotadas:
+
+1. lectura (`ReadAhead`): un pool de hilos lee, en orden, los bytes de
+   los siguientes replays mientras los workers analizan los anteriores.
+   Como mucho `read_ahead` replays y `max_buffered_bytes` bytes esperan
+   leídos (un replay mayor que el límite se lee solo);
+2. análisis: los bytes van a los procesos del pool (`_analyze_one` con
+   `data`, el mismo camino que `parse_replay_bytes`); con `jobs=1`, a un
+   único hilo del propio proceso. Si un worker muere, los replays que el
+   pool tenía en curso salen con outcome "crash" y se crea un pool nuevo.
+   El pool supervisado (`supervisor.run_supervised`) usa la misma etapa de
+   lectura;
+3. escritura (`WriterStage`): cada resultado se entrega en un hilo propio a
+   través de una cola de `depth` elementos, para que la serialización no
+   frene la recogida de resultados.
+
+Cada etapa lleva un `StageMeter`: tiempo ocupado, tiempo que el lote estuvo
+parado esperándola y utilización (ocupado / (duración del lote × workers)).
+La etapa con utilización cercana a 1 es la que limita el lote.
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, Executor, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, NamedTuple
+
+from rl_replay_analyzer.batch import BatchItem, _analyze_one, _init_worker, default_jobs, retry_header
+
+DEFAULT_READ_THREADS = 4
+DEFAULT_MAX_BUFFERED_BYTES = 512 * 1024 * 1024
+DEFAULT_WRITE_QUEUE = 64
+
+
+class StageMeter:
+    """
+    Tiempo de una etapa con `workers` hilos o procesos (seguro entre hilos).
+
+    `busy_s` es el tiempo de trabajo sumado de todos los workers; `stall_s`,
+    el tiempo que el lote estuvo parado esperando a esta etapa (bytes que no
+    habían llegado, cola de escritura llena).
+    """
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_s = 0.0
+        self.stall_s = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy_s: float) -> None:
+        with self._lock:
+            self.items += 1
+            self.busy_s += busy_s
+
+    def add_stall(self, stall_s: float) -> None:
+        with self._lock:
+            self.stall_s += stall_s
+
+    def as_dict(self, wall_s: float) -> dict:
+        capacity = wall_s * self.workers
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_s": self.busy_s,
+            "stall_s": self.stall_s,
+            "utilisation": self.busy_s / capacity if capacity > 0 else 0.0,
+        }
+
+
+def _read(path: Path) -> tuple[bytes | None, float, str | None]:
+    """Lee un replay: (bytes, segundos, None) o (None, segundos, error) con los mensajes de `_analyze_one`."""
+    from rl_replay_analyzer.parser import _check_replay_path
+
+    start = time.perf_counter()
+    try:
+        with open(_check_replay_path(path), "rb") as f:
+            data = f.read()
+    except (FileNotFoundError, ValueError) as e:
+        return None, time.perf_counter() - start, str(e)
+    except OSError as e:
+        return None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    return data, time.perf_counter() - start, None
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+class ReadTask(NamedTuple):
+    """Un replay leído por `ReadAhead`: `data` o `error` (nunca ambos)."""
+
+    path: Path
+    data: bytes | None
+    error: str | None
+    read_s: float
+    size: int
+
+
+class ReadAhead:
+    """
+    Etapa de lectura: lee los replays de `paths`, en orden, con `threads`
+    hilos y por delante del consumidor.
+
+    Como mucho `depth` replays y `max_bytes` bytes están leídos (o
+    leyéndose) sin que `next()` los haya entregado; un replay mayor que el
+    límite se lee solo, cuando la ventana está vacía.
+    """
+
+    def __init__(
+        self,
+        paths: Iterable[Path],
+        threads: int = DEFAULT_READ_THREADS,
+        depth: int = 8,
+        max_bytes: int | None = None,
+    ):
+        self.meter = StageMeter("read", max(1, threads))
+        self.depth = max(1, depth)
+        self.max_bytes = max_bytes or DEFAULT_MAX_BUFFERED_BYTES
+        self.peak_bytes = 0
+        self._paths = deque(paths)
+        self._window: deque[tuple[Path, int, Future]] = deque()
+        self._window_bytes = 0
+        self._pool = ThreadPoolExecutor(max_workers=self.meter.workers, thread_name_prefix="rl-read")
+
+    def __len__(self) -> int:
+        """Replays que quedan por entregar."""
+        return len(self._paths) + len(self._window)
+
+    def _fill(self) -> None:
+        while self._paths and len(self._window) < self.depth:
+            path = self._paths[0]
+            size = _file_size(path)
+            if self._window and self._window_bytes + size > self.max_bytes:
+                return
+            self._paths.popleft()
+            self._window.append((path, size, self._pool.submit(_read, path)))
+            self._window_bytes += size
+            self.peak_bytes = max(self.peak_bytes, self._window_bytes)
+
+    def next(self) -> ReadTask | None:
+        """El siguiente replay leído (bloquea hasta tenerlo), o None al terminar."""
+        self._fill()
+        if not self._window:
+            return None
+        path, size, fut = self._window.popleft()
+        start = time.perf_counter()
+        data, read_s, error = fut.result()
+        self.meter.add_stall(time.perf_counter() - start)
+        self.meter.add(read_s)
+        self._window_bytes -= size
+        self._fill()
+        return ReadTask(path, data, error, read_s, size)
+
+    def close(self) -> None:
+        """Descarta lo pendiente y termina los hilos."""
+        self._paths.clear()
+        for _, _, fut in self._window:
+            fut.cancel()
+        self._window.clear()
+        self._pool.shutdown(wait=True)
+
+
+def _pipeline_task(
+    path: Path,
+    data: bytes | None,
+    mode: str,
+    backend: Callable[[bytes], Any] | None,
+    collect_stats: bool,
+    trace_memory: bool,
+    extractors: tuple[str, ...],
+) -> tuple[BatchItem, float]:
+    """Etapa de análisis (en el worker): el BatchItem y los segundos que ha ocupado al worker."""
+    start = time.perf_counter()
+    item = _analyze_one(path, mode, backend, collect_stats, trace_memory, extractors, data)
+    return item, time.perf_counter() - start
+
+
+def with_read_stats(item: BatchItem, task: ReadTask) -> BatchItem:
+    """Añade la etapa "read" (medida en la etapa de lectura) a las estadísticas del item."""
+    if item.stats is None:
+        return item
+    stats = item.stats
+    stats["stages"] = {"read": {"wall_s": task.read_s}, **stats["stages"]}
+    stats["counters"]["bytes_read"] = stats["counters"].get("bytes_read", 0) + task.size
+    return item
+
+
+def read_error_item(task: ReadTask) -> BatchItem:
+    """BatchItem de un replay que no se pudo leer (no llega a ningún worker)."""
+    return BatchItem(task.path, None, task.error, outcome="parse_error")
+
+
+def fill_pipeline_stats(
+    pipeline_stats: dict | None, wall_s: float, reader: ReadAhead, parse: StageMeter
+) -> None:
+    """Rellena `pipeline_stats` (si se pidió) con la duración y el `as_dict` de cada etapa."""
+    if pipeline_stats is None:
+        return
+    pipeline_stats.update(
+        {
+            "wall_s": wall_s,
+            "peak_buffered_bytes": reader.peak_bytes,
+            "stages": {"read": reader.meter.as_dict(wall_s), "parse": parse.as_dict(wall_s)},
+        }
+    )
+
+
+def run_pipeline(
+    paths: Iterable[Path],
+    jobs: int | None = None,
+    mode: str = "full",
+    cache_dir: Path | None = None,
+    cache_max_bytes: int | None = None,
+    backend: Callable[[bytes], Any] | None = None,
+    collect_stats: bool = False,
+    trace_memory: bool = False,
+    extractors: tuple[str, ...] = (),
+    header_fallback: bool = False,
+    read_threads: int = DEFAULT_READ_THREADS,
+    read_ahead: int | None = None,
+    max_buffered_bytes: int | None = None,
+    pipeline_stats: dict | None = None,
+    routes_path: Path | None = None,
+) -> Iterator[BatchItem]:
+    """
+    Como `run_batch`, con la lectura de los archivos solapada con el análisis.
+
+    Los resultados se entregan en orden de finalización. Los argumentos
+    comunes significan lo mismo que en `run_batch`.
+
+    Args:
+        read_threads: Hilos de la etapa de lectura.
+        read_ahead: Replays leídos a la espera de pasar a un worker (por
+            defecto: 2 por worker). Aparte quedan, como mucho, dos replays
+            por worker entregados al pool.
+        max_buffered_bytes: Bytes leídos a la espera de pasar a un worker
+            (por defecto: DEFAULT_MAX_BUFFERED_BYTES).
+        pipeline_stats: Si se da, al terminar el lote se rellena con la
+            duración, el pico de bytes leídos en espera y un
+            `StageMeter.as_dict` por etapa ("read", "parse").
+
+    Si un worker muere, los replays que el pool tenía en curso se reintentan
+    uno a uno en un worker propio; solo el que vuelve a matarlo sale como
+    "crash".
+
+    Yields:
+        BatchItem por cada replay.
+    """
+    paths = list(paths)
+    if not paths:
+        return
+    jobs = min(max(1, jobs or default_jobs()), len(paths))
+    retry = header_fallback and mode == "full"
+    reader = ReadAhead(paths, read_threads, read_ahead or jobs * 2, max_buffered_bytes)
+    parse_meter = StageMeter("parse", jobs)
+
+    def _new_executor() -> Executor:
+        if jobs == 1:
+            return ThreadPoolExecutor(max_workers=1, thread_name_prefix="rl-parse")
+        # Importación diferida: concurrent.futures.process arrastra multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        return ProcessPoolExecutor(
+            max_workers=jobs, initializer=_init_worker, initargs=(cache_dir, cache_max_bytes, routes_path)
+        )
+
+    if jobs == 1:
+        _init_worker(cache_dir, cache_max_bytes, routes_path)
+    cpu = _new_executor()
+
+    def _finish(item: BatchItem, task: ReadTask, busy_s: float) -> BatchItem:
+        parse_meter.add(busy_s)
+        item = with_read_stats(item, task)
+        return retry_header(item) if retry and item.outcome != "ok" else item
+
+    def _crash(task: ReadTask, error: BaseException) -> BatchItem:
+        return _finish(BatchItem(task.path, None, f"El worker murió durante el análisis: {error}", outcome="crash"), task, 0.0)
+
+    def _isolated(task: ReadTask) -> BatchItem:
+        """Reintenta un replay que estaba en curso al romperse el pool, solo en un worker propio."""
+        from concurrent.futures import ProcessPoolExecutor
+
+        pool = ProcessPoolExecutor(max_workers=1, initializer=_init_worker, initargs=(cache_dir, cache_max_bytes, routes_path))
+        try:
+            # Sin bytes: el worker vuelve a leer el archivo (los de la etapa de lectura ya se soltaron)
+            fut = pool.submit(_pipeline_task, task.path, None, mode, backend, collect_stats, trace_memory, extractors)
+            try:
+                item, busy_s = fut.result()
+            except BrokenExecutor as e:
+                return _crash(task, e)  # ha vuelto a matar a su worker: el culpable es este replay
+            except Exception as e:
+                item, busy_s = BatchItem(task.path, None, f"{type(e).__name__}: {e}", outcome="crash"), 0.0
+        finally:
+            pool.shutdown(wait=True)
+        return _finish(item, task, busy_s)
+
+    # Un replay en cola por worker además del que analiza, para que no se queden sin trabajo
+    in_flight: dict[Future, ReadTask] = {}
+    start = time.perf_counter()
+    try:
+        while True:
+            while len(in_flight) < jobs * 2:
+                task = reader.next()
+                if task is None:
+                    break
+                if task.error is not None:
+                    yield read_error_item(task)
+                    continue
+                args = (task.path, task.data, mode, backend, collect_stats, trace_memory, extractors)
+                try:
+                    fut = cpu.submit(_pipeline_task, *args)
+                except BrokenExecutor:
+                    cpu.shutdown(wait=False, cancel_futures=True)
+                    cpu = _new_executor()
+                    fut = cpu.submit(_pipeline_task, *args)
+                in_flight[fut] = task._replace(data=None)
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            suspects: list[ReadTask] = []
+            for fut in finished:
+                task = in_flight.pop(fut)
+                try:
+                    item, busy_s = fut.result()
+                except BrokenExecutor:
+                    suspects.append(task)
+                    continue
+                except Exception as e:  # p. ej. un resultado que no se puede devolver del worker
+                    item, busy_s = BatchItem(task.path, None, f"{type(e).__name__}: {e}", outcome="crash"), 0.0
+                yield _finish(item, task, busy_s)
+            if suspects:
+                # Un worker murió y el pool ya no sirve: no se sabe qué replay lo mató, así que
+                # todo lo que estaba en curso se reintenta de uno en uno, cada uno en su worker
+                suspects.extend(in_flight.values())
+                in_flight.clear()
+                cpu.shutdown(wait=False, cancel_futures=True)
+                for task in suspects:
+                    yield _isolated(task)
+                cpu = _new_executor()
+    finally:
+        reader.close()
+        cpu.shutdown(wait=True, cancel_futures=True)
+        fill_pipeline_stats(pipeline_stats, time.perf_counter() - start, reader, parse_meter)
+
+
+_STOP = object()
+
+
+class WriterStage:
+    """
+    Etapa de escritura: un hilo llama a `write(item)` para cada elemento
+    recibido con `put`, a través de una cola de `depth` elementos (`put`
+    bloquea con la cola llena). Una excepción de `write` detiene la etapa y
+    se relanza en el siguiente `put` o en `close`. Se usa como context manager.
+    """
+
+    def __init__(self, write: Callable[[Any], None], depth: int = DEFAULT_WRITE_QUEUE):
+        self.meter = StageMeter("write", 1)
+        self._write = write
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, depth))
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, name="rl-write", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            if self._error is not None:
+                continue  # vaciar la cola sin escribir
+            start = time.perf_counter()
+            try:
+                self._write(item)
+            except BaseException as e:
+                self._error = e
+            self.meter.add(time.perf_counter() - start)
+
+    def put(self, item: Any) -> None:
+        if self._error is not None:
+            raise self._error
+        start = time.perf_counter()
+        self._queue.put(item)
+        self.meter.add_stall(time.perf_counter() - start)
+
+    def close(self) -> None:
+        """Espera a que se escriba todo lo pendiente."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self) -> WriterStage:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,281 @@
+"""
+Enrutado de cada replay al backend más rápido que funciona para su versión.
+
+`load_backend` elige siempre el mismo backend (sprocket, luego boxcars, luego
+el decodificador en Python): si ese backend no entiende una versión nueva de
+replays, cada archivo de esa versión paga un análisis completo fallido antes
+de caer al header. `Router` lee la versión del header (major, minor,
+net_version; `header_fallback.parse_header` sin propiedades, unos pocos
+bytes) y consulta una tabla persistente, por versión y backend, de éxitos,
+fallos y segundos por MB:
+
+- primero los backends que ya han funcionado con esa versión, del más rápido
+  al más lento;
+- después los que no se han probado, en el orden de preferencia de siempre;
+- un backend que ha fallado con MIN_FAILURES archivos distintos sin
+  funcionar nunca con esa versión se salta (se vuelve a probar uno de cada
+  REPROBE_EVERY replays, por si una actualización lo arregló). Solo cuentan
+  los fallos del propio backend con archivos íntegros (`replay_intact`): un
+  replay truncado o corrupto, o un error de la extracción posterior, no
+  dice nada del backend;
+- si no queda ninguno, la ruta es "header": el análisis completo se da por
+  perdido sin intentarlo y el lote recurre al modo header.
+
+La tabla es una base SQLite (por defecto routes.sqlite en el directorio de
+caché, o $RL_REPLAY_ROUTES); cada resultado se suma con un UPSERT, así que
+varios procesos pueden compartirla. Las decisiones aparecen en los contadores
+de `StageStats` ("route_<backend>", "route_failed_<backend>", "route_header")
+y el subcomando `routes` muestra la tabla.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import importlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+from rl_replay_analyzer.cache import default_cache_dir
+from rl_replay_analyzer.header_fallback import _header_bounds, parse_header
+
+# Backends de análisis completo, en orden de preferencia → módulo con `parse_replay`
+BACKEND_MODULES = {
+    "sprocket": "sprocket_boxcars_py",
+    "boxcars": "boxcars_py",
+    "netstream": "rl_replay_analyzer.netstream",
+}
+HEADER_ROUTE = "header"
+
+# Archivos distintos con los que ha fallado, sin ningún éxito, para dar un backend por roto con una versión
+MIN_FAILURES = 3
+# Cada cuántos replays de una versión se vuelven a probar los backends rotos
+REPROBE_EVERY = 50
+# Cada cuántos replays de una versión se relee su fila de la tabla (lo aprendido por otros procesos)
+_REFRESH_EVERY = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS routes (
+    major INTEGER NOT NULL,
+    minor INTEGER NOT NULL,
+    net INTEGER NOT NULL,
+    backend TEXT NOT NULL,
+    ok INTEGER NOT NULL DEFAULT 0,
+    fail INTEGER NOT NULL DEFAULT 0,
+    seconds REAL NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (major, minor, net, backend)
+);
+CREATE TABLE IF NOT EXISTS failures (
+    major INTEGER NOT NULL,
+    minor INTEGER NOT NULL,
+    net INTEGER NOT NULL,
+    backend TEXT NOT NULL,
+    file TEXT NOT NULL,
+    PRIMARY KEY (major, minor, net, backend, file)
+);
+"""
+
+_UPSERT = """
+INSERT INTO routes (major, minor, net, backend, ok, fail, seconds, bytes, last_error, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (major, minor, net, backend) DO UPDATE SET
+    ok = ok + excluded.ok,
+    fail = fail + excluded.fail,
+    seconds = seconds + excluded.seconds,
+    bytes = bytes + excluded.bytes,
+    last_error = COALESCE(excluded.last_error, last_error),
+    updated_at = excluded.updated_at
+"""
+
+Version = tuple[int, int, int]
+
+# Backends instalados, resueltos una sola vez por proceso
+_available: dict[str, Callable[[bytes], Any]] | None = None
+
+
+def available_backends() -> dict[str, Callable[[bytes], Any]]:
+    """Nombre → `parse_replay` de cada backend instalado, en orden de preferencia."""
+    global _available
+    if _available is None:
+        found = {}
+        for name, module in BACKEND_MODULES.items():
+            try:
+                found[name] = importlib.import_module(module).parse_replay
+            except ImportError:
+                continue
+        _available = found
+    return _available
+
+
+def replay_version(data) -> Version:
+    """(major, minor, net_version) del header, sin decodificar ninguna propiedad."""
+    header = parse_header(data, keys=())
+    return header["major_version"], header["minor_version"], header["net_version"]
+
+
+def replay_intact(data) -> bool:
+    """
+    El archivo parece completo: el header entero se lee y el cuerpo tiene la
+    longitud que declara su prefijo (no está truncado).
+    """
+    try:
+        view, _, header_end = _header_bounds(data)
+        parse_header(view, stop_at_goals=False)
+    except ValueError:
+        return False
+    if len(view) < header_end + 8:
+        return False
+    body_size = int.from_bytes(view[header_end : header_end + 4], "little")
+    return header_end + 8 + body_size <= len(view)
+
+
+def file_key(data) -> str:
+    """Identificador del contenido de un replay, para contar los fallos por archivo distinto."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def format_version(version: Version) -> str:
+    return ".".join(str(v) for v in version)
+
+
+def default_routes_path() -> Path:
+    """Tabla por defecto: $RL_REPLAY_ROUTES, o routes.sqlite en el directorio de caché."""
+    env = os.environ.get("RL_REPLAY_ROUTES")
+    if env:
+        return Path(env)
+    return default_cache_dir() / "routes.sqlite"
+
+
+class Router:
+    """
+    Tabla de rutas por versión (ver el docstring del módulo).
+
+    Args:
+        db_path: Base SQLite de la tabla (se crea si no existe; None =
+            `default_routes_path()`).
+        backends: Nombre → `parse_replay` de los backends candidatos, en
+            orden de preferencia (por defecto: `available_backends()`).
+    """
+
+    def __init__(self, db_path: str | Path | None = None, backends: dict[str, Callable[[bytes], Any]] | None = None):
+        self.db_path = Path(db_path) if db_path is not None else default_routes_path()
+        self.backends = backends if backends is not None else available_backends()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Con jobs=1 el lote analiza en un hilo distinto del que abre la tabla
+        self.conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(_SCHEMA)
+        # versión → backend → [ok, fail, segundos, bytes]
+        self._table: dict[Version, dict[str, list]] = {}
+        self._seen: dict[Version, int] = {}
+
+    def __enter__(self) -> Router:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def _load(self, version: Version) -> dict[str, list]:
+        rows = self.conn.execute(
+            "SELECT backend, ok, fail, seconds, bytes FROM routes WHERE major = ? AND minor = ? AND net = ?", version
+        )
+        entries = {row[0]: list(row[1:]) for row in rows}
+        self._table[version] = entries
+        return entries
+
+    @staticmethod
+    def _cost(entry: list) -> float:
+        """Segundos por MB (o por replay si no hay bytes)."""
+        ok, _, seconds, size = entry
+        return seconds / (size / (1024 * 1024)) if size else seconds / max(1, ok)
+
+    def order(self, version: Version) -> list[str]:
+        """
+        Backends a probar para `version`, en orden. Lista vacía = ruta
+        "header" (ningún backend funciona con esta versión).
+        """
+        seen = self._seen[version] = self._seen.get(version, 0) + 1
+        entries = self._table.get(version)
+        if entries is None or seen % _REFRESH_EVERY == 0:
+            entries = self._load(version)
+        working, untested, broken = [], [], []
+        for name in self.backends:
+            entry = entries.get(name)
+            if entry is None or (not entry[0] and entry[1] < MIN_FAILURES):
+                untested.append(name)
+            elif entry[0]:
+                working.append(name)
+            else:
+                broken.append(name)
+        working.sort(key=lambda name: self._cost(entries[name]))
+        route = working + untested
+        if broken and seen % REPROBE_EVERY == 0:
+            route += broken
+        return route
+
+    def record(
+        self,
+        version: Version,
+        backend: str,
+        ok: bool,
+        seconds: float,
+        size: int,
+        error: str | None = None,
+        file: str | None = None,
+    ) -> None:
+        """
+        Suma un intento a la tabla (en memoria y en la base).
+
+        Un fallo con `file` (ver `file_key`) solo suma si ese archivo no había
+        fallado ya con este backend: el mismo replay reintentado no cuenta
+        como varios.
+        """
+        ok_n, fail_n = (1, 0) if ok else (0, 1)
+        # Los fallos no cuentan para la velocidad: solo los tiempos de éxito
+        seconds, size = (seconds, size) if ok else (0.0, 0)
+        with self.conn:
+            if not ok and file is not None:
+                cur = self.conn.execute(
+                    "INSERT OR IGNORE INTO failures (major, minor, net, backend, file) VALUES (?, ?, ?, ?, ?)",
+                    (*version, backend, file),
+                )
+                fail_n = cur.rowcount
+            self.conn.execute(
+                _UPSERT, (*version, backend, ok_n, fail_n, seconds, size, error and error[:500], time.time())
+            )
+        entry = self._table.setdefault(version, {}).setdefault(backend, [0, 0, 0.0, 0])
+        entry[0] += ok_n
+        entry[1] += fail_n
+        entry[2] += seconds
+        entry[3] += size
+
+    def rows(self) -> list[dict]:
+        """La tabla completa, para mostrarla (subcomando `routes`)."""
+        rows = self.conn.execute(
+            "SELECT major, minor, net, backend, ok, fail, seconds, bytes, last_error FROM routes "
+            "ORDER BY major DESC, minor DESC, net DESC, backend"
+        )
+        out = []
+        for major, minor, net, backend, ok, fail, seconds, size, last_error in rows:
+            entry = [ok, fail, seconds, size]
+            out.append(
+                {
+                    "version": format_version((major, minor, net)),
+                    "backend": backend,
+                    "ok": ok,
+                    "fail": fail,
+                    "s_per_mb": self._cost(entry) if ok else None,
+                    "status": "ok" if ok else ("roto" if fail >= MIN_FAILURES else "dudoso"),
+                    "last_error": last_error,
+                }
+            )
+        return out
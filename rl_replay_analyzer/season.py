@@ -0,0 +1,416 @@
+"""
+Estadísticas agregadas de muchos replays (series, temporadas), actualizables
+de forma incremental.
+
+`SeasonAggregate` se alimenta con los resultados por replay a medida que
+salen del lote (`add`), sin guardarlos: solo suma contadores e histogramas.
+Los histogramas van por segundo restante del reloj (0..MAX_SECONDS), así que
+el tamaño de los tramos ("goles por minuto") y el umbral de "gol tardío" se
+eligen al consultar (`summary`), no al agregar:
+
+- goles por segundo restante, en total y por equipo;
+- por replay, el gol más tardío (menor tiempo restante > 0): la frecuencia de
+  replays con gol tardío sale de su histograma acumulado;
+- goles con el reloj a 00:00 (prórroga o bocina), aparte;
+- replays, goles y distribución de goles por replay, en total y por equipo;
+- prórrogas, si el resultado trae el extractor overtime.
+
+Todo son sumas, así que dos agregados de replays distintos se combinan con
+`merge` (p. ej. los parciales de varias máquinas o de varios lotes). El
+estado se guarda como JSON (`save`, escritura atómica; por defecto en la
+carpeta de datos del usuario, ver `default_season_path`) junto con las claves
+de los replays ya contados (su ruta absoluta): al volver a lanzar el lote
+sobre la misma carpeta solo se analizan y suman los replays nuevos. Un
+replay modificado después de contarlo no se vuelve a contar.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Iterable
+
+# Tiempo restante máximo de los histogramas (partido estándar: 5 minutos); lo
+# que pase de aquí (partidos más largos) se cuenta en el último segundo
+MAX_SECONDS = 300
+# Valores por defecto de `summary`
+BUCKET_SECONDS = 60
+LATE_SECONDS = 30
+
+_FORMAT = 1
+
+
+def default_season_path() -> Path:
+    """
+    Estado por defecto: $RL_REPLAY_SEASON, o season.json en la carpeta de
+    datos del usuario. No va en el directorio de caché: la caché se vacía
+    (--clear-cache) y se poda, y el agregado no se puede reconstruir sin
+    volver a analizar todo el historial.
+    """
+    env = os.environ.get("RL_REPLAY_SEASON")
+    if env:
+        return Path(env)
+    if os.name == "nt":
+        base = os.environ.get("APPDATA") or Path.home() / "AppData" / "Roaming"
+        return Path(base) / "rl_replay_analyzer" / "season.json"
+    base = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / "rl_replay_analyzer" / "season.json"
+
+
+def replay_key(path: str | Path) -> str:
+    """Clave con la que se recuerda un replay ya contado (ruta absoluta)."""
+    return str(Path(path).resolve())
+
+
+def goal_seconds(time_str: str) -> int | None:
+    """"mm:ss" → segundos restantes (None si no tiene ese formato)."""
+    minutes, sep, seconds = str(time_str).partition(":")
+    if not sep or not minutes.isdigit() or not seconds.isdigit():
+        return None
+    return int(minutes) * 60 + int(seconds)
+
+
+def _empty_histogram() -> list[int]:
+    return [0] * (MAX_SECONDS + 1)
+
+
+def _add_histogram(into: list[int], other: list[int]) -> None:
+    for i, n in enumerate(other):
+        into[i] += n
+
+
+def _add_counts(into: dict[str, int], other: dict[str, int]) -> None:
+    for k, n in other.items():
+        into[k] = into.get(k, 0) + n
+
+
+class _TeamTotals:
+    """Totales de un equipo (por nombre, tal como aparece en "teams" del resultado)."""
+
+    __slots__ = ("replays", "goals", "goals_by_second")
+
+    def __init__(self):
+        self.replays = 0
+        self.goals = 0
+        self.goals_by_second = _empty_histogram()
+
+    def merge(self, other: _TeamTotals) -> None:
+        self.replays += other.replays
+        self.goals += other.goals
+        _add_histogram(self.goals_by_second, other.goals_by_second)
+
+    def as_dict(self) -> dict:
+        return {"replays": self.replays, "goals": self.goals, "goals_by_second": self.goals_by_second}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> _TeamTotals:
+        totals = cls()
+        totals.replays = int(data["replays"])
+        totals.goals = int(data["goals"])
+        _add_histogram(totals.goals_by_second, data["goals_by_second"][: MAX_SECONDS + 1])
+        return totals
+
+
+class SeasonAggregate:
+    """
+    Agregado combinable de resultados por replay (ver el docstring del módulo).
+
+    Atributos:
+        replays: Replays contados.
+        goals: Goles de esos replays (con tiempo legible).
+        keys: Claves (`replay_key`) de los replays ya contados o marcados.
+    """
+
+    def __init__(self):
+        self.replays = 0
+        self.goals = 0
+        self.goals_by_second = _empty_histogram()
+        # Por replay: segundo restante del gol más tardío antes de 00:00
+        self.last_goal_by_second = _empty_histogram()
+        self.goals_at_zero = 0
+        # Número de goles → replays con ese número (claves de texto, por el JSON)
+        self.goals_per_replay: dict[str, int] = {}
+        self.overtime_known = 0
+        self.overtime = 0
+        self.teams: dict[str, _TeamTotals] = {}
+        self.keys: set[str] = set()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys
+
+    def __len__(self) -> int:
+        return self.replays
+
+    def mark(self, key: str) -> None:
+        """Recuerda un replay sin sumarlo (p. ej. un duplicado de otro ya contado)."""
+        self.keys.add(key)
+
+    def add(self, result: dict, key: str | None = None) -> bool:
+        """
+        Suma el resultado de un replay (salida de `extract_match_data`).
+
+        Args:
+            result: {"teams": {...}, "goals": [{"time": "mm:ss", "team": ...}], "extractors": {...}}.
+            key: Clave del replay; si ya está contado no se suma otra vez.
+
+        Returns:
+            True si se sumó, False si la clave ya estaba.
+        """
+        if key is not None:
+            if key in self.keys:
+                return False
+            self.keys.add(key)
+        self.replays += 1
+        for name in set((result.get("teams") or {}).values()):
+            self.teams.setdefault(name, _TeamTotals()).replays += 1
+
+        counted = 0
+        last = None
+        for goal in result.get("goals") or ():
+            seconds = goal_seconds(goal.get("time", ""))
+            if seconds is None:
+                continue
+            seconds = min(seconds, MAX_SECONDS)
+            counted += 1
+            self.goals_by_second[seconds] += 1
+            team = self.teams.setdefault(goal.get("team") or "?", _TeamTotals())
+            team.goals += 1
+            team.goals_by_second[seconds] += 1
+            if seconds == 0:
+                self.goals_at_zero += 1
+            elif last is None or seconds < last:
+                last = seconds
+        self.goals += counted
+        self.goals_per_replay[str(counted)] = self.goals_per_replay.get(str(counted), 0) + 1
+        if last is not None:
+            self.last_goal_by_second[last] += 1
+
+        overtime = (result.get("extractors") or {}).get("overtime")
+        if isinstance(overtime, dict) and "overtime" in overtime:
+            self.overtime_known += 1
+            self.overtime += bool(overtime["overtime"])
+        return True
+
+    def merge(self, other: SeasonAggregate) -> SeasonAggregate:
+        """
+        Suma otro agregado a este (y lo devuelve).
+
+        Raises:
+            ValueError: Los dos agregados tienen replays en común (se contarían dos veces).
+        """
+        shared = self.keys & other.keys
+        if shared:
+            raise ValueError(f"{len(shared)} replays están en los dos agregados (p. ej. {min(shared)})")
+        self.replays += other.replays
+        self.goals += other.goals
+        _add_histogram(self.goals_by_second, other.goals_by_second)
+        _add_histogram(self.last_goal_by_second, other.last_goal_by_second)
+        self.goals_at_zero += other.goals_at_zero
+        _add_counts(self.goals_per_replay, other.goals_per_replay)
+        self.overtime_known += other.overtime_known
+        self.overtime += other.overtime
+        for name, totals in other.teams.items():
+            self.teams.setdefault(name, _TeamTotals()).merge(totals)
+        self.keys |= other.keys
+        return self
+
+    def as_dict(self) -> dict:
+        return {
+            "format": _FORMAT,
+            "max_seconds": MAX_SECONDS,
+            "replays": self.replays,
+            "goals": self.goals,
+            "goals_by_second": self.goals_by_second,
+            "last_goal_by_second": self.last_goal_by_second,
+            "goals_at_zero": self.goals_at_zero,
+            "goals_per_replay": self.goals_per_replay,
+            "overtime": {"known": self.overtime_known, "yes": self.overtime},
+            "teams": {name: totals.as_dict() for name, totals in sorted(self.teams.items())},
+            "keys": sorted(self.keys),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> SeasonAggregate:
+        """
+        Raises:
+            ValueError: No es un estado de agregado, o es de otro formato.
+        """
+        if not isinstance(data, dict) or data.get("format") != _FORMAT or data.get("max_seconds") != MAX_SECONDS:
+            raise ValueError("No es un estado de agregado de temporada compatible")
+        agg = cls()
+        try:
+            agg.replays = int(data["replays"])
+            agg.goals = int(data["goals"])
+            _add_histogram(agg.goals_by_second, data["goals_by_second"])
+            _add_histogram(agg.last_goal_by_second, data["last_goal_by_second"])
+            agg.goals_at_zero = int(data["goals_at_zero"])
+            agg.goals_per_replay = {str(k): int(n) for k, n in data["goals_per_replay"].items()}
+            agg.overtime_known = int(data["overtime"]["known"])
+            agg.overtime = int(data["overtime"]["yes"])
+            agg.teams = {name: _TeamTotals.from_dict(t) for name, t in data["teams"].items()}
+            agg.keys = set(data["keys"])
+        except (KeyError, TypeError, AttributeError, IndexError) as e:
+            raise ValueError(f"Estado de agregado incompleto: {e}") from e
+        return agg
+
+    @classmethod
+    def load(cls, path: str | Path, missing_ok: bool = True) -> SeasonAggregate:
+        """
+        Lee un estado guardado con `save` (uno vacío si no existe y `missing_ok`).
+
+        Raises:
+            ValueError: El archivo no es un estado válido.
+            OSError: No se pudo leer.
+        """
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            if missing_ok:
+                return cls()
+            raise
+        except ValueError as e:
+            raise ValueError(f"{path} no es JSON: {e}") from e
+        return cls.from_dict(data)
+
+    def save(self, path: str | Path) -> None:
+        """
+        Escritura atómica (temporal + os.replace): un corte a mitad no deja el estado a medias.
+
+        Raises:
+            OSError: No se pudo escribir.
+        """
+        import tempfile
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.as_dict(), f, ensure_ascii=False, separators=(",", ":"))
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+    def summary(self, bucket_seconds: int = BUCKET_SECONDS, late_seconds: int = LATE_SECONDS) -> dict:
+        """
+        Cifras derivadas, con tramos de `bucket_seconds` de tiempo restante y
+        "gol tardío" = en los últimos `late_seconds` (sin contar 00:00).
+
+        Returns:
+            {"replays", "goals", "goals_per_replay", "buckets": [{"from", "to",
+            "goals", "per_replay"}], "late_goals", "late_goal_replays",
+            "late_goal_rate", "goals_at_zero", "overtime", "teams": {nombre:
+            {"replays", "goals", "goals_per_replay", "late_goals"}}}. Los
+            tramos van del principio del partido (más tiempo restante) al final.
+
+        Raises:
+            ValueError: `bucket_seconds` o `late_seconds` fuera de rango.
+        """
+        if not 0 < bucket_seconds <= MAX_SECONDS or not 0 < late_seconds <= MAX_SECONDS:
+            raise ValueError(f"Tramos y umbral tardío deben estar entre 1 y {MAX_SECONDS} s")
+
+        def _rate(n: int, d: int) -> float | None:
+            return n / d if d else None
+
+        def _late(histogram: list[int]) -> int:
+            return sum(histogram[1 : late_seconds + 1])
+
+        buckets = []
+        for start in range(0, MAX_SECONDS, bucket_seconds):
+            # El último tramo se queda con MAX_SECONDS (el saque inicial)
+            end = MAX_SECONDS if start + bucket_seconds >= MAX_SECONDS else start + bucket_seconds - 1
+            goals = sum(self.goals_by_second[start : end + 1])
+            buckets.append({"from": start, "to": end, "goals": goals, "per_replay": _rate(goals, self.replays)})
+        buckets.reverse()
+        late_goal_replays = _late(self.last_goal_by_second)
+        return {
+            "replays": self.replays,
+            "goals": self.goals,
+            "goals_per_replay": _rate(self.goals, self.replays),
+            "goal_count_distribution": {k: self.goals_per_replay[k] for k in sorted(self.goals_per_replay, key=int)},
+            "bucket_seconds": bucket_seconds,
+            "buckets": buckets,
+            "late_seconds": late_seconds,
+            "late_goals": _late(self.goals_by_second),
+            "late_goal_replays": late_goal_replays,
+            "late_goal_rate": _rate(late_goal_replays, self.replays),
+            "goals_at_zero": self.goals_at_zero,
+            "overtime": {"known": self.overtime_known, "yes": self.overtime, "rate": _rate(self.overtime, self.overtime_known)},
+            "teams": {
+                name: {
+                    "replays": t.replays,
+                    "goals": t.goals,
+                    "goals_per_replay": _rate(t.goals, t.replays),
+                    "late_goals": _late(t.goals_by_second),
+                }
+                for name, t in sorted(self.teams.items())
+            },
+        }
+
+
+def format_season(summary: dict) -> str:
+    """Resumen legible de `SeasonAggregate.summary`."""
+
+    def _fmt(value: float | None, spec: str = ".2f") -> str:
+        return "-" if value is None else format(value, spec)
+
+    def _clock(seconds: int) -> str:
+        return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+    lines = [
+        f"Replays: {summary['replays']}, goles: {summary['goals']} ({_fmt(summary['goals_per_replay'])} por replay)",
+        f"Goles por tramo de {summary['bucket_seconds']} s (tiempo restante):",
+    ]
+    for b in summary["buckets"]:
+        lines.append(f"  {_clock(b['to'])}-{_clock(b['from'])}  {b['goals']:>8}  {_fmt(b['per_replay'], '.3f')} por replay")
+    lines.append(
+        f"Goles tardíos (últimos {summary['late_seconds']} s): {summary['late_goals']}; "
+        f"replays con gol tardío: {summary['late_goal_replays']} ({_fmt(summary['late_goal_rate'], '.1%')})"
+    )
+    lines.append(f"Goles con el reloj a 00:00 (prórroga o bocina): {summary['goals_at_zero']}")
+    overtime = summary["overtime"]
+    if overtime["known"]:
+        lines.append(f"Prórrogas: {overtime['yes']} de {overtime['known']} ({_fmt(overtime['rate'], '.1%')})")
+    if summary["teams"]:
+        lines.append("Equipos:")
+        for name, t in summary["teams"].items():
+            lines.append(
+                f"  {name:<20} replays {t['replays']:<7} goles {t['goals']:<7} "
+                f"{_fmt(t['goals_per_replay'])} por replay, {t['late_goals']} tardíos"
+            )
+    return "\n".join(lines)
+
+
+def _record_key(path: str) -> str:
+    return path if Path(path).is_absolute() else replay_key(path)
+
+
+def aggregate_records(records: Iterable[dict], into: SeasonAggregate | None = None) -> tuple[SeasonAggregate, dict[str, int]]:
+    """
+    Suma los registros de un archivo ndjson/bin del lote (`sinks.read_records`).
+
+    Se ignoran los registros con error, incluidos los resultados aproximados
+    de un reintento en modo header (traen "result" y "error"). La ruta del
+    registro ya es la clave (los destinos la escriben absoluta); solo las
+    relativas de archivos anteriores se resuelven, contra el cwd actual.
+
+    Returns:
+        (agregado, contadores {"added", "known", "skipped"}).
+    """
+    agg = into if into is not None else SeasonAggregate()
+    counts = {"added": 0, "known": 0, "skipped": 0}
+    for record in records:
+        result = record.get("result")
+        if result is None or record.get("error") is not None or "path" not in record:
+            counts["skipped"] += 1
+        elif agg.add(result, _record_key(record["path"])):
+            counts["added"] += 1
+        else:
+            counts["known"] += 1
+    return agg, counts
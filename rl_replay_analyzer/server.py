@@ -0,0 +1,374 @@
+"""
+Servidor local de análisis (subcomando `serve`) y su cliente.
+
+Un proceso de larga duración mantiene el parser y el backend nativo cargados
+en un pool de procesos, así los lanzadores (.bat, scripts) no pagan el
+arranque del intérprete ni la importación de sprocket_boxcars_py por replay.
+HTTP/1.1 mínimo sobre asyncio (solo biblioteca estándar), en localhost o en
+un socket Unix:
+
+    GET  /health                       → {"status": "ok", "version": ...} (503
+                                         con "status": "broken" si el pool no
+                                         sirve)
+    GET  /stats                        → contadores y latencias
+    POST /analyze?mode=full|header     → cuerpo JSON {"path": "..."} o bytes
+                                         del replay (application/octet-stream)
+
+Hay contrapresión: con `max_pending` peticiones en curso, las nuevas reciben
+503 y el cliente analiza en local. Si un worker muere, el pool de procesos
+queda roto: las peticiones en curso reciben 500 (el cliente lo cuenta como
+"crash") y el servidor crea un pool nuevo.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import os
+import socket
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterable, Iterator
+from urllib.parse import parse_qs, urlsplit
+
+from rl_replay_analyzer import __version__
+from rl_replay_analyzer.batch import BatchItem, default_jobs
+from rl_replay_analyzer.stats import percentile
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_URL = f"http://{DEFAULT_HOST}:{DEFAULT_PORT}"
+DEFAULT_MAX_BODY = 64 * 1024 * 1024
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    413: "Payload Too Large",
+    422: "Unprocessable Entity",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class ServerUnavailable(ConnectionError):
+    """No hay servidor escuchando (o está saturado): hay que analizar en local."""
+
+
+# --- Lado worker --------------------------------------------------------------
+
+_worker_cache = None
+
+
+def _init_server_worker(cache_dir: Path | None, cache_max_bytes: int | None) -> None:
+    """Carga parser, backend y caché una vez por proceso del pool."""
+    global _worker_cache
+    from rl_replay_analyzer.cache import DEFAULT_MAX_BYTES, ResultCache
+    from rl_replay_analyzer.parser import load_backend
+
+    load_backend()
+    _worker_cache = ResultCache(cache_dir, cache_max_bytes or DEFAULT_MAX_BYTES) if cache_dir else None
+
+
+def _analyze_request(path: str | None, data: bytes | None, mode: str) -> tuple[int, dict]:
+    """Analiza una petición en el worker. Retorna (código HTTP, cuerpo JSON)."""
+    from rl_replay_analyzer.parser import parse_replay_bytes, parse_replay_file
+
+    try:
+        if path is not None:
+            return 200, parse_replay_file(path, mode=mode, cache=_worker_cache)
+        return 200, parse_replay_bytes(data, mode=mode, cache=_worker_cache)
+    except FileNotFoundError as e:
+        return 404, {"error": str(e)}
+    except (ValueError, ImportError) as e:
+        return 422, {"error": str(e)}
+    except Exception as e:  # fallo inesperado del backend
+        return 422, {"error": f"{type(e).__name__}: {e}"}
+
+
+# --- Servidor -----------------------------------------------------------------
+
+
+class AnalysisServer:
+    """
+    Servidor asyncio que reparte las peticiones en un pool de procesos.
+
+    Args:
+        jobs: Procesos del pool.
+        max_pending: Peticiones de análisis en curso antes de responder 503.
+        cache_dir: Directorio de la caché de resultados (None = sin caché).
+        cache_max_bytes: Tamaño máximo de la caché.
+        max_body: Tamaño máximo del cuerpo (bytes de replay) aceptado.
+    """
+
+    def __init__(
+        self,
+        jobs: int | None = None,
+        max_pending: int | None = None,
+        cache_dir: Path | None = None,
+        cache_max_bytes: int | None = None,
+        max_body: int = DEFAULT_MAX_BODY,
+    ):
+        self.jobs = max(1, jobs or default_jobs())
+        self.max_pending = max_pending or self.jobs * 4
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        self.max_body = max_body
+        self.started = time.time()
+        self.in_flight = 0
+        self.counters = {"requests": 0, "completed": 0, "errors": 0, "rejected": 0, "pool_restarts": 0}
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.jobs,
+            initializer=_init_server_worker,
+            initargs=(self.cache_dir, self.cache_max_bytes),
+        )
+
+    def pool_usable(self) -> bool:
+        """El pool existe y ningún worker ha muerto dejándolo roto."""
+        return self._pool is not None and not getattr(self._pool, "_broken", False)
+
+    def _restart_pool(self, broken: ProcessPoolExecutor) -> None:
+        """Sustituye el pool roto (una sola vez aunque fallen varias peticiones a la vez)."""
+        if self._pool is not broken:
+            return
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._pool = self._new_pool()
+        self.counters["pool_restarts"] += 1
+
+    def stats(self) -> dict:
+        lat = list(self._latencies)
+        return {
+            "version": __version__,
+            "uptime_s": time.time() - self.started,
+            "workers": self.jobs,
+            "pool_usable": self.pool_usable(),
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            **self.counters,
+            "latency_s": {"p50": percentile(lat, 50), "p90": percentile(lat, 90), "p99": percentile(lat, 99)},
+        }
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, body: dict, extra: str = "") -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"{extra}Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + payload)
+        await writer.drain()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode("latin-1").split()
+            if len(parts) < 2:
+                return
+            method, target = parts[0].upper(), parts[1]
+            headers: dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            await self._dispatch(method, target, headers, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, headers, reader, writer) -> None:
+        url = urlsplit(target)
+        if method == "GET" and url.path == "/health":
+            if self.pool_usable():
+                await self._respond(writer, 200, {"status": "ok", "version": __version__})
+            else:
+                await self._respond(writer, 503, {"status": "broken", "version": __version__})
+            return
+        if method == "GET" and url.path == "/stats":
+            await self._respond(writer, 200, self.stats())
+            return
+        if method != "POST" or url.path != "/analyze":
+            await self._respond(writer, 404, {"error": f"Ruta desconocida: {method} {url.path}"})
+            return
+
+        self.counters["requests"] += 1
+        length_header = headers.get("content-length") or "0"
+        if not length_header.isdigit():
+            self.counters["errors"] += 1
+            await self._respond(writer, 400, {"error": f"Content-Length no válido: {length_header!r}"})
+            return
+        length = int(length_header)
+        # El límite se comprueba antes de leer: no se guarda en memoria lo que el cliente anuncie
+        if length > self.max_body:
+            self.counters["errors"] += 1
+            await self._respond(writer, 413, {"error": "Cuerpo demasiado grande"})
+            return
+        if self.in_flight >= self.max_pending:
+            self.counters["rejected"] += 1
+            await self._respond(writer, 503, {"error": "Servidor saturado"}, "Retry-After: 1\r\n")
+            return
+        body = await reader.readexactly(length) if length else b""
+        mode = parse_qs(url.query).get("mode", ["full"])[0]
+
+        path = data = None
+        if headers.get("content-type", "").startswith("application/json"):
+            try:
+                path = json.loads(body)["path"]
+            except (ValueError, KeyError, TypeError):
+                self.counters["errors"] += 1
+                await self._respond(writer, 400, {"error": 'Se esperaba {"path": "..."}'})
+                return
+        else:
+            data = body
+
+        if not self.pool_usable():
+            self._restart_pool(self._pool)  # un worker murió entre peticiones
+        self.in_flight += 1
+        start = time.perf_counter()
+        pool = self._pool
+        try:
+            loop = asyncio.get_running_loop()
+            status, result = await loop.run_in_executor(pool, _analyze_request, path, data, mode)
+        except BrokenProcessPool:
+            self._restart_pool(pool)
+            status, result = 500, {"error": "El worker murió durante el análisis"}
+        finally:
+            self.in_flight -= 1
+        self._latencies.append(time.perf_counter() - start)
+        self.counters["completed" if status == 200 else "errors"] += 1
+        await self._respond(writer, status, result)
+
+    async def serve(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, unix_path: str | None = None) -> None:
+        """Arranca el pool y atiende peticiones hasta que se cancele la tarea."""
+        self._pool = self._new_pool()
+        try:
+            if unix_path:
+                server = await asyncio.start_unix_server(self._handle, path=unix_path)
+            else:
+                server = await asyncio.start_server(self._handle, host, port)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._pool.shutdown(cancel_futures=True)
+            if unix_path:
+                try:
+                    os.unlink(unix_path)
+                except OSError:
+                    pass
+
+
+# --- Cliente ------------------------------------------------------------------
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self._unix_path = path
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._unix_path)
+
+
+def _connection(url: str, timeout: float) -> http.client.HTTPConnection:
+    """Conexión para "http://host:puerto" o "unix:/ruta/al/socket"."""
+    if url.startswith("unix:"):
+        return _UnixHTTPConnection(url[len("unix:") :], timeout)
+    parts = urlsplit(url)
+    return http.client.HTTPConnection(parts.hostname or DEFAULT_HOST, parts.port or DEFAULT_PORT, timeout=timeout)
+
+
+def _request(url: str, method: str, target: str, body: bytes | None = None, headers: dict | None = None, timeout: float = 300.0) -> tuple[int, dict]:
+    conn = _connection(url, timeout)
+    try:
+        conn.request(method, target, body=body, headers=headers or {})
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read() or b"{}")
+    except (OSError, http.client.HTTPException) as e:
+        raise ServerUnavailable(f"Servidor no disponible en {url}: {e}") from e
+    finally:
+        conn.close()
+
+
+def server_available(url: str = DEFAULT_URL, timeout: float = 0.5) -> bool:
+    """True si hay un servidor respondiendo a /health."""
+    try:
+        status, _ = _request(url, "GET", "/health", timeout=timeout)
+    except ServerUnavailable:
+        return False
+    return status == 200
+
+
+def _post_path(url: str, path: str | Path, mode: str, timeout: float) -> tuple[int, dict]:
+    """Pide al servidor que analice un replay (lo lee de disco por su ruta absoluta)."""
+    body = json.dumps({"path": str(Path(path).resolve())}).encode("utf-8")
+    return _request(url, "POST", f"/analyze?mode={mode}", body, {"Content-Type": "application/json"}, timeout)
+
+
+def analyze_via_server(url: str, path: str | Path, mode: str = "full", timeout: float = 300.0) -> dict:
+    """
+    Analiza un replay en el servidor (que lo lee de disco por su ruta absoluta).
+
+    Raises:
+        ServerUnavailable: No hay servidor o está saturado.
+        FileNotFoundError: El servidor no encuentra el archivo.
+        ValueError: El análisis falló.
+    """
+    status, result = _post_path(url, path, mode, timeout)
+    if status == 200:
+        return result
+    message = result.get("error", f"HTTP {status}")
+    if status == 503:
+        raise ServerUnavailable(message)
+    if status == 404:
+        raise FileNotFoundError(message)
+    raise ValueError(message)
+
+
+def run_batch_via_server(
+    url: str,
+    paths: Iterable[Path],
+    jobs: int | None = None,
+    mode: str = "full",
+    header_fallback: bool = False,
+) -> Iterator[BatchItem]:
+    """
+    Equivalente de `run_batch` que delega en el servidor con `jobs` peticiones simultáneas.
+
+    Si el servidor rechaza o deja de responder a una petición, ese replay se
+    analiza en local para no perderlo. Las respuestas de error se convierten
+    en el `outcome` del lote local: 500 (murió el worker) → "crash", el resto
+    → "parse_error"; con `header_fallback` se reintentan en modo header.
+    """
+    from rl_replay_analyzer.batch import _analyze_one, retry_header
+
+    retry = header_fallback and mode == "full"
+
+    def _one(p: Path) -> BatchItem:
+        try:
+            status, body = _post_path(url, p, mode, 300.0)
+        except ServerUnavailable:
+            status, body = 503, {}
+        if status == 503:
+            item = _analyze_one(p, mode)
+        elif status == 200:
+            item = BatchItem(p, body, None)
+        else:
+            error = body.get("error", f"HTTP {status}") if isinstance(body, dict) else f"HTTP {status}"
+            item = BatchItem(p, None, error, outcome="crash" if status == 500 else "parse_error")
+        return retry_header(item) if retry and item.outcome != "ok" else item
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs or default_jobs())) as pool:
+        yield from pool.map(_one, paths)
@@ -0,0 +1,248 @@
+"""
+Destinos de salida de los resultados de un lote.
+
+Cada resultado se entrega al destino en cuanto termina su replay
+(`Sink.write`), así que los formatos de flujo no guardan nada en memoria:
+
+- "json": un JSON por replay (`JsonFileSink`) o, con `-o`, un único JSON
+  combinado (`CombinedJsonSink`, que sí acumula; es el formato clásico).
+- "ndjson": una línea JSON compacta por replay, en un archivo o en stdout.
+- "bin": registros con prefijo de longitud, legibles con `read_records`.
+
+Los dos formatos de flujo comparten el registro: {"path": ..., "result": ...},
+con "error" en lugar de "result" si el replay falló (o además de "result" si
+el resultado viene de un reintento en modo header). La ruta se escribe
+absoluta, para que quien lea el archivo desde otro directorio (p. ej.
+`season --from`) identifique el mismo replay.
+
+Formato binario:
+
+    b"RLRB"  u16 versión
+    por registro: u32 longitud (little-endian), registro como JSON compacto UTF-8
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+import sys
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+FORMATS = ("json", "ndjson", "bin")
+
+_MAGIC = b"RLRB"
+_VERSION = 1
+_FILE_HEADER = struct.Struct("<4sH")
+_LENGTH = struct.Struct("<I")
+
+# Tamaño del buffer de escritura de los formatos de flujo
+_BUFFER_SIZE = 1 << 20
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def _record(path: Path, result: dict | None, error: str | None) -> dict:
+    # Misma forma que `season.replay_key`: la ruta no depende del cwd del lote
+    record: dict = {"path": str(Path(path).resolve())}
+    if result is not None:
+        record["result"] = result
+    if error is not None:
+        record["error"] = error
+    return record
+
+
+class Sink:
+    """
+    Base de los destinos. Se usa como context manager (`close` al salir).
+
+    Atributos:
+        uses_stdout: El destino escribe en stdout (los mensajes de progreso
+            deben ir entonces a stderr).
+    """
+
+    uses_stdout = False
+
+    def write(self, path: Path, result: dict | None, error: str | None = None) -> str | None:
+        """
+        Escribe el resultado (o el error) de un replay.
+
+        Returns:
+            Descripción del destino para el mensaje de progreso, o None.
+
+        Raises:
+            OSError: No se pudo escribir.
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Vuelca lo pendiente y libera el destino."""
+
+    def __enter__(self) -> Sink:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class JsonFileSink(Sink):
+    """
+    Un JSON por replay, en `output_dir` o junto a cada replay. Los errores no
+    se escriben (solo los informa la CLI).
+    """
+
+    def __init__(self, output_dir: Path | None = None, indent: int = 0):
+        self.output_dir = output_dir
+        self.indent = indent or None
+
+    def write(self, path: Path, result: dict | None, error: str | None = None) -> str | None:
+        if result is None:
+            return None
+        out_path = (self.output_dir or path.parent) / f"{path.stem}.json"
+        try:
+            with open(out_path, "w", encoding="utf-8") as f:
+                json.dump(result, f, ensure_ascii=False, indent=self.indent)
+        except OSError as e:
+            raise OSError(f"No se pudo escribir {out_path} - {e}") from e
+        return str(out_path)
+
+
+class CombinedJsonSink(Sink):
+    """Un único JSON {"results": {...}, "errors": {...}} escrito al cerrar (acumula en memoria)."""
+
+    def __init__(self, out_path: Path, indent: int = 0):
+        self.out_path = out_path
+        self.indent = indent or None
+        self.results: dict[str, dict] = {}
+        self.errors: dict[str, str] = {}
+
+    def write(self, path: Path, result: dict | None, error: str | None = None) -> str | None:
+        if result is not None:
+            self.results[str(path)] = result
+        elif error is not None:
+            self.errors[str(path)] = error
+        return None
+
+    def close(self) -> None:
+        try:
+            with open(self.out_path, "w", encoding="utf-8") as f:
+                json.dump({"results": self.results, "errors": self.errors}, f, ensure_ascii=False, indent=self.indent)
+        except OSError as e:
+            raise OSError(f"No se pudo escribir {self.out_path} - {e}") from e
+
+
+class _StreamSink(Sink):
+    """Base de los formatos de flujo: archivo propio con buffer, o stdout si `target` es None o "-"."""
+
+    def __init__(self, target: Path | None = None):
+        self.target = target
+        if target is None or str(target) == "-":
+            self.uses_stdout = True
+            self._f: BinaryIO = sys.stdout.buffer
+        else:
+            try:
+                self._f = open(target, "wb", buffering=_BUFFER_SIZE)
+            except OSError as e:
+                raise OSError(f"No se pudo abrir {target} - {e}") from e
+        self.records = 0
+
+    def _emit(self, payload: bytes) -> None:
+        raise NotImplementedError
+
+    def write(self, path: Path, result: dict | None, error: str | None = None) -> str | None:
+        payload = _encoder.encode(_record(path, result, error)).encode("utf-8")
+        try:
+            self._emit(payload)
+        except OSError as e:
+            raise OSError(f"No se pudo escribir en {self.target or 'stdout'} - {e}") from e
+        self.records += 1
+        return None
+
+    def close(self) -> None:
+        if self.uses_stdout:
+            self._f.flush()
+        else:
+            self._f.close()
+
+
+class NdjsonSink(_StreamSink):
+    """Una línea JSON por replay."""
+
+    def _emit(self, payload: bytes) -> None:
+        self._f.write(payload + b"\n")
+
+
+class BinarySink(_StreamSink):
+    """Registros con prefijo de longitud (ver el docstring del módulo)."""
+
+    def __init__(self, target: Path | None = None):
+        super().__init__(target)
+        self._f.write(_FILE_HEADER.pack(_MAGIC, _VERSION))
+
+    def _emit(self, payload: bytes) -> None:
+        self._f.write(_LENGTH.pack(len(payload)) + payload)
+
+
+def open_sink(fmt: str, output: Path | None = None, output_dir: Path | None = None, indent: int = 0) -> Sink:
+    """
+    Crea el destino del formato `fmt`.
+
+    Args:
+        fmt: Uno de FORMATS.
+        output: "json": archivo combinado (None = un JSON por replay);
+            "ndjson"/"bin": archivo de salida (None o "-" = stdout).
+        output_dir: "json" sin `output`: carpeta de los JSON por replay.
+        indent: Sangría de los JSON por replay o combinado (0 = compacto).
+
+    Raises:
+        ValueError: Formato desconocido.
+        OSError: No se pudo abrir el archivo de salida.
+    """
+    if fmt == "json":
+        return CombinedJsonSink(output, indent) if output is not None else JsonFileSink(output_dir, indent)
+    if fmt == "ndjson":
+        return NdjsonSink(output)
+    if fmt == "bin":
+        return BinarySink(output)
+    raise ValueError(f"Formato de salida desconocido: {fmt!r} (esperado: {', '.join(FORMATS)})")
+
+
+def _read_binary(f: BinaryIO, path: Path) -> Iterator[dict]:
+    magic, version = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+    if version != _VERSION:
+        raise ValueError(f"Versión de registros no soportada ({version}): {path}")
+    while True:
+        prefix = f.read(_LENGTH.size)
+        if not prefix:
+            return
+        if len(prefix) < _LENGTH.size:
+            raise ValueError(f"Registro truncado en {path}")
+        (size,) = _LENGTH.unpack(prefix)
+        payload = f.read(size)
+        if len(payload) < size:
+            raise ValueError(f"Registro truncado en {path}")
+        yield json.loads(payload)
+
+
+def read_records(path: str | Path) -> Iterator[dict]:
+    """
+    Lee, uno a uno, los registros de un archivo "bin" o "ndjson" (se detecta
+    por la cabecera).
+
+    Raises:
+        ValueError: Archivo truncado o con registros que no son JSON.
+        OSError: No se pudo abrir el archivo.
+    """
+    path = Path(path)
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) == _MAGIC:
+            f.seek(0)
+            yield from _read_binary(f, path)
+            return
+        f.seek(0)
+        for n, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"Línea {n} de {path} no es JSON: {e}") from e
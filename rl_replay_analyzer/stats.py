@@ -0,0 +1,149 @@
+"""
+Instrumentación por etapas del análisis de un replay.
+
+`StageStats` registra, para cada etapa (lectura del archivo, `parse_replay`
+del backend, `_replay_to_dict`, extracción de goles, escritura del JSON), el
+tiempo de reloj y opcionalmente el pico de memoria, además de contadores
+(frames recorridos, updated_actors visitados, goles, bytes leídos).
+`aggregate` combina los de un lote en percentiles.
+
+La memoria se mide con tracemalloc, que solo ve asignaciones hechas por
+Python: la memoria interna del backend nativo no aparece, pero sí los objetos
+Python que construye. tracemalloc ralentiza bastante, por eso es opcional.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Iterable, Iterator
+
+
+class StageStats:
+    """
+    Tiempos, pico de memoria y contadores de un replay.
+
+    Args:
+        trace_memory: Medir el pico de memoria de cada etapa con tracemalloc.
+    """
+
+    __slots__ = ("trace_memory", "stages", "counters")
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.stages: dict[str, dict] = {}
+        self.counters: dict[str, int] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Mide el bloque `with` como la etapa `name` (acumula si se repite)."""
+        if self.trace_memory:
+            import tracemalloc
+
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            entry = self.stages.setdefault(name, {"wall_s": 0.0})
+            entry["wall_s"] += elapsed
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - base
+                entry["peak_bytes"] = max(entry.get("peak_bytes", 0), peak)
+
+    def count(self, name: str, n: int = 1) -> None:
+        """Suma `n` al contador `name`."""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def as_dict(self) -> dict:
+        """Forma serializable: {"stages": {...}, "counters": {...}}."""
+        return {"stages": {k: dict(v) for k, v in self.stages.items()}, "counters": dict(self.counters)}
+
+
+def stage(stats: StageStats | None, name: str) -> ContextManager:
+    """`stats.stage(name)`, o un contexto vacío si no se están recogiendo estadísticas."""
+    return stats.stage(name) if stats is not None else nullcontext()
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Percentil q (0-100) con interpolación lineal; 0.0 si no hay valores."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100.0
+    lo = math.floor(pos)
+    hi = math.ceil(pos)
+    if lo == hi:
+        return ordered[lo]
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def aggregate(items: Iterable[dict]) -> dict:
+    """
+    Agrega los `as_dict()` de varios replays.
+
+    Returns:
+        {"replays": n,
+         "stages": {etapa: {"wall_s": {p50, p90, p99, max, total}, "peak_bytes": {...}}},
+         "counters": {contador: total}}
+    """
+    walls: dict[str, list[float]] = {}
+    peaks: dict[str, list[float]] = {}
+    counters: dict[str, int] = {}
+    n = 0
+    for item in items:
+        n += 1
+        for name, entry in item.get("stages", {}).items():
+            walls.setdefault(name, []).append(entry.get("wall_s", 0.0))
+            if "peak_bytes" in entry:
+                peaks.setdefault(name, []).append(entry["peak_bytes"])
+        for name, value in item.get("counters", {}).items():
+            counters[name] = counters.get(name, 0) + value
+
+    def _summary(values: list[float]) -> dict:
+        return {
+            "p50": percentile(values, 50),
+            "p90": percentile(values, 90),
+            "p99": percentile(values, 99),
+            "max": max(values),
+            "total": sum(values),
+        }
+
+    stages = {}
+    for name, values in walls.items():
+        stages[name] = {"wall_s": _summary(values)}
+        if name in peaks:
+            stages[name]["peak_bytes"] = _summary(peaks[name])
+    return {"replays": n, "stages": stages, "counters": counters}
+
+
+def format_summary(summary: dict) -> str:
+    """Texto legible de `aggregate` (o de un solo replay) para stderr."""
+    if "replays" not in summary:
+        summary = aggregate([summary])
+    lines = [f"Estadísticas ({summary['replays']} replays):"]
+    for name, entry in summary["stages"].items():
+        w = entry["wall_s"]
+        line = f"  {name:<16} p50 {w['p50'] * 1000:9.2f} ms  p90 {w['p90'] * 1000:9.2f} ms  total {w['total']:8.3f} s"
+        if "peak_bytes" in entry:
+            line += f"  pico {entry['peak_bytes']['max'] / (1024 * 1024):8.1f} MB"
+        lines.append(line)
+    for name, value in summary["counters"].items():
+        lines.append(f"  {name:<24} {value}")
+    pipeline = summary.get("pipeline")
+    if pipeline:
+        lines.append(
+            f"Etapas del lote ({pipeline['wall_s']:.3f} s, "
+            f"pico leído en espera {pipeline['peak_buffered_bytes'] / (1024 * 1024):.1f} MB):"
+        )
+        for name, entry in pipeline["stages"].items():
+            lines.append(
+                f"  {name:<16} utilización {entry['utilisation'] * 100:5.1f} %  ({entry['workers']} workers, "
+                f"ocupado {entry['busy_s']:8.3f} s, lote parado esperándola {entry['stall_s']:8.3f} s)"
+            )
+    return "\n".join(lines)
@@ -0,0 +1,336 @@
+"""
+Pool supervisado para lotes grandes: tiempo máximo por replay, límite de
+memoria por worker y reciclado de workers.
+
+`ProcessPoolExecutor` no puede matar una tarea concreta, así que aquí cada
+worker es un `multiprocessing.Process` con su propia tubería: el proceso
+principal sabe qué replay tiene cada uno y desde cuándo. Si un replay supera
+`timeout`, su worker se mata y se sustituye sin afectar a los demás; si un
+worker muere (p. ej. por el límite de memoria o un fallo del backend nativo)
+también se sustituye. Cada worker atiende como mucho `max_tasks_per_child`
+replays y luego sale, para que la fragmentación de memoria de la extensión
+nativa no se acumule.
+
+El límite de memoria es un RLIMIT_AS (espacio de direcciones) aplicado en el
+worker con el módulo `resource`; en sistemas sin él (Windows) no se aplica.
+Cada fallo se informa como `BatchItem.outcome` ("timeout", "oom", "crash",
+"parse_error") y, con `header_fallback`, se reintenta en modo header.
+
+Con `read_ahead`, los archivos los lee la etapa de lectura de
+`rl_replay_analyzer.pipeline` en el proceso principal y cada worker recibe
+los bytes en lugar de la ruta.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+import signal
+import time
+from collections import deque
+from multiprocessing.connection import Connection, wait
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from rl_replay_analyzer.batch import BatchItem, _analyze_one, _init_worker, retry_header
+from rl_replay_analyzer.pipeline import (
+    DEFAULT_READ_THREADS,
+    ReadAhead,
+    ReadTask,
+    StageMeter,
+    fill_pipeline_stats,
+    read_error_item,
+    with_read_stats,
+)
+
+# Workers nuevos que se prueban seguidos para un puesto cuyo worker muere antes
+# de recibir su replay; si ninguno arranca, el puesto se abandona
+_SPAWN_ATTEMPTS = 3
+
+
+def _apply_memory_limit(memory_limit: int | None) -> None:
+    """Limita el espacio de direcciones del proceso actual (si el sistema lo permite)."""
+    if not memory_limit:
+        return
+    try:
+        import resource
+    except ImportError:  # Windows
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        memory_limit = min(memory_limit, hard)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, hard))
+    except (ValueError, OSError):
+        pass
+
+
+def _worker_main(conn: Connection, config: dict) -> None:
+    """
+    Bucle del worker: recibe (ruta, bytes o None), responde BatchItem; None o
+    el límite de tareas = salir.
+    """
+    _apply_memory_limit(config["memory_limit"])
+    _init_worker(config["cache_dir"], config["cache_max_bytes"], config["routes_path"])
+    max_tasks = config["max_tasks_per_child"]
+    done = 0
+    try:
+        while not max_tasks or done < max_tasks:
+            try:
+                task = conn.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            path, data = task
+            conn.send(
+                _analyze_one(
+                    path,
+                    config["mode"],
+                    config["backend"],
+                    config["collect_stats"],
+                    config["trace_memory"],
+                    config["extractors"],
+                    data,
+                )
+            )
+            del task, data
+            done += 1
+    finally:
+        conn.close()
+
+
+class _Slot:
+    """Un worker vivo y el replay que está analizando."""
+
+    __slots__ = ("process", "conn", "path", "read", "started", "done")
+
+    def __init__(self, process: multiprocessing.Process, conn: Connection):
+        self.process = process
+        self.conn = conn
+        self.path: Path | None = None
+        self.read: ReadTask | None = None
+        self.started = 0.0
+        self.done = 0
+
+    def assign(self, path: Path, read: ReadTask | None = None) -> None:
+        self.conn.send((path, read.data if read is not None else None))
+        self.path = path
+        self.read = read._replace(data=None) if read is not None else None
+        self.started = time.monotonic()
+
+    def stop(self) -> None:
+        """Mata el worker (si sigue vivo) y libera sus recursos."""
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+def _death_outcome(exitcode: int | None, memory_limit: int | None) -> tuple[str, str]:
+    """Clasifica la muerte de un worker a mitad de un replay: (outcome, mensaje)."""
+    if exitcode is not None and exitcode < 0:
+        try:
+            name = signal.Signals(-exitcode).name
+        except ValueError:
+            name = f"señal {-exitcode}"
+        # SIGKILL sin haberlo pedido nosotros: casi siempre el OOM killer. Con
+        # RLIMIT_AS, una extensión nativa que no comprueba malloc acaba en
+        # SIGSEGV/SIGABRT
+        if -exitcode == getattr(signal, "SIGKILL", 9):
+            return "oom", f"Worker terminado por {name} (probablemente sin memoria)"
+        if memory_limit and name in ("SIGSEGV", "SIGABRT", "SIGBUS"):
+            return "oom", f"Worker terminado por {name} (probablemente por el límite de memoria)"
+        return "crash", f"Worker terminado por {name}"
+    return "crash", f"Worker terminado con código {exitcode}"
+
+
+def run_supervised(
+    paths: list[Path],
+    jobs: int,
+    mode: str = "full",
+    cache_dir: Path | None = None,
+    cache_max_bytes: int | None = None,
+    backend: Callable[[bytes], Any] | None = None,
+    collect_stats: bool = False,
+    trace_memory: bool = False,
+    extractors: tuple[str, ...] = (),
+    timeout: float | None = None,
+    memory_limit: int | None = None,
+    max_tasks_per_child: int | None = None,
+    header_fallback: bool = False,
+    read_ahead: int = 0,
+    read_threads: int | None = None,
+    max_buffered_bytes: int | None = None,
+    pipeline_stats: dict | None = None,
+    routes_path: Path | None = None,
+    poll_interval: float = 0.5,
+) -> Iterator[BatchItem]:
+    """
+    Como `batch.run_batch`, con workers supervisados (ver el docstring del módulo).
+
+    Args:
+        timeout: Segundos máximos por replay (None = sin límite).
+        memory_limit: RLIMIT_AS por worker en bytes (None = sin límite).
+        max_tasks_per_child: Replays por worker antes de reciclarlo (None = sin límite).
+        header_fallback: Reintentar en modo header los replays que fallan.
+        read_ahead: Replays leídos por adelantado en el proceso principal
+            (0 = cada worker lee su archivo; ver `pipeline.ReadAhead`).
+        read_threads: Hilos de la etapa de lectura.
+        max_buffered_bytes: Bytes leídos por adelantado como máximo.
+        pipeline_stats: Con `read_ahead`, se rellena al terminar con la
+            utilización de las etapas de lectura y análisis.
+        routes_path: Tabla de rutas por versión (ver `rl_replay_analyzer.routing`).
+        poll_interval: Cada cuánto se revisan los workers mientras se espera.
+
+    Yields:
+        BatchItem por cada replay, en orden de finalización.
+    """
+    ctx = multiprocessing.get_context()
+    config = {
+        "mode": mode,
+        "cache_dir": cache_dir,
+        "cache_max_bytes": cache_max_bytes,
+        "backend": backend,
+        "collect_stats": collect_stats,
+        "trace_memory": trace_memory,
+        "extractors": extractors,
+        "memory_limit": memory_limit,
+        "max_tasks_per_child": max_tasks_per_child,
+        "routes_path": routes_path,
+    }
+    retry = header_fallback and mode == "full"
+    pending: deque[tuple[Path, ReadTask | None]] = deque((p, None) for p in paths)
+    slots: list[_Slot] = []
+    # Con lectura anticipada, `pending` solo guarda lo devuelto por un worker
+    # muerto antes de recibirlo; el resto sale de `reader` en orden
+    reader = None
+    parse_meter = StageMeter("parse", min(jobs, len(paths)))
+    if read_ahead and mode == "full":
+        reader = ReadAhead(paths, read_threads or DEFAULT_READ_THREADS, read_ahead, max_buffered_bytes)
+        pending = deque()
+    unreadable: list[BatchItem] = []
+    started = time.perf_counter()
+
+    def _has_work() -> bool:
+        return bool(pending) or (reader is not None and len(reader) > 0)
+
+    def _next_task() -> tuple[Path, ReadTask | None] | None:
+        if pending:
+            return pending.popleft()
+        if reader is None:
+            return None
+        while True:
+            task = reader.next()
+            if task is None:
+                return None
+            if task.error is None:
+                return task.path, task
+            unreadable.append(read_error_item(task))
+
+    def _spawn() -> _Slot:
+        parent_conn, child_conn = ctx.Pipe()
+        process = ctx.Process(target=_worker_main, args=(child_conn, config), daemon=True)
+        process.start()
+        child_conn.close()
+        return _Slot(process, parent_conn)
+
+    def _finish(item: BatchItem) -> BatchItem:
+        return retry_header(item) if retry and item.outcome != "ok" else item
+
+    def _feed(slot: _Slot) -> bool:
+        """Da el siguiente replay a un worker libre. False si el worker ya no sirve."""
+        task = _next_task()
+        if task is None:
+            return True
+        try:
+            slot.assign(*task)
+        except OSError:  # el worker murió mientras estaba libre
+            pending.appendleft(task)
+            return False
+        return True
+
+    def _fill(slot: _Slot | None) -> None:
+        """Da trabajo a `slot` (o a un worker nuevo si es None), reponiendo los que mueren sin recibirlo."""
+        for _ in range(_SPAWN_ATTEMPTS):
+            if slot is None:
+                if not _has_work():
+                    return
+                slot = _spawn()
+                slots.append(slot)
+            if _feed(slot):
+                return
+            slot.stop()
+            slots.remove(slot)
+            slot = None
+
+    try:
+        for _ in range(min(jobs, len(paths))):
+            slots.append(_spawn())
+        for slot in list(slots):
+            _fill(slot)
+
+        while any(slot.path is not None for slot in slots):
+            busy = [slot for slot in slots if slot.path is not None]
+            wait_for = poll_interval
+            if timeout:
+                now = time.monotonic()
+                wait_for = max(0.0, min(wait_for, *(slot.started + timeout - now for slot in busy)))
+            wait([slot.conn for slot in busy] + [slot.process.sentinel for slot in busy], wait_for)
+
+            for slot in list(slots):
+                if slot.path is None:
+                    continue
+                item = None
+                replace = False
+                if slot.conn.poll():
+                    try:
+                        item = slot.conn.recv()
+                        slot.done += 1
+                        slot.path = None
+                        replace = bool(max_tasks_per_child) and slot.done >= max_tasks_per_child
+                    except (EOFError, OSError):
+                        item = None
+                if item is None and slot.path is not None:
+                    if not slot.process.is_alive():
+                        outcome, message = _death_outcome(slot.process.exitcode, memory_limit)
+                        item = BatchItem(slot.path, None, message, outcome=outcome)
+                        replace = True
+                    elif timeout and time.monotonic() - slot.started > timeout:
+                        item = BatchItem(slot.path, None, f"Tiempo máximo superado ({timeout:g} s)", outcome="timeout")
+                        replace = True
+                if item is None:
+                    continue
+                parse_meter.add(time.monotonic() - slot.started)
+                if slot.read is not None:
+                    item = with_read_stats(item, slot.read)
+                    slot.read = None
+                slot.path = None
+                if replace:
+                    slot.stop()
+                    slots.remove(slot)
+                    slot = None
+                _fill(slot)
+                yield _finish(item)
+                while unreadable:
+                    yield _finish(unreadable.pop(0))
+        # Sin workers ocupados pero con replays por repartir: ningún worker llegó a recibirlos
+        while True:
+            task = _next_task()
+            if task is None:
+                break
+            yield _finish(BatchItem(task[0], None, "Ningún worker pudo arrancar para analizar el replay", outcome="crash"))
+        while unreadable:
+            yield _finish(unreadable.pop(0))
+    finally:
+        for slot in slots:
+            try:
+                slot.conn.send(None)
+            except OSError:
+                pass
+        deadline = time.monotonic() + 1.0
+        for slot in slots:
+            slot.process.join(max(0.0, deadline - time.monotonic()))
+            slot.stop()
+        if reader is not None:
+            reader.close()
+            fill_pipeline_stats(pipeline_stats, time.perf_counter() - started, reader, parse_meter)
@@ -0,0 +1,217 @@
+"""
+Línea de tiempo por frame (reloj y marcador) en columnas compactas.
+
+El extractor "timeline" guarda, para cada frame recorrido, el índice del
+frame, SecondsRemaining, el último ReplicatedScoredOnTeam y si hubo gol, en
+arrays tipados del módulo `array` (4-8 bytes por frame en lugar de un dict).
+Las columnas se exportan a CSV o a un binario columnar que se lee sin copias
+con `read_timeline` (y con NumPy, si está instalado, vía `Timeline.to_numpy`).
+
+Formato binario (little-endian):
+
+    b"RLTL"  u16 versión  u16 columnas  u32 filas
+    por columna: u8 longitud del nombre, nombre ASCII, typecode (1 byte ASCII)
+    a continuación los datos de cada columna, contiguos y en el mismo orden
+"""
+
+from __future__ import annotations
+
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any
+
+from rl_replay_analyzer.extractors import (
+    GOAL_EVENT,
+    SCORED_ON_TEAM,
+    SECONDS_REMAINING,
+    STAT_EVENT,
+    Extractor,
+    Handler,
+    register,
+)
+
+FORMATS = ("csv", "bin")
+
+# Nombre de columna → typecode de array; -1 indica valor aún desconocido
+COLUMNS = (
+    ("frame", "i"),
+    ("seconds_remaining", "h"),
+    ("scored_on_team", "b"),
+    ("goal", "B"),
+)
+
+_MAGIC = b"RLTL"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHI")
+
+
+class Timeline:
+    """
+    Columnas de la línea de tiempo de un replay.
+
+    Cada columna es un `array.array` (atributo con el nombre de la columna);
+    todas tienen la misma longitud.
+    """
+
+    __slots__ = tuple(name for name, _ in COLUMNS)
+
+    def __init__(self, columns: dict[str, array] | None = None):
+        for name, typecode in COLUMNS:
+            setattr(self, name, columns[name] if columns else array(typecode))
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    def columns(self) -> dict[str, array]:
+        """Dict nombre → array, en el orden de COLUMNS."""
+        return {name: getattr(self, name) for name, _ in COLUMNS}
+
+    def to_numpy(self) -> dict[str, Any]:
+        """
+        Las columnas como arrays de NumPy (vistas sobre los mismos buffers, sin copia).
+
+        Raises:
+            ImportError: NumPy no está instalado.
+        """
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ImportError("Se requiere numpy para Timeline.to_numpy(): pip install numpy") from e
+        return {name: np.frombuffer(col, dtype=col.typecode) for name, col in self.columns().items()}
+
+    def write_csv(self, path: str | Path) -> None:
+        """Escribe las columnas como CSV con cabecera."""
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(",".join(name for name, _ in COLUMNS) + "\n")
+            f.writelines(f"{fr},{sec},{team},{goal}\n" for fr, sec, team, goal in zip(*self.columns().values()))
+
+    def write_binary(self, path: str | Path) -> None:
+        """Escribe las columnas en el formato binario del módulo."""
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, len(COLUMNS), len(self)))
+            for name, typecode in COLUMNS:
+                raw = name.encode("ascii")
+                f.write(bytes((len(raw),)) + raw + typecode.encode("ascii"))
+            for col in self.columns().values():
+                if sys.byteorder == "big":
+                    col = array(col.typecode, col)
+                    col.byteswap()
+                col.tofile(f)
+
+    def write(self, path: str | Path, fmt: str = "csv") -> None:
+        """
+        Escribe la línea de tiempo en el formato `fmt` ("csv" o "bin").
+
+        Raises:
+            ValueError: Formato desconocido.
+            OSError: No se pudo escribir el archivo.
+        """
+        if fmt == "csv":
+            self.write_csv(path)
+        elif fmt == "bin":
+            self.write_binary(path)
+        else:
+            raise ValueError(f"Formato de línea de tiempo desconocido: {fmt!r} (esperado: {', '.join(FORMATS)})")
+
+
+def read_timeline(path: str | Path) -> Timeline:
+    """
+    Lee un archivo escrito con `Timeline.write_binary`.
+
+    Raises:
+        ValueError: El archivo no tiene el formato esperado.
+    """
+    data = Path(path).read_bytes()
+    if len(data) < _HEADER.size:
+        raise ValueError(f"Archivo de línea de tiempo demasiado corto: {path}")
+    magic, version, ncols, nrows = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION:
+        raise ValueError(f"No es una línea de tiempo (versión {_VERSION}): {path}")
+    pos = _HEADER.size
+    layout = []
+    for _ in range(ncols):
+        n = data[pos]
+        name = data[pos + 1 : pos + 1 + n].decode("ascii")
+        typecode = chr(data[pos + 1 + n])
+        layout.append((name, typecode))
+        pos += n + 2
+    if layout != list(COLUMNS):
+        raise ValueError(f"Columnas inesperadas en {path}: {[name for name, _ in layout]}")
+    columns = {}
+    for name, typecode in layout:
+        col = array(typecode)
+        size = col.itemsize * nrows
+        if pos + size > len(data):
+            raise ValueError(f"Línea de tiempo truncada: {path}")
+        col.frombytes(data[pos : pos + size])
+        if sys.byteorder == "big":
+            col.byteswap()
+        columns[name] = col
+        pos += size
+    return Timeline(columns)
+
+
+@register
+class TimelineExtractor(Extractor):
+    """
+    Reloj y marcador en cada frame, en columnas (ver `Timeline`).
+
+    `scored_on_team` es el valor crudo de ReplicatedScoredOnTeam (sin la
+    inversión Local/Visitante de `extract_match_data`). Resultado: `Timeline`.
+    """
+
+    name = "timeline"
+    object_names = (SECONDS_REMAINING, STAT_EVENT, SCORED_ON_TEAM)
+    reference_names = (GOAL_EVENT,)
+    json_result = False
+
+    def __init__(self):
+        self.timeline = Timeline()
+        self.seconds_remaining = -1
+        self.scored_on_team = -1
+        self.goal_in_frame = 0
+        self.goal_event_oid: int | None = None
+
+    def bind(self, ids: dict[str, int | None]) -> dict[int, Handler] | None:
+        seconds_oid = ids[SECONDS_REMAINING]
+        if seconds_oid is None:
+            return None
+        table = {seconds_oid: self.on_seconds_remaining}
+        self.goal_event_oid = ids[GOAL_EVENT]
+        if ids[STAT_EVENT] is not None and self.goal_event_oid is not None:
+            table[ids[STAT_EVENT]] = self.on_stat_event
+        if ids[SCORED_ON_TEAM] is not None:
+            table[ids[SCORED_ON_TEAM]] = self.on_scored_on_team
+        return table
+
+    def on_seconds_remaining(self, attr: dict) -> None:
+        v = attr.get("Int")
+        if not isinstance(v, int):
+            v = attr.get("Float")
+        if isinstance(v, (int, float)):
+            self.seconds_remaining = int(v)
+
+    def on_scored_on_team(self, attr: dict) -> None:
+        v = attr.get("Byte")
+        if not isinstance(v, int):
+            v = attr.get("Int")
+        if isinstance(v, int) and v in (0, 1):
+            self.scored_on_team = v
+
+    def on_stat_event(self, attr: dict) -> None:
+        se = attr.get("StatEvent")
+        if isinstance(se, dict) and se.get("object_id") == self.goal_event_oid:
+            self.goal_in_frame = 1
+
+    def end_frame(self, frame_index: int) -> None:
+        t = self.timeline
+        t.frame.append(frame_index)
+        t.seconds_remaining.append(self.seconds_remaining)
+        t.scored_on_team.append(self.scored_on_team)
+        t.goal.append(self.goal_in_frame)
+        self.goal_in_frame = 0
+
+    def result(self) -> Timeline:
+        return self.timeline
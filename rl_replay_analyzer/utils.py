@@ -29,7 +29,9 @@ def get_prop(replay_data: dict, key: str):
     Obtiene una propiedad del replay por nombre desde la lista de propiedades del header.
 
     En boxcars, las propiedades del header suelen ser una lista de [nombre, valor].
-    El valor puede ser dict con 'Str', 'Int', 'Array', etc.
+    El valor puede ser dict con 'Str', 'Int', 'Array', etc. Recorre la lista
+    en cada llamada: para leer varias propiedades del mismo header es más
+    barato construir un `header_view.HeaderView`.
 
     Args:
         replay_data: Diccionario del replay (con clave 'properties' o similar).
@@ -0,0 +1,302 @@
+"""
+Vigilancia de una carpeta de replays (modo `watch`).
+
+Sondea periódicamente la carpeta con os.scandir (sin servicios de
+notificación del sistema), detecta replays nuevos o modificados y los manda a
+un pool acotado de procesos. Un archivo solo se procesa cuando su tamaño y
+mtime no cambian durante `settle` segundos (todavía se está copiando). El
+estado (ruta, tamaño, mtime, hash) se guarda en un JSON para que un reinicio
+no vuelva a procesar lo ya analizado.
+
+Si un worker muere (fallo del backend nativo, falta de memoria), el pool
+queda inservible: se crea uno nuevo y los replays que estaban en curso se
+vuelven a intentar en el siguiente sondeo, cada uno en un proceso propio; el
+que vuelva a matar su worker se registra como fallido ("crash").
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable
+
+from rl_replay_analyzer.batch import BatchItem, _analyze_one, _init_worker, default_jobs
+
+STATE_FILENAME = ".rl_replay_analyzer_state.json"
+
+
+def file_sha256(path: Path, chunk_size: int = 1024 * 1024) -> str:
+    """SHA-256 de un archivo leído por bloques."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def scan_replays(directory: Path) -> dict[str, tuple[int, int]]:
+    """
+    Lista los .replay de `directory` (recursivo) con su (tamaño, mtime_ns).
+
+    Usa os.scandir, que en Windows obtiene el stat en la misma llamada que el
+    listado, así que cada sondeo cuesta una pasada por directorio.
+    """
+    out: dict[str, tuple[int, int]] = {}
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            it = os.scandir(current)
+        except OSError:
+            continue
+        with it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(Path(entry.path))
+                    elif entry.name.lower().endswith(".replay") and entry.is_file():
+                        st = entry.stat()
+                        out[entry.path] = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue
+    return out
+
+
+class WatchState:
+    """Estado persistente de los replays ya procesados: ruta → {size, mtime_ns, sha256, status}."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self.entries = data.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def is_current(self, path: str, size: int, mtime_ns: int) -> bool:
+        e = self.entries.get(path)
+        return e is not None and e.get("size") == size and e.get("mtime_ns") == mtime_ns
+
+    def record(self, path: str, size: int, mtime_ns: int, sha256: str, status: str) -> None:
+        self.entries[path] = {"size": size, "mtime_ns": mtime_ns, "sha256": sha256, "status": status}
+
+    def save(self) -> None:
+        """Escritura atómica (temporal + os.replace)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"files": self.entries}, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+
+
+class Watcher:
+    """
+    Sondea una carpeta y analiza solo los replays nuevos o cambiados.
+
+    Args:
+        directory: Carpeta a vigilar (recursiva).
+        on_result: Callback llamado con cada BatchItem terminado.
+        state_path: JSON de estado (por defecto: STATE_FILENAME dentro de la carpeta).
+        jobs: Procesos del pool.
+        interval: Segundos entre sondeos.
+        settle: Segundos que tamaño y mtime deben permanecer estables.
+        mode: Modo de `parse_replay_file`.
+        cache_dir: Directorio de la caché de resultados (None = sin caché).
+        cache_max_bytes: Tamaño máximo de la caché en bytes.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        on_result: Callable[[BatchItem], None],
+        state_path: str | Path | None = None,
+        jobs: int | None = None,
+        interval: float = 2.0,
+        settle: float = 2.0,
+        mode: str = "full",
+        cache_dir: Path | None = None,
+        cache_max_bytes: int | None = None,
+    ):
+        self.directory = Path(directory)
+        self.on_result = on_result
+        self.state = WatchState(Path(state_path) if state_path else self.directory / STATE_FILENAME)
+        self.jobs = max(1, jobs or default_jobs())
+        self.interval = interval
+        self.settle = settle
+        self.mode = mode
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = cache_max_bytes
+        # ruta → ((size, mtime_ns), instante desde el que está estable)
+        self._seen: dict[str, tuple[tuple[int, int], float]] = {}
+        # future → (ruta, size, mtime_ns, sha256)
+        self._inflight: dict[Future, tuple[str, int, int, str]] = {}
+        self._pool: ProcessPoolExecutor | None = None
+        # Replays que estaban en curso al romperse el pool: se reintentan aislados
+        self._suspects: set[str] = set()
+        # future de un reintento aislado → su pool de un solo proceso
+        self._isolated: dict[Future, ProcessPoolExecutor] = {}
+
+    def _ready(self, now: float) -> list[tuple[str, int, int]]:
+        """Archivos estables, no procesados aún en su versión actual y no en curso."""
+        snapshot = scan_replays(self.directory)
+        for gone in self._seen.keys() - snapshot.keys():
+            del self._seen[gone]
+        busy = {info[0] for info in self._inflight.values()}
+        ready: list[tuple[str, int, int]] = []
+        for path, sig in snapshot.items():
+            prev = self._seen.get(path)
+            if prev is None or prev[0] != sig:
+                self._seen[path] = (sig, now)
+                if self.settle > 0:
+                    continue
+            elif now - prev[1] < self.settle:
+                continue
+            if path in busy or self.state.is_current(path, *sig):
+                continue
+            ready.append((path, *sig))
+        return ready
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.jobs, initializer=_init_worker, initargs=(self.cache_dir, self.cache_max_bytes)
+            )
+        return self._pool
+
+    def _discard_pool(self) -> None:
+        """Abandona un pool roto (un worker murió); el siguiente envío crea otro."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _submit(self, ready: list[tuple[str, int, int]]) -> int:
+        """
+        Lanza lo listo hasta llenar la cola. Retorna cuántos replays se lanzaron
+        o quedaron esperando turno; los que no se pueden leer no ocupan hueco
+        ni cuentan, para que `run_once` no espere por ellos.
+        """
+        limit = max(0, self.jobs * 2 - len(self._inflight))
+        launched = 0
+        for i, (path, size, mtime_ns) in enumerate(ready):
+            if launched >= limit:
+                return launched + len(ready) - i
+            try:
+                digest = file_sha256(Path(path))
+            except OSError:
+                continue  # desaparecido o bloqueado: se reintenta en el próximo sondeo
+            old = self.state.entries.get(path)
+            if old is not None and old.get("sha256") == digest:
+                # Solo cambió el mtime (copia/touch): no hace falta reanalizar
+                self.state.record(path, size, mtime_ns, digest, old.get("status", "ok"))
+                continue
+            if path in self._suspects:
+                # Aislado: si su worker muere, el culpable es este replay
+                pool = ProcessPoolExecutor(
+                    max_workers=1, initializer=_init_worker, initargs=(self.cache_dir, self.cache_max_bytes)
+                )
+                fut = pool.submit(_analyze_one, Path(path), self.mode)
+                self._isolated[fut] = pool
+            else:
+                try:
+                    fut = self._ensure_pool().submit(_analyze_one, Path(path), self.mode)
+                except BrokenProcessPool:
+                    self._discard_pool()
+                    fut = self._ensure_pool().submit(_analyze_one, Path(path), self.mode)
+            self._inflight[fut] = (path, size, mtime_ns, digest)
+            launched += 1
+        return launched
+
+    def _collect(self, done) -> None:
+        broken = False
+        for fut in done:
+            path, size, mtime_ns, digest = self._inflight.pop(fut)
+            isolated = self._isolated.pop(fut, None)
+            if isolated is not None:
+                isolated.shutdown(wait=False)
+            try:
+                item = fut.result()
+            except BrokenProcessPool as e:
+                if isolated is None:
+                    broken = True
+                    self._suspects.add(path)
+                    continue  # sin registrar: vuelve a estar listo en el próximo sondeo
+                item = BatchItem(Path(path), None, f"El worker murió durante el análisis: {e}", outcome="crash")
+            except Exception as e:
+                item = BatchItem(Path(path), None, f"{type(e).__name__}: {e}", outcome="crash")
+            self._suspects.discard(path)
+            self.state.record(path, size, mtime_ns, digest, "ok" if item.error is None else "error")
+            self.on_result(item)
+        if broken:
+            self._discard_pool()
+
+    def poll_once(self, wait_for_completion: bool = False) -> int:
+        """
+        Un ciclo: escanear, lanzar lo listo y recoger lo terminado.
+
+        Returns:
+            Replays lanzados en este ciclo o que esperan turno (0 = nada nuevo).
+        """
+        submitted = self._submit(self._ready(time.monotonic()))
+        if self._inflight:
+            done, _ = wait(
+                list(self._inflight),
+                timeout=None if wait_for_completion else 0,
+                return_when=ALL_COMPLETED if wait_for_completion else FIRST_COMPLETED,
+            )
+            self._collect(done)
+        self.state.save()
+        return submitted
+
+    def run_once(self) -> None:
+        """Un único barrido completo (para tareas programadas): respeta `settle` y espera a terminar."""
+        try:
+            self._ready(time.monotonic())
+            if self.settle > 0:
+                time.sleep(self.settle)
+            # Cada ciclo lanza como mucho 2 × jobs replays: repetir hasta vaciar la cola
+            while self.poll_once(wait_for_completion=True) or self._inflight:
+                pass
+        finally:
+            self.close()
+
+    def run(self) -> None:
+        """Bucle principal hasta Ctrl+C."""
+        try:
+            while True:
+                self.poll_once()
+                if self._inflight:
+                    done, _ = wait(list(self._inflight), timeout=self.interval, return_when=FIRST_COMPLETED)
+                    self._collect(done)
+                else:
+                    time.sleep(self.interval)
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Espera lo que esté en curso, guarda el estado y cierra el pool."""
+        if self._inflight:
+            done, _ = wait(list(self._inflight))
+            self._collect(done)
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        self.state.save()